@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: CPU-Zeit pro 1.000 Token der Relay-Modi aus llmchat/relay.py
+(passthrough, filter, reencode) fuer OpenAI-kompatible Streams.
+
+    python3 benchmarks/passthrough.py
+    python3 benchmarks/passthrough.py --replay groq.sse --repeat 10
+    python3 benchmarks/passthrough.py --bare     # Upstream ohne id/model/... Felder
+
+Vor der Messung wird geprueft, dass alle Modi beim Browser dieselbe
+Token-Folge ankommen lassen (so wie index.html choices[0].delta.content liest).
+"""
+
+import argparse
+import json
+import time
+
+from streams import FakeResponse, NullResponse, load_recording, network_chunks, openai_stream
+
+from llmchat import relay
+
+
+def browser_tokens(body):
+    """Token-Folge, wie index.html sie aus dem Relay-Output liest."""
+    tokens = []
+    for line in body.split(b'\n'):
+        if not line.startswith(b'data: '):
+            continue
+        data = line[6:].strip()
+        if data == b'[DONE]':
+            continue
+        try:
+            event = json.loads(data)
+        except ValueError:
+            continue
+        choices = event.get('choices') or []
+        if choices and choices[0].get('delta'):
+            token = choices[0]['delta'].get('content') or ''
+            if token:
+                tokens.append(token)
+    return tokens
+
+
+def cpu_seconds(mode, chunks, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.process_time()
+        relay.relay_openai(FakeResponse(chunks), NullResponse(), mode=mode)
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--replay', help='aufgezeichneter roher SSE-Body')
+    parser.add_argument('--tokens', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--bare', action='store_true',
+                        help='synthetischer Upstream ohne Zusatzfelder')
+    args = parser.parse_args()
+
+    if args.replay:
+        body = load_recording(args.replay)
+    else:
+        body = openai_stream(args.tokens, provider_fields=not args.bare)
+    chunks = network_chunks(body)
+
+    outputs = {}
+    for mode in relay.MODES:
+        resp = NullResponse()
+        relay.relay_openai(FakeResponse(chunks), resp, mode=mode)
+        outputs[mode] = resp
+    reference = browser_tokens(outputs['reencode'].body())
+    for mode in relay.MODES:
+        if browser_tokens(outputs[mode].body()) != reference:
+            raise SystemExit(f'{mode}: Token-Folge weicht von reencode ab!')
+
+    per_k = 1000.0 / max(len(reference), 1)
+    print(f'{len(reference)} Token, {len(body) / 1024:.1f} KiB Upstream, {len(chunks)} Chunks')
+    print(f'{"Modus":12s} {"CPU/1000 Token":>15s} {"Faktor":>7s} {"Ausgabe":>12s}')
+    base = cpu_seconds('reencode', chunks, args.repeat)
+    for mode in relay.MODES:
+        seconds = base if mode == 'reencode' else cpu_seconds(mode, chunks, args.repeat)
+        print(f'{mode:12s} {seconds * per_k * 1000:12.3f} ms {base / seconds:6.1f}x '
+              f'{outputs[mode].bytes / 1024:9.1f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: PDF-Export am Stueck gegen seitenweise (llmchat/exportpdf.py, llmchat/pdfstream.py).
+
+    python3 benchmarks/pdf_export.py
+    python3 benchmarks/pdf_export.py --messages 4000 --chars 4000
+
+Erzeugt einen synthetischen Chat und rendert ihn je in einem eigenen
+Prozess mit derselben Story: wie frueher komplett in ein BytesIO (Story als
+Liste, getvalue()) und ueber pdfstream.render in eine Senke, die nur
+mitzaehlt. Gemessen werden Gesamtzeit, Zeit bis zum ersten Byte und der
+Zuwachs des Spitzenspeichers (maxrss) gegenueber dem Prozess mit Chat.
+"""
+
+import argparse
+import io
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import streams  # noqa: F401  (cgi-bin in sys.path)
+
+from llmchat import exportpdf, exports, pdfstream
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate
+
+
+def chat_data(messages, chars):
+    line = 'Zeile mit Code und Text: x = berechne(y) + 42  # Kommentar\n'
+    return {'messages': [
+        {'id': f'msg_{i}', 'role': 'user' if i % 2 == 0 else 'assistant',
+         'content': (line * (chars // len(line) + 1))[:chars], 'timestamp': '2026-10-18T12:00:00'}
+        for i in range(messages)]}
+
+
+class Sink:
+    def __init__(self):
+        self.size = 0
+        self.first = None
+
+    def write(self, data):
+        if data and self.first is None:
+            self.first = time.perf_counter()
+        self.size += len(data)
+
+
+def whole(doc):
+    buffer = io.BytesIO()
+    template = SimpleDocTemplate(buffer, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm)
+    template.build(list(exportpdf.pdf_story(doc, exportpdf.pdf_styles())))
+    pdf = buffer.getvalue()
+    return len(pdf), time.perf_counter()
+
+
+def streamed(doc):
+    sink = Sink()
+    template = SimpleDocTemplate(sink, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm)
+    pdfstream.render(template, exportpdf.pdf_story(doc, exportpdf.pdf_styles()), sink)
+    return sink.size, sink.first
+
+
+def maxrss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure(mode, messages, chars):
+    doc = exports.normalize(chat_data(messages, chars))
+    before = maxrss()
+    started = time.perf_counter()
+    size, first = (whole if mode == 'whole' else streamed)(doc)
+    total = time.perf_counter() - started
+    name = 'am Stueck' if mode == 'whole' else 'seitenweise'
+    print(f'{name:<12}{size / 1e6:>9.1f} MB{total:>9.1f} s{first - started:>11.1f} s'
+          f'{(maxrss() - before) / 1e6:>11.0f} MB', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--chars', type=int, default=4000)
+    parser.add_argument('--mode', choices=('whole', 'streamed'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        measure(args.mode, args.messages, args.chars)
+        return
+    print(f'{args.messages} Nachrichten zu {args.chars} Zeichen')
+    print(f'{"Modus":<12}{"PDF":>12}{"gesamt":>11}{"erstes Byte":>13}{"Spitze +":>14}', flush=True)
+    for mode in ('whole', 'streamed'):
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--mode', mode,
+                        '--messages', str(args.messages), '--chars', str(args.chars)], check=True)
+
+
+if __name__ == '__main__':
+    main()
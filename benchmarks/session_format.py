@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: Plattenbedarf und Ladezeit der Sitzungsformate aus llmchat/sessionformat.py.
+
+    python3 benchmarks/session_format.py
+    python3 benchmarks/session_format.py --sessions /var/www/deepseek-chat/sessions
+    python3 benchmarks/session_format.py --count 500 --repeat 5
+
+Ohne --sessions wird ein synthetischer Bestand erzeugt (deutscher Fliesstext,
+Code-Bloecke, eingefuegte Dateiinhalte, vereinzelt Base64-Bilder). Jedes Format
+wird in ein eigenes temporaeres Verzeichnis geschrieben; gemessen werden die
+Gesamtgroesse, die Ladezeit aller Sitzungen (FileStore.load, Seiten-Cache warm)
+und die Ladezeit der groessten Sitzung. Vor der Messung wird geprueft, dass
+jedes Format exakt dieselben chatData zurueckliefert.
+"""
+
+import argparse
+import base64
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from streams import _TOKENS
+
+from llmchat import sessionformat
+from llmchat.sessionstore import FileStore
+
+_SETTINGS = {'apiService': 'deepseek', 'selectedModel': 'deepseek-chat', 'temperature': 0.7,
+             'language': 'de', 'darkMode': True, 'compressorEnabled': False}
+
+
+def _text(rnd, tokens):
+    return ''.join(rnd.choice(_TOKENS) for _ in range(tokens))
+
+
+def synthetic_session(rnd, index):
+    messages = []
+    for turn in range(rnd.randint(2, 40)):
+        content = _text(rnd, rnd.randint(20, 400))
+        if rnd.random() < 0.1:
+            content += '\n\n--- Datei: bericht.txt ---\n' + _text(rnd, rnd.randint(2000, 8000))
+        if rnd.random() < 0.03:
+            content += '\n![bild](data:image/png;base64,' + base64.b64encode(
+                rnd.randbytes(rnd.randint(20000, 120000))).decode('ascii') + ')'
+        messages.append({'id': f'msg_{2 * turn + 1}', 'role': 'user', 'content': content,
+                         'mode': 'normal', 'hasFile': False, 'timestamp': '18.10.2026, 12:00:00',
+                         'estimatedTokens': len(content) // 4})
+        answer = _text(rnd, rnd.randint(100, 1500))
+        messages.append({'id': f'msg_{2 * turn + 2}', 'role': 'assistant', 'content': answer,
+                         'mode': 'normal', 'timestamp': '18.10.2026, 12:00:05',
+                         'estimatedTokens': len(answer) // 4})
+    return f'2026-10-18_12{index:04d}_bench', {
+        'timestamp': '2026-10-18T12:00:00', 'messages': messages, 'settings': _SETTINGS}
+
+
+def load_sessions(directory):
+    store = FileStore(directory)
+    return [(session_id, store.load(session_id)) for session_id in store.ids()]
+
+
+def directory_size(directory):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(directory) for name in names
+               if sessionformat.session_id(name) or name.startswith(sessionformat.DICT_FILE))
+
+
+def measure(sessions, fmt, dictionary, repeat):
+    directory = tempfile.mkdtemp(prefix=f'bench-{fmt}-')
+    try:
+        if dictionary:
+            os.makedirs(directory, exist_ok=True)
+            sessionformat.save_dictionary(directory, sessionformat.train(data for _, data in sessions))
+        store = FileStore(directory, fmt=fmt)
+        started = time.perf_counter()
+        for session_id, chat_data in sessions:
+            store.save(session_id, chat_data)
+        write = time.perf_counter() - started
+        for session_id, chat_data in sessions:
+            assert store.load(session_id) == chat_data, f'{fmt}: {session_id} weicht ab'
+        biggest = max(sessions, key=lambda item: os.path.getsize(store.path(item[0])))[0]
+        load_all = load_one = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for session_id, _ in sessions:
+                store.load(session_id)
+            load_all = min(load_all, time.perf_counter() - started)
+            started = time.perf_counter()
+            store.load(biggest)
+            load_one = min(load_one, time.perf_counter() - started)
+        return directory_size(directory), write, load_all, load_one, os.path.getsize(store.path(biggest))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sessions', help='vorhandenes Sitzungsverzeichnis (nur gelesen)')
+    parser.add_argument('--count', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.sessions:
+        sessions = [item for item in load_sessions(args.sessions) if isinstance(item[1], dict)]
+    else:
+        rnd = random.Random(1)
+        sessions = [synthetic_session(rnd, i) for i in range(args.count)]
+    print(f'{len(sessions)} Sitzungen')
+    print(f'{"Format":<14}{"Groesse":>12}{"Anteil":>9}{"Schreiben":>12}{"alle laden":>12}'
+          f'{"groesste":>12}{"(Datei)":>12}')
+    baseline = None
+    for fmt, dictionary in (('json', False), ('compact', False), ('zlib', False),
+                            ('zlib', True), ('lzma', False)):
+        size, write, load_all, load_one, biggest = measure(sessions, fmt, dictionary, args.repeat)
+        baseline = baseline or size
+        label = fmt + ('+dict' if dictionary else '')
+        print(f'{label:<14}{size / 1048576:>10.2f}MB{size / baseline:>9.1%}{write * 1000:>10.0f}ms'
+              f'{load_all * 1000:>10.0f}ms{load_one * 1000:>10.1f}ms{biggest / 1024:>10.0f}KB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: Verzeichnis-Layout der files-Engine (flat gegen sharded, llmchat/sessionstore.py).
+
+    python3 benchmarks/session_layout.py
+    python3 benchmarks/session_layout.py --count 50000 --days 730
+
+Legt je Layout in einem temporaeren Verzeichnis --count kleine Sitzungen an,
+verteilt ueber --days Tage (die Session-ID beginnt mit dem Datum). Gemessen
+werden Anlegen, Laden einer zufaelligen und einer nicht vorhandenen Sitzung,
+die Sitzungsliste mit aktuellem Index, der Neuaufbau des Index und ids()
+(alle Dateinamen). Zum Schluss wird der flache Bestand mit relayout_all ins
+sharded-Layout verschoben, wie es im laufenden Betrieb geschieht.
+"""
+
+import argparse
+import datetime
+import io
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+import streams  # noqa: F401  (cgi-bin in sys.path)
+
+from llmchat import sessionstore
+from llmchat.sessionstore import FileStore
+
+
+def session_ids(count, days, rnd):
+    start = datetime.date(2026, 10, 18) - datetime.timedelta(days=days)
+    ids = set()
+    while len(ids) < count:
+        day = start + datetime.timedelta(days=rnd.randrange(days))
+        ids.add(f'{day.isoformat()}_{rnd.randrange(240000):06d}_{rnd.randrange(36 ** 6):06x}')
+    return sorted(ids)
+
+
+def chat_data(session_id):
+    return {'timestamp': '2026-10-18T12:00:00', 'messages': [
+        {'id': 'msg_1', 'role': 'user', 'content': f'Frage zu {session_id}'},
+        {'id': 'msg_2', 'role': 'assistant', 'content': 'Antwort ' * 40}]}
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def measure(layout, ids, repeat, rnd):
+    directory = tempfile.mkdtemp(prefix=f'bench-{layout}-')
+    store = FileStore(directory, fmt='compact', layout=layout)
+    started = time.perf_counter()
+    for session_id in ids:
+        store.save(session_id, chat_data(session_id))
+    create = (time.perf_counter() - started) / len(ids)
+    sample = rnd.sample(ids, min(len(ids), 1000))
+    load = timed(lambda: [store.load(session_id) for session_id in sample], repeat) / len(sample)
+    miss = timed(lambda: [store.load(session_id[:-1] + 'x') for session_id in sample], repeat) / len(sample)
+    listing = timed(lambda: store.list(limit=50), repeat)
+    count = timed(lambda: store.ids(), repeat)
+    os.remove(os.path.join(directory, sessionstore.INDEX_FILE))
+    started = time.perf_counter()
+    store.list(limit=50)
+    rebuild = time.perf_counter() - started
+    print(f'{layout:<9}{create * 1e6:>10.0f}us{load * 1e6:>10.0f}us{miss * 1e6:>10.0f}us'
+          f'{listing * 1000:>10.1f}ms{count * 1000:>10.1f}ms{rebuild:>10.2f}s')
+    return directory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    ids = session_ids(args.count, args.days, rnd)
+    print(f'{args.count} Sitzungen ueber {args.days} Tage')
+    print(f'{"Layout":<9}{"Anlegen":>12}{"Laden":>12}{"fehlt":>12}{"Liste":>12}{"ids()":>12}{"Index neu":>11}')
+    directories = []
+    try:
+        for layout in sessionstore.LAYOUTS[::-1]:
+            directories.append(measure(layout, ids, args.repeat, rnd))
+        flat = directories[0]
+        started = time.perf_counter()
+        sessionstore.relayout_all(store=FileStore(flat, fmt='compact', layout='sharded'), out=io.StringIO())
+        print(f'relayout flat -> sharded: {time.perf_counter() - started:.1f} s '
+              f'({len(os.listdir(flat))} Eintraege bleiben in SESSIONS_DIR)')
+    finally:
+        for directory in directories:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
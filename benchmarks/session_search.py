@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: Volltextsuche ueber alle Sitzungen (llmchat/search.py) gegen lineares Durchsuchen.
+
+    python3 benchmarks/session_search.py
+    python3 benchmarks/session_search.py --count 5000 --repeat 20
+
+Erzeugt in einem temporaeren LLMCHAT_BASE_DIR einen synthetischen Bestand
+(deutscher Fliesstext aus Silben-Kunstwoertern mit Zipf-Verteilung, damit es
+haeufige und seltene Begriffe gibt), speichert ihn ueber die files-Engine,
+indiziert dabei inkrementell und baut den Index zum Vergleich einmal neu auf.
+Gemessen werden die Antwortzeit typischer Anfragen (Median ueber --repeat)
+und ein Durchlauf "alle Sitzungen laden und nach dem Wort suchen", also das,
+was ohne Index noetig waere.
+"""
+
+import argparse
+import io
+import itertools
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from streams import _TOKENS
+
+os.environ['LLMCHAT_BASE_DIR'] = tempfile.mkdtemp(prefix='bench-search-')
+
+from llmchat import search, sessionstore  # noqa: E402  (nach LLMCHAT_BASE_DIR)
+
+_SYLLABLES = ['ka', 'bel', 'stra', 'ße', 'ung', 'ver', 'trag', 'mö', 'lich', 'keit', 'ser', 'ver',
+              'da', 'ten', 'bank', 'über', 'gang', 'schnitt', 'stel', 'le', 'grö', 'ße', 'netz',
+              'werk', 'kno', 'ten', 'pro', 'zess', 'spei', 'cher', 'rech', 'nung', 'än', 'de', 'rung']
+
+
+def vocabulary(rnd, size):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rnd.choice(_SYLLABLES) for _ in range(rnd.randint(2, 4))))
+    return sorted(words)
+
+
+def synthetic_session(rnd, words, cum_weights, index):
+    messages = []
+    for turn in range(rnd.randint(2, 20)):
+        for role, low, high in (('user', 10, 80), ('assistant', 60, 400)):
+            text = ' '.join(rnd.choices(words, cum_weights=cum_weights, k=rnd.randint(low, high)))
+            if role == 'assistant' and rnd.random() < 0.3:
+                text += ''.join(rnd.choice(_TOKENS) for _ in range(100))
+            messages.append({'id': f'msg_{len(messages) + 1}', 'role': role, 'content': text,
+                             'mode': 'normal', 'timestamp': '18.10.2026, 12:00:00'})
+    return f'2026-10-18_{index:06d}_bench', {'timestamp': '2026-10-18T12:00:00', 'messages': messages}
+
+
+def linear_scan(store, word):
+    hits = 0
+    for session_id in store.ids():
+        chat_data = store.load(session_id)
+        if any(word in (msg.get('content') or '').lower() for msg in chat_data.get('messages') or []):
+            hits += 1
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        rnd = random.Random(1)
+        words = vocabulary(rnd, args.words)
+        cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+        store = sessionstore.get()
+        save = index = 0.0
+        messages = 0
+        for i in range(args.count):
+            session_id, chat_data = synthetic_session(rnd, words, cum_weights, i)
+            messages += len(chat_data['messages'])
+            started = time.perf_counter()
+            store.save(session_id, chat_data)
+            save += time.perf_counter() - started
+            started = time.perf_counter()
+            search.index_session(session_id, chat_data)
+            index += time.perf_counter() - started
+        print(f'{args.count} Sitzungen, {messages} Nachrichten')
+        print(f'Speichern {save:.1f} s, inkrementell indizieren {index:.1f} s '
+              f'({index / args.count * 1000:.2f} ms/Sitzung)')
+        started = time.perf_counter()
+        search.rebuild(out=io.StringIO())
+        print(f'Neuaufbau {time.perf_counter() - started:.1f} s, '
+              f'Index {os.path.getsize(search.SEARCH_DB) / 1048576:.1f} MB')
+
+        common, medium, rare = words[0], words[len(words) // 50], words[-1]
+        queries = [
+            ('haeufig', common),
+            ('mittel', medium),
+            ('selten', rare),
+            ('zwei Woerter', f'{medium} {words[1]}'),
+            ('Praefix', medium[:3] + '*'),
+            ('Phrase', f'"{common} {words[1]}"'),
+            ('NOT', f'{medium} -{common}'),
+        ]
+        print(f'{"Anfrage":<14}{"Treffer":>9}{"Median":>12}{"max":>12}')
+        for label, text in queries:
+            times = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                results = search.query(text, limit=20)
+                times.append(time.perf_counter() - started)
+            print(f'{label:<14}{len(results):>9}{statistics.median(times) * 1000:>10.1f}ms'
+                  f'{max(times) * 1000:>10.1f}ms')
+        started = time.perf_counter()
+        hits = linear_scan(store, rare)
+        print(f'{"linear":<14}{hits:>9}{(time.perf_counter() - started) * 1000:>10.0f}ms  (ohne Index)')
+    finally:
+        shutil.rmtree(os.environ['LLMCHAT_BASE_DIR'], ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Micro-Benchmark: Relay-Schleife der Proxies, alt (str-Puffer + split)
+gegen llmchat.sse (bytearray/memoryview).
+
+    python3 benchmarks/sse_relay.py                      # synthetische Streams
+    python3 benchmarks/sse_relay.py --replay stream.sse  # aufgezeichneter Stream
+    python3 benchmarks/sse_relay.py --tokens 20000 --repeat 5
+
+Szenarien:
+  lines    Chunks = Zeilen (bisheriges `for chunk in response`)
+  network  Chunks = zufaellige Lesegroessen 1..1500 Byte, auch mitten in
+           einem UTF-8-Zeichen (alte Schleife bricht dort ab)
+  large    ein einzelnes 1-MB-Event in 1-KB-Chunks, nur an Zeichengrenzen
+           getrennt (alte Schleife durchsucht den wachsenden Puffer bei jedem
+           Chunk erneut)
+
+Beide Varianten muessen byte-identische Ausgaben erzeugen; das wird vor der
+Zeitmessung geprueft.
+"""
+
+import argparse
+import json
+import time
+
+from streams import (NullResponse, FakeResponse, large_event_stream, line_chunks,
+                     load_recording, network_chunks, openai_stream)
+
+from llmchat import sse
+
+
+def relay_legacy(chunks, resp):
+    """Bisherige Schleife aus openai-api.py / groq-api.py / hugging-api.py."""
+    buffer = ''
+    for chunk in chunks:
+        decoded = chunk.decode('utf-8')
+        buffer += decoded
+        while '\n' in buffer:
+            line, buffer = buffer.split('\n', 1)
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('data: '):
+                data_str = line[6:].strip()
+                if not data_str:
+                    continue
+                if data_str == '[DONE]':
+                    resp.write('data: [DONE]\n\n')
+                    resp.flush()
+                    continue
+                try:
+                    chunk_data = json.loads(data_str)
+                    choices = chunk_data.get('choices', [])
+                    if choices:
+                        delta = choices[0].get('delta', {})
+                        text_token = delta.get('content', '')
+                        if text_token:
+                            openai_chunk = {
+                                'choices': [{
+                                    'delta': {'content': text_token}
+                                }]
+                            }
+                            resp.write(f'data: {json.dumps(openai_chunk)}\n\n')
+                            resp.flush()
+                except json.JSONDecodeError:
+                    pass
+
+
+def relay_codec(chunks, resp):
+    """Neue Schleife (llmchat.sse), wie in den Proxies."""
+    for data in sse.iter_data(FakeResponse(chunks)):
+        if not data:
+            continue
+        if data == sse.DONE_DATA:
+            resp.write(sse.DONE)
+            resp.flush()
+            continue
+        try:
+            chunk_data = json.loads(data)
+        except ValueError:
+            continue
+        choices = chunk_data.get('choices', [])
+        if choices:
+            delta = choices[0].get('delta', {})
+            text_token = delta.get('content', '')
+            if text_token:
+                resp.write(sse.encode_delta(text_token))
+                resp.flush()
+
+
+def decode_only_legacy(chunks):
+    buffer = ''
+    n = 0
+    for chunk in chunks:
+        buffer += chunk.decode('utf-8')
+        while '\n' in buffer:
+            line, buffer = buffer.split('\n', 1)
+            n += 1
+    return n
+
+
+def decode_only_codec(chunks):
+    decoder = sse.SSEDecoder()
+    n = 0
+    for chunk in chunks:
+        n += len(decoder.feed(chunk))
+    return n + len(decoder.close())
+
+
+def measure(func, chunks, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(chunks)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_scenario(name, body, chunks, repeat):
+    total = len(body)
+    try:
+        legacy = NullResponse()
+        relay_legacy(chunks, legacy)
+        legacy_out = legacy.body()
+    except UnicodeDecodeError as e:
+        legacy_out = None
+        print(f'{name:8s} alt: UnicodeDecodeError ({e.reason}) — geteiltes UTF-8-Zeichen')
+    codec = NullResponse()
+    relay_codec(chunks, codec)
+    if legacy_out is not None and legacy_out != codec.body():
+        raise SystemExit(f'{name}: Ausgaben unterscheiden sich!')
+
+    rows = []
+    if legacy_out is not None:
+        rows.append(('alt  relay', measure(lambda c: relay_legacy(c, NullResponse()), chunks, repeat)))
+        rows.append(('alt  parse', measure(decode_only_legacy, chunks, repeat)))
+    rows.append(('neu  relay', measure(lambda c: relay_codec(c, NullResponse()), chunks, repeat)))
+    rows.append(('neu  parse', measure(decode_only_codec, chunks, repeat)))
+    print(f'{name:8s} {total / 1024:9.1f} KiB in {len(chunks)} Chunks')
+    for label, seconds in rows:
+        print(f'         {label}: {seconds * 1000:9.2f} ms  {total / seconds / 1e6:8.1f} MB/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--replay', help='aufgezeichneter roher SSE-Body')
+    parser.add_argument('--tokens', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    body = load_recording(args.replay) if args.replay else openai_stream(args.tokens)
+    run_scenario('lines', body, line_chunks(body), args.repeat)
+    run_scenario('network', body, network_chunks(body), args.repeat)
+    big = large_event_stream()
+    run_scenario('large', big, network_chunks(big, 1024, 1024, utf8_safe=True), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
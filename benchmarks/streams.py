@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Gemeinsame Hilfen fuer die Micro-Benchmarks: aufgezeichnete oder
+synthetische Upstream-SSE-Streams und deren Zerlegung in Lese-Chunks.
+
+Aufzeichnen eines echten Streams (roher Upstream-Body, z.B. deepseek-reasoner):
+
+    curl -sN https://api.deepseek.com/v1/chat/completions \\
+         -H "Authorization: Bearer $DEEPSEEK_API_KEY" -H 'Content-Type: application/json' \\
+         -d '{"model":"deepseek-reasoner","stream":true,"messages":[...]}' > stream.sse
+
+Die Benchmarks spielen solche Dateien mit --replay stream.sse ab; ohne
+Aufzeichnung wird ein gleichartiger synthetischer Stream erzeugt.
+"""
+
+import json
+import os
+import random
+import sys
+
+CGI_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'var', 'www', 'deepseek-chat', 'cgi-bin')
+if CGI_DIR not in sys.path:
+    sys.path.insert(0, CGI_DIR)
+
+# Typische Token einer langen Code-Antwort mit deutschem Begleittext
+_TOKENS = [
+    'Hier', ' ist', ' ein', ' \\', 'n', '-Escape', ' und', ' "Zitat"', ' {', '"a"', ': 1}',
+    ' die', ' überarbeitete', ' Funktion', ':', '\n\n', '```', 'python', '\n',
+    'def', ' größe', '_berechnen', '(', 'einträge', '):', '\n', '    ', 'summe', ' =', ' 0',
+    '\n', '    ', 'for', ' e', ' in', ' einträge', ':', '\n', '        ', 'summe', ' +=',
+    ' e', '.', 'länge', '\n', '    ', 'return', ' summe', '\n', '```', '\n\n', 'Schließlich',
+    ' prüft', ' die', ' Schleife', ' jeden', ' Eintrag', ' — ', 'auch', ' Sonderfälle',
+    ' wie', ' "', 'Ä', 'Ö', 'Ü', '"', '.', ' 🚀',
+]
+
+
+def openai_stream(tokens=5000, model='deepseek-reasoner', provider_fields=True, seed=1):
+    """Erzeugt einen rohen OpenAI-kompatiblen SSE-Body mit `tokens` Deltas."""
+    rnd = random.Random(seed)
+    head = {'id': 'chatcmpl-5f1c0d2e-9a7b-4c1e-8d3f-0a1b2c3d4e5f', 'object': 'chat.completion.chunk',
+            'created': 1760000000, 'model': model}
+    out = []
+    if provider_fields:
+        # Rollen-Event am Anfang, Abschluss-Event mit finish_reason am Ende
+        first = dict(head, choices=[{'index': 0, 'delta': {'role': 'assistant', 'content': ''},
+                                     'logprobs': None, 'finish_reason': None}])
+        out.append(b'data: ' + json.dumps(first).encode('utf-8') + b'\n\n')
+    for i in range(tokens):
+        token = rnd.choice(_TOKENS)
+        if provider_fields:
+            event = {
+                'id': 'chatcmpl-5f1c0d2e-9a7b-4c1e-8d3f-0a1b2c3d4e5f',
+                'object': 'chat.completion.chunk',
+                'created': 1760000000,
+                'model': model,
+                'system_fingerprint': 'fp_8802369eaa_prod0623',
+                'choices': [{
+                    'index': 0,
+                    'delta': {'content': token},
+                    'logprobs': None,
+                    'finish_reason': None,
+                }],
+            }
+        else:
+            event = {'choices': [{'delta': {'content': token}}]}
+        out.append(b'data: ' + json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n\n')
+    if provider_fields:
+        last = dict(head, choices=[{'index': 0, 'delta': {}, 'logprobs': None, 'finish_reason': 'stop'}],
+                    usage={'prompt_tokens': 812, 'completion_tokens': tokens, 'total_tokens': 812 + tokens})
+        out.append(b'data: ' + json.dumps(last).encode('utf-8') + b'\n\n')
+    out.append(b'data: [DONE]\n\n')
+    return b''.join(out)
+
+
+def gemini_stream(tokens=5000, seed=1):
+    """Erzeugt einen rohen Gemini-SSE-Body (candidates/content/parts)."""
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(tokens):
+        event = {
+            'candidates': [{'content': {'parts': [{'text': rnd.choice(_TOKENS)}], 'role': 'model'},
+                            'index': 0}],
+            'modelVersion': 'gemini-2.5-flash',
+        }
+        out.append(b'data: ' + json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\r\n\r\n')
+    return b''.join(out)
+
+
+def large_event_stream(size=1 << 20):
+    """Ein einzelnes sehr grosses Event (z.B. komplette Code-Datei in einem Delta)."""
+    text = ''.join(_TOKENS) * (size // len(''.join(_TOKENS).encode('utf-8')) + 1)
+    event = {'choices': [{'delta': {'content': text}}]}
+    return b'data: ' + json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n\ndata: [DONE]\n\n'
+
+
+def load_recording(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def network_chunks(body, min_size=1, max_size=1500, seed=2, utf8_safe=False):
+    """Zerlegt den Body wie Netzwerk-Lesevorgaenge (auch mitten in UTF-8-Zeichen,
+    ausser utf8_safe=True)."""
+    rnd = random.Random(seed)
+    chunks = []
+    pos = 0
+    while pos < len(body):
+        end = pos + rnd.randint(min_size, max_size)
+        if utf8_safe:
+            # nicht vor einem UTF-8-Folgebyte (10xxxxxx) trennen
+            while end < len(body) and body[end] & 0xC0 == 0x80:
+                end += 1
+        chunks.append(body[pos:end])
+        pos = end
+    return chunks
+
+
+def line_chunks(body):
+    """Zerlegt den Body zeilenweise (so lieferte ihn `for chunk in response`)."""
+    return body.splitlines(keepends=True)
+
+
+class FakeResponse:
+    """Minimaler Upstream-Response fuer iter_chunks()/iter_data()."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+
+    def read1(self, size=-1):
+        return next(self._chunks, b'')
+
+    def __iter__(self):
+        return iter(self._chunks)
+
+
+class NullResponse:
+    """Senke fuer resp.write()/resp.flush(), zaehlt Aufrufe und Bytes."""
+
+    def __init__(self):
+        self.writes = 0
+        self.flushes = 0
+        self.bytes = 0
+        self.parts = []
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.writes += 1
+        self.bytes += len(data)
+        self.parts.append(data)
+
+    def flush(self):
+        self.flushes += 1
+
+    def body(self):
+        return b''.join(self.parts)
@@ -33,6 +33,8 @@ cp "$SOURCE_DIR/var/www/deepseek-chat/index.html"        "$PROD_DIR/index.html"
 cp "$SOURCE_DIR/var/www/deepseek-chat/manifest"          "$PROD_DIR/manifest"
 cp "$SOURCE_DIR/var/www/deepseek-chat/files-directorys"  "$PROD_DIR/files-directorys"
 cp "$SOURCE_DIR/var/www/deepseek-chat/cgi-bin/"*.py      "$PROD_DIR/cgi-bin/"
+mkdir -p "$PROD_DIR/cgi-bin/llmchat"
+cp "$SOURCE_DIR/var/www/deepseek-chat/cgi-bin/llmchat/"*.py "$PROD_DIR/cgi-bin/llmchat/"
 cp "$SOURCE_DIR/var/www/deepseek-chat/language.xml"      "$PROD_DIR/language.xml"
 
 chown www-data:www-data "$PROD_DIR/index.html"
@@ -41,6 +43,8 @@ chown www-data:www-data "$PROD_DIR/files-directorys"
 chown www-data:www-data "$PROD_DIR/cgi-bin/"*.py
 chown www-data:www-data "$PROD_DIR/language.xml"
 chmod 755 "$PROD_DIR/cgi-bin/"*.py
+chown -R www-data:www-data "$PROD_DIR/cgi-bin/llmchat"
+chmod 644 "$PROD_DIR/cgi-bin/llmchat/"*.py
 
 systemctl reload apache2 > /dev/null 2>&1
 if [ $? -ne 0 ]; then
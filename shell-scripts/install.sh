@@ -19,5 +19,68 @@ cp sync-back.sh "$PROD_DIR/sync-back.sh"
 chown www-data:www-data "$PROD_DIR/deploy.sh"
 chown www-data:www-data "$PROD_DIR/sync-back.sh"
 
+# Token-Vokabulare fuer cgi-bin/count-tokens.py (llmchat/tokens.py)
+# Llama 3 (tokenizer.model, Zugang nur nach Lizenz-Freigabe) bei Bedarf
+# manuell als $PROD_DIR/tokenizers/llama3.tiktoken ablegen.
+TOKENIZER_DIR="$PROD_DIR/tokenizers"
+mkdir -p "$TOKENIZER_DIR"
+fetch_vocab() {
+    if [ ! -s "$TOKENIZER_DIR/$1" ]; then
+        if curl -fsSL --max-time 120 -o "$TOKENIZER_DIR/$1.tmp" "$2"; then
+            mv "$TOKENIZER_DIR/$1.tmp" "$TOKENIZER_DIR/$1"
+            echo "Vokabular geladen: $1"
+        else
+            rm -f "$TOKENIZER_DIR/$1.tmp"
+            echo "WARNUNG: Vokabular $1 nicht geladen (Token-Zaehlung nutzt Ersatz/Schaetzung)"
+        fi
+    fi
+}
+fetch_vocab o200k_base.tiktoken https://openaipublic.blob.core.windows.net/encodings/o200k_base.tiktoken
+fetch_vocab cl100k_base.tiktoken https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken
+fetch_vocab deepseek.json        https://huggingface.co/deepseek-ai/DeepSeek-V3/resolve/main/tokenizer.json
+fetch_vocab qwen2.json           https://huggingface.co/Qwen/Qwen2.5-72B-Instruct/resolve/main/tokenizer.json
+chown -R www-data:www-data "$TOKENIZER_DIR"
+
+# Aufbewahrung/Aufraeumen (cgi-bin/llmchat/retention.py): taeglich, niedrige
+# CPU- und I/O-Prioritaet; Einstellungen (LLMCHAT_RETAIN_*) wie fuer Apache
+# aus /etc/apache2/envvars
+RETENTION_CMD="[ -r /etc/apache2/envvars ] && . /etc/apache2/envvars; exec /usr/bin/python3 -m llmchat.retention run"
+if command -v systemctl >/dev/null 2>&1 && [ -d /run/systemd/system ]; then
+    cat > /etc/systemd/system/llmchat-retention.service <<UNIT
+[Unit]
+Description=multi-llm-chat: Sitzungen, Caches und Logs aufraeumen
+
+[Service]
+Type=oneshot
+User=www-data
+Group=www-data
+WorkingDirectory=$PROD_DIR/cgi-bin
+ExecStart=/bin/sh -c '$RETENTION_CMD'
+Nice=19
+IOSchedulingClass=idle
+CPUSchedulingPolicy=idle
+UNIT
+    cat > /etc/systemd/system/llmchat-retention.timer <<UNIT
+[Unit]
+Description=multi-llm-chat: taegliches Aufraeumen
+
+[Timer]
+OnCalendar=*-*-* 03:30:00
+RandomizedDelaySec=30min
+Persistent=true
+
+[Install]
+WantedBy=timers.target
+UNIT
+    systemctl daemon-reload
+    systemctl enable --now llmchat-retention.timer
+    echo "Timer installiert: llmchat-retention.timer"
+else
+    echo "30 3 * * * www-data cd $PROD_DIR/cgi-bin && nice -n 19 ionice -c3 /bin/sh -c '$RETENTION_CMD' >/dev/null 2>&1" \
+        > /etc/cron.d/llmchat-retention
+    chmod 644 /etc/cron.d/llmchat-retention
+    echo "Cron-Job installiert: /etc/cron.d/llmchat-retention"
+fi
+
 echo "shell-scripts installed"
 
@@ -34,6 +34,8 @@ cp "$PROD_DIR/manifest"          "$SOURCE_DIR/manifest"
 cp "$PROD_DIR/files-directorys"  "$SOURCE_DIR/files-directorys"
 cp "$PROD_DIR/language.xml"      "$SOURCE_DIR/language.xml"
 cp "$PROD_DIR/cgi-bin/"*.py      "$SOURCE_DIR/cgi-bin/"
+mkdir -p "$SOURCE_DIR/cgi-bin/llmchat"
+cp "$PROD_DIR/cgi-bin/llmchat/"*.py "$SOURCE_DIR/cgi-bin/llmchat/"
 
 chown "$1":"$1" "$SOURCE_DIR/index.html"
 chown "$1":"$1" "$SOURCE_DIR/manifest"
@@ -41,6 +43,7 @@ chown "$1":"$1" "$SOURCE_DIR/files-directorys"
 chown "$1":"$1" "$SOURCE_DIR/language.xml"
 chown "$1":"$1" "$SOURCE_DIR/cgi-bin/"*.py
 chmod 755 "$SOURCE_DIR/cgi-bin/"*.py
+chown -R "$1":"$1" "$SOURCE_DIR/cgi-bin/llmchat"
 
 echo "=== Sync-Back abgeschlossen ==="
 echo "Bitte danach manuell: git add, git commit, git push"
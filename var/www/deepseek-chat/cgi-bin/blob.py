@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Anhaenge hochladen und abrufen (inhaltsadressiert, llmchat/blobs.py).
+
+  GET  /cgi-bin/blob.py?sha256=<hex>&meta=1
+  -> {"sha256": .., "size": .., "refs": ..}  bzw. 404 (noch nicht vorhanden);
+     setzt die Schonfrist neu, damit gc() den Anhang bis zum Speichern laesst
+
+  POST /cgi-bin/blob.py[?sha256=<hex>]     Body: Inhalt (z.B. Dateitext, UTF-8)
+  -> {"sha256": .., "size": .., "ref": "[[blob:sha256:..]]"}
+
+  GET  /cgi-bin/blob.py?sha256=<hex>
+  -> Inhalt (text/plain), unveraenderlich und damit beliebig lange cachebar;
+     ETag ist der Hash, If-None-Match -> 304 ohne den Anhang zu lesen
+
+index.html prueft vor dem Hochladen per meta=1, ob der Inhalt schon
+vorhanden ist, und schreibt dann nur die Referenz in die Nachricht.
+Mit ?sha256= beim POST wird der Inhalt gegen den erwarteten Hash geprueft.
+"""
+
+import os
+
+from llmchat import blobs
+from llmchat.web import cors_headers, not_modified, run_cgi, send_json
+
+METHODS = 'GET, POST, OPTIONS'
+IMMUTABLE = 'private, max-age=31536000, immutable'
+
+
+def handle(req, resp):
+    if req.method == 'OPTIONS':
+        send_json(resp, 200, {}, methods=METHODS)
+        return
+    sha = req.query.get('sha256', '')
+
+    if req.method == 'GET':
+        if not blobs.SHA_RE.match(sha):
+            send_json(resp, 400, {'error': 'sha256 (64 Hex-Zeichen) erforderlich'}, methods=METHODS)
+            return
+        if req.query.get('meta'):
+            info = blobs.info(sha, touch=True)
+            if info is None:
+                send_json(resp, 404, {'error': 'Anhang nicht vorhanden'}, methods=METHODS)
+                return
+            send_json(resp, 200, info, methods=METHODS)
+            return
+        tag = f'"{sha}"'
+        if not_modified(req, tag) and os.path.exists(blobs.path(sha)):
+            resp.start(304, cors_headers(METHODS) + [('Cache-Control', IMMUTABLE), ('ETag', tag)])
+            resp.flush()
+            return
+        data = blobs.read(sha)
+        if data is None:
+            send_json(resp, 404, {'error': 'Anhang nicht vorhanden'}, methods=METHODS)
+            return
+        resp.start(200, [('Content-Type', 'text/plain; charset=utf-8')] + cors_headers(METHODS) + [
+            ('Content-Length', str(len(data))),
+            ('Cache-Control', IMMUTABLE),
+            ('ETag', tag),
+        ])
+        resp.write(data)
+        resp.flush()
+        return
+
+    if req.method != 'POST':
+        send_json(resp, 405, {'error': 'Nur GET und POST erlaubt'}, methods=METHODS)
+        return
+    if not req.body:
+        send_json(resp, 400, {'error': 'Leerer Anhang'}, methods=METHODS)
+        return
+    if sha and blobs.digest(req.body) != sha:
+        send_json(resp, 400, {'error': 'sha256 passt nicht zum Inhalt'}, methods=METHODS)
+        return
+    try:
+        sha = blobs.put(req.body)
+    except blobs.BlobError as e:
+        send_json(resp, 413, {'error': str(e)}, methods=METHODS)
+        return
+    send_json(resp, 200, {'sha256': sha, 'size': len(req.body), 'ref': blobs.ref(sha)}, methods=METHODS)
+
+
+if __name__ == '__main__':
+    run_cgi(handle)
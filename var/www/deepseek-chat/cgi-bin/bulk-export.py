@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Massen-Export gespeicherter Sitzungen als Archiv (llmchat/bulkexport.py).
+
+  POST /cgi-bin/bulk-export.py   {"filter": {"from": "2026-07-01", "to": "2026-09-30"},
+                                  "formats": ["pdf", "md"], "archive": "zip"|"tar"}
+  -> 202 {"archiveId": .., "status": "queued", "total": N, ..}
+     filter: {"all": true} | {"from": .., "to": ..} | {"ids": [..]}; formats optional (alle)
+
+  POST /cgi-bin/bulk-export.py   {"resume": "<archiveId>"}
+  -> 202 (Worker neu gestartet), 200 (schon fertig) oder 409 (laeuft noch)
+
+  GET  /cgi-bin/bulk-export.py                       alle Exporte (Stand)
+  GET  /cgi-bin/bulk-export.py?id=<archiveId>        Stand: status, done/total, percent, failed, bytes
+  GET  /cgi-bin/bulk-export.py?id=<archiveId>&download=1
+  -> fertiges Archiv (application/zip bzw. application/x-tar)
+
+Gerendert wird in einem abgekoppelten Prozess (bulk-export.py --job <id>,
+llmchat/jobs.py), der selbst einen Prozess-Pool startet.
+"""
+
+import json
+import sys
+import time
+
+from llmchat import bulkexport, jobs
+from llmchat.web import cors_headers, run_cgi, send_json
+
+METHODS = 'GET, POST, OPTIONS'
+CHUNK = 1024 * 1024
+
+
+def send_archive(resp, state):
+    path = bulkexport.archive_path(state)
+    day = time.strftime('%Y-%m-%d', time.localtime(state['created']))
+    name = f"deepseek-chat-archiv-{day}-{state['id'][:8]}.{state['archive']}"
+    with open(path, 'rb') as f:
+        resp.start(200, [('Content-Type', bulkexport.ARCHIVES[state['archive']])] + cors_headers(METHODS) + [
+            ('Content-Length', str(state['bytes'])),
+            ('Content-Disposition', f'attachment; filename="{name}"'),
+        ])
+        while True:
+            chunk = f.read(CHUNK)
+            if not chunk:
+                break
+            resp.write(chunk)
+            resp.flush()
+
+
+def handle(req, resp):
+    if req.method == 'OPTIONS':
+        send_json(resp, 200, {}, methods=METHODS)
+        return
+
+    if req.method == 'GET':
+        archive_id = req.query.get('id')
+        if not archive_id:
+            send_json(resp, 200, {'exports': [bulkexport.public(state) for state in bulkexport.list_exports()]},
+                      methods=METHODS)
+            return
+        state = bulkexport.load(archive_id)
+        if state is None:
+            send_json(resp, 404, {'error': 'Export nicht gefunden'}, methods=METHODS)
+            return
+        if not req.query.get('download'):
+            send_json(resp, 200, bulkexport.public(state), methods=METHODS)
+            return
+        if state['status'] != bulkexport.DONE:
+            send_json(resp, 409, {'error': 'Export ist noch nicht fertig', 'status': state['status']},
+                      methods=METHODS)
+            return
+        try:
+            send_archive(resp, state)
+        except OSError:
+            send_json(resp, 410, {'error': 'Archiv nicht mehr vorhanden'}, methods=METHODS)
+        return
+
+    if req.method != 'POST':
+        send_json(resp, 405, {'error': 'Nur GET und POST erlaubt'}, methods=METHODS)
+        return
+    try:
+        request_data = req.json()
+    except json.JSONDecodeError as e:
+        send_json(resp, 400, {'error': 'Ungültiges JSON', 'details': str(e)}, methods=METHODS)
+        return
+    if not isinstance(request_data, dict):
+        send_json(resp, 400, {'error': 'JSON-Objekt erwartet'}, methods=METHODS)
+        return
+
+    if 'resume' in request_data:
+        state = bulkexport.load(request_data['resume'])
+        if state is None:
+            send_json(resp, 404, {'error': 'Export nicht gefunden'}, methods=METHODS)
+            return
+        if state['status'] in (bulkexport.QUEUED, bulkexport.RUNNING):
+            send_json(resp, 409, {'error': 'Export läuft bereits', 'status': state['status']}, methods=METHODS)
+            return
+        if state['status'] == bulkexport.DONE:
+            send_json(resp, 200, bulkexport.public(state), methods=METHODS)
+            return
+        bulkexport.requeue(state)
+        jobs.spawn(__file__, state['id'])
+        send_json(resp, 202, bulkexport.public(state), methods=METHODS)
+        return
+
+    try:
+        state = bulkexport.create(request_data.get('filter'), request_data.get('formats'),
+                                  request_data.get('archive') or 'zip')
+    except ValueError as e:
+        send_json(resp, 400, {'error': str(e)}, methods=METHODS)
+        return
+    jobs.spawn(__file__, state['id'])
+    send_json(resp, 202, bulkexport.public(state), methods=METHODS)
+
+
+if __name__ == '__main__':
+    archive_id = jobs.job_argument(sys.argv)
+    if archive_id:
+        try:
+            bulkexport.run(archive_id)
+        except bulkexport.Busy:
+            pass
+    else:
+        run_cgi(handle)
@@ -0,0 +1,30 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Zaehler der Datei-Caches (BASE_DIR/cache/, Kompressor-Cache) als JSON.
+
+  GET /cgi-bin/cache-stats.py
+  -> {"responses": {"enabled": .., "hits": .., "misses": .., "entries": .., ...},
+      "summaries": {...}, "exports": {...}}
+"""
+
+from llmchat import exportcache, responsecache, summarycache
+from llmchat.web import run_cgi, send_json
+
+
+def handle(req, resp):
+    if req.method == 'OPTIONS':
+        send_json(resp, 200, {}, methods='GET, OPTIONS')
+        return
+    if req.method != 'GET':
+        send_json(resp, 405, {'error': 'Nur GET erlaubt'}, methods='GET, OPTIONS')
+        return
+    send_json(resp, 200, {
+        'responses': responsecache.stats(),
+        'summaries': summarycache.stats(),
+        'exports': exportcache.stats(),
+    }, methods='GET, OPTIONS')
+
+
+if __name__ == '__main__':
+    run_cgi(handle)
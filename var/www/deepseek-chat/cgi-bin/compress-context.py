@@ -34,19 +34,34 @@
 #
 #   { "error": "<Meldung>", "details": "<Detail>" }
 #
+# Hintergrund-Job (index.html): mit "async": true antwortet das Script sofort
+#
+#   HTTP 202  { "jobId": "<id>", "status": "queued" }
+#
+# und fasst in einem abgekoppelten Prozess (compress-context.py --job <id>,
+# llmchat/jobs.py) zusammen. Status/Ergebnis per GET ?job=<id>:
+#
+#   { "jobId": "<id>", "status": "queued" | "running" | "done" | "error",
+#     "elapsed": <Sekunden>, "summary": "<Text>" | "error": "<Meldung>" }
+#
 # Hinweis: Dieses Skript verwendet KEIN Streaming, da die vollstaendige
 #          Zusammenfassung benoetigt wird, bevor contextHistory veraendert wird.
 #
 # =============================================================================
 
 import json
-import sys
 import os
+import sys
 import traceback
 import urllib.request
 import urllib.error
 import datetime
 
+from llmchat import blobs, jobs, summarycache, upstream
+from llmchat.config import env_int
+from llmchat.log import log_request
+from llmchat.web import run_cgi, send_json
+
 # =============================================================================
 # SYSTEM-PROMPT FUER DIE KOMPRIMIERUNG
 # =============================================================================
@@ -69,63 +84,27 @@ COMPRESS_USER_TEMPLATE = "Please compress the following conversation history int
 
 
 # =============================================================================
-# LOGGING (identisch zu den anderen Proxy-Skripten)
+# LOGGING (identisch zu den anderen Proxy-Skripten, eigene Log-Datei)
 # =============================================================================
-def log_to_file(status_code, response_data):
-    """Schreibt ausgewaehlte Informationen in die Log-Datei (ohne API-Key)."""
-    try:
-        if os.environ.get('REQUEST_METHOD') == 'OPTIONS':
-            return
-        log_path = '/var/www/deepseek-chat/cgi-bin/deepseek-chat.log'
-        ip        = os.environ.get('REMOTE_ADDR', 'unknown')
-        method    = os.environ.get('REQUEST_METHOD', 'unknown')
-        path      = os.environ.get('REQUEST_URI', 'unknown')
-        timestamp = datetime.datetime.now().isoformat()
-        error_msg = None
-        details   = None
-        if isinstance(response_data, dict):
-            error_msg = response_data.get('error')
-            details   = response_data.get('details')
-        log_line = f"{timestamp} | IP: {ip} | {method} {path} | Status: {status_code} | KOMPRESSOR"
-        if error_msg:
-            log_line += f" | Error: {error_msg}"
-        if details:
-            details_short = details[:300].replace('\n', ' ')
-            log_line += f" | Details: {details_short}"
-        log_line += "\n"
-        with open(log_path, 'a') as f:
-            f.write(log_line)
-    except Exception:
-        pass
+KOMPRESSOR_LOG_PATH = '/var/www/deepseek-chat/cgi-bin/deepseek-chat.log'
 
 
 # =============================================================================
 # RESPONSE HELPERS
 # =============================================================================
-def send_error(status_code, data):
+METHODS = 'GET, POST, OPTIONS'
+
+
+def send_error(req, resp, status_code, data):
     """Sendet Fehler-Response als JSON."""
-    print(f"Status: {status_code}")
-    print("Content-Type: application/json")
-    print("Access-Control-Allow-Origin: *")
-    print("Access-Control-Allow-Methods: POST, OPTIONS")
-    print("Access-Control-Allow-Headers: Content-Type")
-    print()
-    print(json.dumps(data, ensure_ascii=False))
-    sys.stdout.flush()
-    log_to_file(status_code, data)
-
-
-def send_success(summary):
-    """Sendet Erfolgs-Response mit der Zusammenfassung."""
-    print("Status: 200")
-    print("Content-Type: application/json")
-    print("Access-Control-Allow-Origin: *")
-    print("Access-Control-Allow-Methods: POST, OPTIONS")
-    print("Access-Control-Allow-Headers: Content-Type")
-    print()
-    print(json.dumps({'summary': summary}, ensure_ascii=False))
-    sys.stdout.flush()
-    log_to_file(200, {})
+    send_json(resp, status_code, data, methods=METHODS)
+    log_request(req, status_code, data, log_path=KOMPRESSOR_LOG_PATH, tag='KOMPRESSOR')
+
+
+def send_success(req, resp, result):
+    """Sendet Erfolgs-Response mit der Zusammenfassung ({summary[, segments]})."""
+    send_json(resp, 200, result, methods=METHODS)
+    log_request(req, 200, {}, log_path=KOMPRESSOR_LOG_PATH, tag='KOMPRESSOR')
 
 
 # =============================================================================
@@ -135,6 +114,8 @@ def extract_plain_text(content):
     """Extrahiert nur reinen Text aus content (String oder Array).
     Filtert Base64-Daten, Bild-URLs und Datei-Inhalte heraus."""
     if isinstance(content, str):
+        # Referenz auf einen Anhang (llmchat/blobs.py): Datei-Inhalt weglassen
+        content = blobs.describe(content)
         # Langer Base64-String? Ueberspringen.
         if len(content) > 500 and ',' in content and content.count(' ') < 10:
             return '[Bilddaten — nicht komprimiert]'
@@ -212,7 +193,7 @@ def call_openai_compatible(api_url, api_key, model, compress_messages, extra_hea
     )
 
     try:
-        response = urllib.request.urlopen(req, timeout=120)
+        response = upstream.urlopen(req, timeout=120)
     except urllib.error.HTTPError as e:
         error_body = e.read().decode('utf-8')
         raise RuntimeError(f"API HTTP-Fehler {e.code}: {error_body[:300]}")
@@ -278,7 +259,7 @@ def call_google(api_key, model, compress_messages):
     )
 
     try:
-        response = urllib.request.urlopen(req, timeout=120)
+        response = upstream.urlopen(req, timeout=120)
     except urllib.error.HTTPError as e:
         error_body = e.read().decode('utf-8')
         raise RuntimeError(f"Gemini API HTTP-Fehler {e.code}: {error_body[:300]}")
@@ -300,185 +281,342 @@ def call_google(api_key, model, compress_messages):
     return text
 
 
+# =============================================================================
+# KOMPRIMIERUNG (synchron im Request oder als Hintergrund-Job)
+# =============================================================================
+class CompressorError(Exception):
+    """Ungueltige Anfrage oder fehlende Konfiguration (HTTP-Status + JSON)."""
+
+    def __init__(self, status_code, data):
+        super().__init__(data.get('error', ''))
+        self.status_code = status_code
+        self.data = data
+
+
+# Request-Felder, die ein Hintergrund-Job uebernimmt
+JOB_FIELDS = ('messages', 'compressorService', 'compressorModel', 'hierarchical', 'segments')
+
+# Anbieter -> (Umgebungsvariable, API-URL oder None fuer Gemini, Zusatz-Header)
+COMPRESSOR_SERVICES = {
+    'deepseek':    ('DEEPSEEK_API_KEY', 'https://api.deepseek.com/v1/chat/completions', None),
+    'openai':      ('OPENAI_API_KEY', 'https://api.openai.com/v1/chat/completions',
+                    {'User-Agent': 'Mozilla/5.0 (compatible; kompressor/1.0)'}),
+    'google':      ('GOOGLE_API_KEY', None, None),
+    'huggingface': ('HF_API_KEY', 'https://router.huggingface.co/v1/chat/completions', None),
+    'groq':        ('GRQ_API_KEY', 'https://api.groq.com/openai/v1/chat/completions',
+                    {'User-Agent': 'Mozilla/5.0 (compatible; kompressor/1.0)'}),
+}
+
+
+def validate_request(request_data):
+    """Prueft die Parameter; liefert (messages, compressor_service, compressor_model)."""
+    messages           = request_data.get('messages', [])
+    compressor_service = request_data.get('compressorService', 'deepseek')
+    compressor_model   = request_data.get('compressorModel', 'deepseek-chat')
+
+    if not messages or not isinstance(messages, list):
+        raise CompressorError(400, {
+            'error': 'Ungueltige Anfrage: messages Array erforderlich'
+        })
+
+    if len(messages) < 2:
+        raise CompressorError(400, {
+            'error': 'Zu wenig Nachrichten zum Komprimieren (mindestens 2 erforderlich).'
+        })
+
+    if compressor_service not in COMPRESSOR_SERVICES:
+        raise CompressorError(400, {
+            'error': f'Unbekannter compressorService: {compressor_service}. '
+                     f'Erlaubt: deepseek, openai, google, huggingface, groq'
+        })
+
+    key_name = COMPRESSOR_SERVICES[compressor_service][0]
+    if not os.environ.get(key_name):
+        raise CompressorError(500, {
+            'error': f'{key_name} nicht konfiguriert in /etc/apache2/envvars.'
+        })
+
+    return messages, compressor_service, compressor_model
+
+
+def summarize(conversation_text, compressor_service, compressor_model,
+              template=COMPRESS_USER_TEMPLATE, message_count=0):
+    """Ein Aufruf von LLM #2; liefert die Zusammenfassung (ohne Leerraum).
+
+    Gleicher Konversationstext + Anbieter + Modell kommt aus dem
+    Zusammenfassungs-Cache (llmchat/summarycache.py, KOMPRESSOR_DIR).
+    """
+    cache_key = summarycache.cache_key(COMPRESS_SYSTEM_PROMPT, template, compressor_service,
+                                       compressor_model, conversation_text)
+    cached = summarycache.lookup(cache_key)
+    if cached is not None:
+        return cached
+
+    # Komprimierungs-Messages fuer LLM #2 zusammenstellen
+    # HINWEIS: replace() statt format() — conversation_text kann
+    # geschweifte Klammern enthalten (JSON, Code etc.)
+    user_content = template.replace('{conversation}', conversation_text)
+    compress_messages = [
+        {'role': 'system',  'content': COMPRESS_SYSTEM_PROMPT},
+        {'role': 'user',    'content': user_content}
+    ]
+
+    # API-Aufruf je nach Anbieter
+    key_name, api_url, extra_headers = COMPRESSOR_SERVICES[compressor_service]
+    api_key = os.environ.get(key_name)
+    if api_url is None:
+        summary = call_google(
+            api_key = api_key,
+            model   = compressor_model,
+            compress_messages = compress_messages
+        )
+    else:
+        summary = call_openai_compatible(
+            api_url  = api_url,
+            api_key  = api_key,
+            model    = compressor_model,
+            compress_messages = compress_messages,
+            extra_headers = extra_headers
+        )
+    summary = summary.strip()
+
+    # Ergebnis im Cache ablegen (ersetzt die frueheren kompressor_<Zeit>.txt-Dateien)
+    summarycache.store(cache_key, summary, meta={
+        'service':  compressor_service,
+        'model':    compressor_model,
+        'messages': message_count,
+        'time':     datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    })
+    return summary
+
+
+def conversation_of(messages):
+    """Konversationstext der messages; Fehler, wenn nichts Komprimierbares enthalten ist."""
+    conversation_text = build_conversation_text(messages)
+    if not conversation_text.strip():
+        raise CompressorError(400, {
+            'error': 'Keine komprimierbaren Inhalte in den messages gefunden.'
+        })
+    return conversation_text
+
+
+def compress(messages, compressor_service, compressor_model):
+    """Fasst messages ueber LLM #2 zusammen (oder liefert sie aus dem Cache)."""
+    return summarize(conversation_of(messages), compressor_service, compressor_model,
+                     message_count=len(messages))
+
+
+# =============================================================================
+# HIERARCHISCHE KOMPRIMIERUNG ("hierarchical": true)
+# =============================================================================
+#
+# Statt bei jeder Schwelle den gesamten bisherigen Verlauf (inkl. alter
+# Zusammenfassung) neu zusammenzufassen, wird nur der neue Abschnitt seit der
+# letzten Komprimierung zusammengefasst (Segment der Ebene 0). Segmente
+# liegen in der Zusammenfassungs-Nachricht von index.html (segments) und
+# werden wie ein Zaehler zusammengelegt:
+#
+#   COMPRESS_FANOUT Segmente einer Ebene -> 1 Segment der naechsten Ebene
+#   oberste Ebene (COMPRESS_LEVELS - 1)   -> hoechstens 1 Segment (rollierend)
+#
+# Jeder Durchlauf kostet damit einen Aufruf ueber den neuen Abschnitt plus
+# gelegentlich eine Zusammenlegung begrenzter Groesse — unabhaengig davon,
+# wie lang die Sitzung schon ist.
+#
+# Request:  { "messages": [nur neue Nachrichten], "hierarchical": true,
+#             "segments": [ {"level": 1, "messages": 24, "summary": "..."}, ... ] }
+# Response: { "summary": "<alle Segmente>", "segments": [...] }
+#
+COMPRESS_FANOUT = env_int('LLMCHAT_COMPRESS_FANOUT', 3)
+COMPRESS_LEVELS = env_int('LLMCHAT_COMPRESS_LEVELS', 3)
+
+COMPRESS_MERGE_TEMPLATE = ("Please merge the following consecutive summaries of one conversation "
+                           "(oldest first) into a single structured summary:\n\n{conversation}")
+
+SEGMENT_SEPARATOR = '\n\n---\n\n'
+_WRAPPER_START = '[COMPRESSED CONTEXT'
+_WRAPPER_END = '[END OF COMPRESSED CONTEXT]'
+
+
+def strip_wrapper(text):
+    """Entfernt die [COMPRESSED CONTEXT ...]-Klammer, die index.html um die Zusammenfassung legt."""
+    text = text.strip()
+    if text.startswith(_WRAPPER_START):
+        text = text.split('\n', 1)[1] if '\n' in text else ''
+    if text.endswith(_WRAPPER_END):
+        text = text[:-len(_WRAPPER_END)]
+    return text.strip()
+
+
+def validate_segments(segments):
+    """Segmente aus dem Request; alte Zusammenfassungen ohne Ebene zaehlen als oberste Ebene."""
+    if not segments:
+        return []
+    if not isinstance(segments, list):
+        raise CompressorError(400, {'error': 'Ungueltige Anfrage: segments muss ein Array sein'})
+    top = COMPRESS_LEVELS - 1
+    result = []
+    for segment in segments:
+        if not isinstance(segment, dict) or not isinstance(segment.get('summary'), str):
+            raise CompressorError(400, {'error': 'Ungueltiges Segment: summary erforderlich'})
+        level = segment.get('level')
+        level = top if not isinstance(level, int) else max(0, min(level, top))
+        summary = strip_wrapper(segment['summary'])
+        if summary:
+            result.append({'level': level, 'messages': int(segment.get('messages') or 0),
+                           'summary': summary})
+    return result
+
+
+def merge_segments(segments, merge):
+    """Legt Segmente zusammen, bis jede Ebene unter ihrer Grenze liegt.
+
+    merge(list_of_segments) liefert den Text des zusammengelegten Segments.
+    Die Reihenfolge (aelteste zuerst) bleibt erhalten.
+    """
+    top = COMPRESS_LEVELS - 1
+    changed = True
+    while changed:
+        changed = False
+        for level in range(COMPRESS_LEVELS):
+            limit = 1 if level == top else max(COMPRESS_FANOUT - 1, 1)
+            indices = [i for i, segment in enumerate(segments) if segment['level'] == level]
+            if len(indices) <= limit:
+                continue
+            group = [segments[i] for i in indices]
+            merged = {
+                'level': min(level + 1, top),
+                'messages': sum(segment['messages'] for segment in group),
+                'summary': merge(group),
+            }
+            first = indices[0]
+            segments = [s for i, s in enumerate(segments) if i not in indices]
+            segments.insert(first, merged)
+            changed = True
+            break
+    return segments
+
+
+def render_segments(segments):
+    return SEGMENT_SEPARATOR.join(segment['summary'] for segment in segments)
+
+
+def compress_hierarchical(messages, segments, compressor_service, compressor_model):
+    """Neuen Abschnitt zusammenfassen und mit den bisherigen Segmenten zusammenlegen."""
+    segments = validate_segments(segments)
+    new_messages = [m for m in messages if not m.get('compressed')]
+    summary = summarize(conversation_of(new_messages), compressor_service, compressor_model,
+                        message_count=len(new_messages))
+    segments.append({'level': 0, 'messages': len(new_messages), 'summary': summary})
+
+    def merge(group):
+        text = '\n\n'.join(f'[Summary {n}]:\n{segment["summary"]}'
+                           for n, segment in enumerate(group, 1))
+        return summarize(text, compressor_service, compressor_model,
+                         template=COMPRESS_MERGE_TEMPLATE,
+                         message_count=sum(segment['messages'] for segment in group))
+
+    return merge_segments(segments, merge)
+
+
+def run_compression(request_data):
+    """Fuehrt eine (validierte) Anfrage aus; liefert die Antwort-Daten."""
+    messages, compressor_service, compressor_model = validate_request(request_data)
+    if request_data.get('hierarchical'):
+        segments = compress_hierarchical(messages, request_data.get('segments'),
+                                         compressor_service, compressor_model)
+        return {'summary': render_segments(segments), 'segments': segments}
+    return {'summary': compress(messages, compressor_service, compressor_model)}
+
+
+def run_job(job_id):
+    """Worker-Prozess (compress-context.py --job <id>): fuehrt einen Job aus."""
+    job = jobs.load(job_id)
+    if job is None or job.get('status') != jobs.QUEUED:
+        return
+    jobs.update(job_id, status=jobs.RUNNING)
+    try:
+        result = run_compression(job['payload'])
+    except CompressorError as e:
+        jobs.update(job_id, status=jobs.ERROR, error=e.data.get('error', ''))
+    except RuntimeError as e:
+        jobs.update(job_id, status=jobs.ERROR, error=f'LLM-Aufruf fehlgeschlagen: {e}')
+    except Exception as e:
+        jobs.update(job_id, status=jobs.ERROR, error=f'Interner Serverfehler: {e}')
+    else:
+        jobs.update(job_id, status=jobs.DONE, **result)
+
+
 # =============================================================================
 # MAIN
 # =============================================================================
-def main():
+def handle(req, resp):
     try:
-        request_method = os.environ.get('REQUEST_METHOD', '')
+        request_method = req.method
 
         # OPTIONS Request (CORS Preflight)
         if request_method == 'OPTIONS':
-            send_error(200, {'status': 'ok'})
-            return
-
-        # Nur POST erlaubt
-        if request_method != 'POST':
-            send_error(405, {
-                'error': f'Methode nicht erlaubt: {request_method}. Nur POST ist erlaubt.'
-            })
+            send_error(req, resp, 200, {'status': 'ok'})
             return
 
-        # Content-Length lesen
-        content_length = int(os.environ.get('CONTENT_LENGTH', 0))
-        if content_length == 0:
-            send_error(400, {
-                'error': 'Leere Anfrage. Bitte messages, compressorService und compressorModel senden.'
-            })
-            return
-
-        # POST-Daten lesen
-        post_data    = sys.stdin.read(content_length)
-        request_data = json.loads(post_data)
-
-        # Parameter validieren
-        messages           = request_data.get('messages', [])
-        compressor_service = request_data.get('compressorService', 'deepseek')
-        compressor_model   = request_data.get('compressorModel', 'deepseek-chat')
-
-        if not messages or not isinstance(messages, list):
-            send_error(400, {
-                'error': 'Ungueltige Anfrage: messages Array erforderlich'
-            })
+        # GET ?job=<id>: Status eines Hintergrund-Jobs abfragen
+        if request_method == 'GET':
+            job = jobs.load(req.query.get('job', ''))
+            if job is None:
+                send_json(resp, 404, {'error': 'Job nicht gefunden'}, methods=METHODS)
+                return
+            send_json(resp, 200, jobs.public(job), methods=METHODS)
             return
 
-        if len(messages) < 2:
-            send_error(400, {
-                'error': 'Zu wenig Nachrichten zum Komprimieren (mindestens 2 erforderlich).'
+        # Sonst nur POST erlaubt
+        if request_method != 'POST':
+            send_error(req, resp, 405, {
+                'error': f'Methode nicht erlaubt: {request_method}. Nur GET und POST sind erlaubt.'
             })
             return
 
-        # Konversationstext aufbauen
-        conversation_text = build_conversation_text(messages)
-        if not conversation_text.strip():
-            send_error(400, {
-                'error': 'Keine komprimierbaren Inhalte in den messages gefunden.'
+        # Content-Length pruefen
+        if req.content_length == 0:
+            send_error(req, resp, 400, {
+                'error': 'Leere Anfrage. Bitte messages, compressorService und compressorModel senden.'
             })
             return
 
-        # Komprimierungs-Messages fuer LLM #2 zusammenstellen
-        # HINWEIS: replace() statt format() — conversation_text kann
-        # geschweifte Klammern enthalten (JSON, Code etc.)
-        user_content = COMPRESS_USER_TEMPLATE.replace('{conversation}', conversation_text)
-        compress_messages = [
-            {'role': 'system',  'content': COMPRESS_SYSTEM_PROMPT},
-            {'role': 'user',    'content': user_content}
-        ]
-
-        # API-Aufruf je nach Anbieter
-        summary = ''
-
-        if compressor_service == 'deepseek':
-            api_key = os.environ.get('DEEPSEEK_API_KEY')
-            if not api_key:
-                send_error(500, {
-                    'error': 'DEEPSEEK_API_KEY nicht konfiguriert in /etc/apache2/envvars.'
-                })
-                return
-            summary = call_openai_compatible(
-                api_url  = 'https://api.deepseek.com/v1/chat/completions',
-                api_key  = api_key,
-                model    = compressor_model,
-                compress_messages = compress_messages
-            )
-
-        elif compressor_service == 'openai':
-            api_key = os.environ.get('OPENAI_API_KEY')
-            if not api_key:
-                send_error(500, {
-                    'error': 'OPENAI_API_KEY nicht konfiguriert in /etc/apache2/envvars.'
-                })
-                return
-            summary = call_openai_compatible(
-                api_url  = 'https://api.openai.com/v1/chat/completions',
-                api_key  = api_key,
-                model    = compressor_model,
-                compress_messages = compress_messages,
-                extra_headers = {'User-Agent': 'Mozilla/5.0 (compatible; kompressor/1.0)'}
-            )
-
-        elif compressor_service == 'google':
-            api_key = os.environ.get('GOOGLE_API_KEY')
-            if not api_key:
-                send_error(500, {
-                    'error': 'GOOGLE_API_KEY nicht konfiguriert in /etc/apache2/envvars.'
-                })
-                return
-            summary = call_google(
-                api_key = api_key,
-                model   = compressor_model,
-                compress_messages = compress_messages
-            )
-
-        elif compressor_service == 'huggingface':
-            api_key = os.environ.get('HF_API_KEY')
-            if not api_key:
-                send_error(500, {
-                    'error': 'HF_API_KEY nicht konfiguriert in /etc/apache2/envvars.'
-                })
-                return
-            summary = call_openai_compatible(
-                api_url  = 'https://router.huggingface.co/v1/chat/completions',
-                api_key  = api_key,
-                model    = compressor_model,
-                compress_messages = compress_messages
-            )
-
-        elif compressor_service == 'groq':
-            api_key = os.environ.get('GRQ_API_KEY')
-            if not api_key:
-                send_error(500, {
-                    'error': 'GRQ_API_KEY nicht konfiguriert in /etc/apache2/envvars.'
-                })
-                return
-            summary = call_openai_compatible(
-                api_url  = 'https://api.groq.com/openai/v1/chat/completions',
-                api_key  = api_key,
-                model    = compressor_model,
-                compress_messages = compress_messages,
-                extra_headers = {'User-Agent': 'Mozilla/5.0 (compatible; kompressor/1.0)'}
-            )
+        # POST-Daten lesen und Parameter validieren
+        request_data = req.json()
+        validate_request(request_data)
 
-        else:
-            send_error(400, {
-                'error': f'Unbekannter compressorService: {compressor_service}. '
-                         f'Erlaubt: deepseek, openai, google, huggingface, groq'
+        # "async": true — Job anlegen, Worker starten und sofort antworten
+        if request_data.get('async'):
+            job_id = jobs.create('compress', {
+                key: request_data[key] for key in JOB_FIELDS if key in request_data
             })
+            jobs.spawn(__file__, job_id)
+            send_json(resp, 202, {'jobId': job_id, 'status': jobs.QUEUED}, methods=METHODS)
+            log_request(req, 202, {}, log_path=KOMPRESSOR_LOG_PATH, tag='KOMPRESSOR')
             return
 
-        # Ergebnis in Datei speichern
-        import datetime
-        summary_clean = summary.strip()
-        result_dir = '/var/www/deepseek-chat/kompressor'
-        os.makedirs(result_dir, exist_ok=True)
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        result_file = os.path.join(result_dir, f'kompressor_{timestamp}.txt')
-        with open(result_file, 'w', encoding='utf-8') as f:
-            f.write(f'Zeitpunkt: {timestamp}\n')
-            f.write(f'Anbieter:  {compressor_service}\n')
-            f.write(f'Modell:    {compressor_model}\n')
-            f.write(f'Nachrichten komprimiert: {len(messages)}\n')
-            f.write('=' * 60 + '\n')
-            f.write(summary_clean + '\n')
-
-        # Erfolg
-        send_success(summary_clean)
+        # Synchron (bisheriges Verhalten)
+        send_success(req, resp, run_compression(request_data))
 
     except json.JSONDecodeError as e:
-        send_error(400, {
+        send_error(req, resp, 400, {
             'error': 'Ungültiges JSON',
             'details': str(e)
         })
 
+    except CompressorError as e:
+        send_error(req, resp, e.status_code, e.data)
+
     except RuntimeError as e:
-        send_error(502, {
+        send_error(req, resp, 502, {
             'error': 'LLM-Aufruf fehlgeschlagen',
             'details': str(e)
         })
 
     except Exception as e:
         error_details = traceback.format_exc()
-        send_error(500, {
+        send_error(req, resp, 500, {
             'error': 'Interner Serverfehler',
             'message': str(e),
             'details': error_details
@@ -486,4 +624,8 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    job_id = jobs.job_argument(sys.argv)
+    if job_id:
+        run_job(job_id)
+    else:
+        run_cgi(handle)
@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Token-Zaehlung mit dem Vokabular des Modells (llmchat/tokens.py).
+
+  POST /cgi-bin/count-tokens.py
+  {"model": "gpt-4o", "texts": ["...", "..."]}
+  -> {"model": .., "encoding": "o200k_base", "method": "bpe", "approximate": false,
+      "counts": [12, 40], "total": 52}
+
+  {"model": "gpt-4o", "messages": [{"role": .., "content": ..}, ...]}
+  -> counts je Nachricht (nur Inhalt), total inkl. Nachrichten-Overhead
+
+Mehrere Texte werden in einem Aufruf gezaehlt (index.html schickt alle noch
+nicht gezaehlten Nachrichten auf einmal). method "estimate" bedeutet: kein
+Vokabular installiert, Zaehlung wie bisher 0,25 Token pro Zeichen.
+Referenzen auf Anhaenge (llmchat/blobs.py) werden mit ihrem Inhalt gezaehlt.
+"""
+
+from llmchat import blobs, tokens
+from llmchat.web import run_cgi, send_json
+
+METHODS = 'POST, OPTIONS'
+MAX_ITEMS = 2000
+
+
+def handle(req, resp):
+    if req.method == 'OPTIONS':
+        send_json(resp, 200, {}, methods=METHODS)
+        return
+    if req.method != 'POST':
+        send_json(resp, 405, {'error': 'Nur POST erlaubt'}, methods=METHODS)
+        return
+    try:
+        data = req.json()
+    except ValueError:
+        send_json(resp, 400, {'error': 'Ungültiges JSON'}, methods=METHODS)
+        return
+    model = data.get('model') if isinstance(data, dict) else None
+    texts = data.get('texts') if isinstance(data, dict) else None
+    messages = data.get('messages') if isinstance(data, dict) else None
+    if not isinstance(model, str) or not model:
+        send_json(resp, 400, {'error': 'model erforderlich'}, methods=METHODS)
+        return
+
+    if isinstance(texts, list) and len(texts) <= MAX_ITEMS and all(isinstance(t, str) for t in texts):
+        counts, info = tokens.count_texts(model, [blobs.resolve(text) for text in texts])
+        total = sum(counts)
+    elif isinstance(messages, list) and len(messages) <= MAX_ITEMS:
+        total, counts, info = tokens.count_messages(model, blobs.resolve_messages(messages))
+    else:
+        send_json(resp, 400, {
+            'error': f'texts (Strings) oder messages erforderlich, höchstens {MAX_ITEMS}'
+        }, methods=METHODS)
+        return
+
+    result = {'model': model, 'counts': counts, 'total': total}
+    result.update(info)
+    send_json(resp, 200, result, methods=METHODS)
+
+
+if __name__ == '__main__':
+    run_cgi(handle)
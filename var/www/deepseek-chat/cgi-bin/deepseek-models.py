@@ -6,12 +6,13 @@ Returns available models as JSON
 """
 
 import os
-import sys
 import json
 import urllib.request
 import urllib.error
 
-DEEPSEEK_API_KEY = os.environ.get('DEEPSEEK_API_KEY', '')
+from llmchat import upstream
+from llmchat.web import run_cgi
+
 MODELS_URL = 'https://api.deepseek.com/v1/models'
 
 def log_to_file(message):
@@ -23,38 +24,43 @@ def log_to_file(message):
     except Exception:
         pass
 
-def send_json(data, status=200):
-    status_text = '200 OK' if status == 200 else f'{status} Error'
-    print(f'Status: {status_text}')
-    print('Content-Type: application/json')
-    print('Access-Control-Allow-Origin: *')
-    print()
-    print(json.dumps(data))
-
-try:
-    if not DEEPSEEK_API_KEY:
-        send_json({'error': 'API key not configured'}, 500)
-        sys.exit(0)
-
-    req = urllib.request.Request(
-        MODELS_URL,
-        headers={
-            'Authorization': f'Bearer {DEEPSEEK_API_KEY}',
-            'Content-Type': 'application/json',
-        },
-        method='GET'
-    )
-
-    with urllib.request.urlopen(req, timeout=10) as resp:
-        body = resp.read().decode('utf-8')
-        data = json.loads(body)
-        send_json(data)
-        log_to_file('models fetched: ' + str([m.get('id') for m in data.get('data', [])]))
-
-except urllib.error.HTTPError as e:
-    body = e.read().decode('utf-8')
-    log_to_file(f'HTTP error {e.code}: {body}')
-    send_json({'error': f'HTTP {e.code}', 'details': body}, e.code)
-except Exception as e:
-    log_to_file(f'Exception: {str(e)}')
-    send_json({'error': str(e)}, 500)
+def send_json(resp, data, status=200):
+    resp.start(status, [
+        ('Content-Type', 'application/json'),
+        ('Access-Control-Allow-Origin', '*'),
+    ])
+    resp.write(json.dumps(data) + '\n')
+
+def handle(req, resp):
+    api_key = os.environ.get('DEEPSEEK_API_KEY', '')
+    try:
+        if not api_key:
+            send_json(resp, {'error': 'API key not configured'}, 500)
+            return
+
+        req_upstream = urllib.request.Request(
+            MODELS_URL,
+            headers={
+                'Authorization': f'Bearer {api_key}',
+                'Content-Type': 'application/json',
+            },
+            method='GET'
+        )
+
+        with upstream.urlopen(req_upstream, timeout=10) as models_response:
+            body = models_response.read().decode('utf-8')
+            data = json.loads(body)
+            send_json(resp, data)
+            log_to_file('models fetched: ' + str([m.get('id') for m in data.get('data', [])]))
+
+    except urllib.error.HTTPError as e:
+        body = e.read().decode('utf-8')
+        log_to_file(f'HTTP error {e.code}: {body}')
+        send_json(resp, {'error': f'HTTP {e.code}', 'details': body}, e.code)
+    except Exception as e:
+        log_to_file(f'Exception: {str(e)}')
+        if not resp.started:
+            send_json(resp, {'error': str(e)}, 500)
+
+if __name__ == '__main__':
+    run_cgi(handle)
@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Alle Exportformate eines Chats in einem ZIP.
+
+  POST /cgi-bin/export-bundle.py   {"chatData": {...}, "formats": ["pdf", "md", "txt", "rtf"]}
+  -> application/zip (Anhang deepseek-chat-export.zip)
+
+formats ist optional (Vorgabe: alle vier). chatData wird einmal hochgeladen
+und einmal normalisiert (llmchat/exports.py); die Textformate rendern
+nebenher in Threads, waehrend das PDF im Haupt-Thread seitenweise direkt in
+sein ZIP-Mitglied geschrieben wird. Jedes Format geht ueber den
+Export-Cache - ein vorher einzeln exportiertes Format ist ein Treffer und
+umgekehrt.
+
+Das ZIP wird ohne Content-Length gestreamt (zipfile schreibt auf nicht
+seekbare Ausgaben Datendeskriptoren). Ein zu grosses PDF (Schaetzung ueber
+LLMCHAT_PDF_MAX_PAGES) wird vorab mit 413 abgelehnt; wird das Budget erst
+beim Rendern ueberschritten, endet das PDF im ZIP mit der Hinweisseite und
+wird nicht gecacht.
+"""
+
+import json
+import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from llmchat import exportcache, exportpdf, exports, pdfstream
+from llmchat.web import cors_headers, run_cgi, send_json
+
+FILENAME = 'deepseek-chat-export.zip'
+
+
+class ZipOutput:
+    """Nur-schreibende Ausgabe fuer zipfile: reicht alles an resp weiter."""
+
+    def __init__(self, resp):
+        self.resp = resp
+
+    def write(self, data):
+        self.resp.write(data)
+        return len(data)
+
+    def flush(self):
+        self.resp.flush()
+
+
+class RecordingMember:
+    """ZIP-Mitglied als Ziel fuer pdfstream; sammelt fuer den Export-Cache mit."""
+
+    def __init__(self, member, recorder):
+        self.member = member
+        self.recorder = recorder
+
+    def write(self, data):
+        self.recorder.add(data)
+        self.member.write(data)
+
+
+def requested_formats(request_data):
+    formats = request_data.get('formats') or list(exports.FORMATS)
+    if not isinstance(formats, list) or any(fmt not in exports.FORMATS for fmt in formats):
+        raise ValueError(f'Unbekanntes Format, erlaubt sind: {", ".join(exports.FORMATS)}')
+    return list(dict.fromkeys(formats))
+
+
+def write_pdf(zf, chat_data, doc):
+    """PDF nach zf: aus dem Cache oder seitenweise gerendert."""
+    key = exportcache.cache_key('pdf', chat_data)
+    entry = exportcache.lookup(key)
+    if entry is not None:
+        meta, data = entry
+        zf.writestr(meta.get('filename') or exports.filename('pdf', doc), data,
+                    compress_type=zipfile.ZIP_STORED)
+        return
+    name = exports.filename('pdf', doc)
+    recorder = exportcache.Recorder(key)
+    # PDF-Streams sind schon komprimiert
+    info = zipfile.ZipInfo(name)
+    info.compress_type = zipfile.ZIP_STORED
+    with zf.open(info, 'w', force_zip64=True) as member:
+        try:
+            exportpdf.render(doc, RecordingMember(member, recorder))
+        except pdfstream.BudgetExceeded as e:
+            print(f'export-bundle: {e}, PDF nach {e.pages} Seiten mit Hinweis beendet', file=sys.stderr)
+            return
+    exportcache.store(key, recorder.data(), name)
+
+
+def handle(req, resp):
+    try:
+        if req.method == 'OPTIONS':
+            send_json(resp, 200, {'status': 'ok'})
+            return
+        if req.method != 'POST':
+            send_json(resp, 405, {'error': f'Methode nicht erlaubt: {req.method}'})
+            return
+        if req.content_length == 0:
+            send_json(resp, 400, {'error': 'Leere Anfrage'})
+            return
+
+        request_data = req.json()
+        chat_data = request_data.get('chatData')
+        if not chat_data:
+            send_json(resp, 400, {'error': 'Keine Chat-Daten'})
+            return
+        try:
+            formats = requested_formats(request_data)
+        except ValueError as e:
+            send_json(resp, 400, {'error': str(e)})
+            return
+        doc = exports.normalize(chat_data)
+
+        if 'pdf' in formats:
+            estimate = exportpdf.estimate_pages(doc)
+            if exportpdf.MAX_PAGES and estimate > exportpdf.MAX_PAGES:
+                send_json(resp, 413, {
+                    'error': f'Export zu groß: mindestens {estimate} Seiten, erlaubt sind {exportpdf.MAX_PAGES}',
+                    'pages': estimate, 'maxPages': exportpdf.MAX_PAGES})
+                return
+
+        text_formats = [fmt for fmt in formats if fmt in exports.TEXT_FORMATS]
+        with ThreadPoolExecutor(max_workers=max(1, len(text_formats))) as pool:
+            pending = [(fmt, pool.submit(exports.export, fmt, chat_data, doc)) for fmt in text_formats]
+
+            resp.start(200, [('Content-Type', 'application/zip')] + cors_headers() + [
+                ('Content-Disposition', f'attachment; filename="{FILENAME}"'),
+            ])
+            out = ZipOutput(resp)
+            try:
+                with zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+                    if 'pdf' in formats:
+                        write_pdf(zf, chat_data, doc)
+                        out.flush()
+                    for fmt, future in pending:
+                        data, name = future.result()
+                        zf.writestr(name, data)
+                out.flush()
+            except Exception as e:
+                # Status und Header sind schon gesendet - nur noch abbrechen
+                print(f'export-bundle: Abbruch während der Ausgabe: {e}', file=sys.stderr)
+
+    except json.JSONDecodeError as e:
+        send_json(resp, 400, {'error': 'Ungültiges JSON', 'details': str(e)})
+    except Exception as e:
+        send_json(resp, 500, {'error': 'Interner Serverfehler', 'details': str(e)})
+
+
+if __name__ == '__main__':
+    run_cgi(handle)
@@ -1,238 +1,161 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
+"""
+PDF-Export eines Chats.
+
+  POST /cgi-bin/export-pdf.py   {"chatData": {...}}
+  -> application/pdf (Anhang deepseek-chat-export.pdf)
+
+Das PDF wird seitenweise erzeugt (llmchat/pdfstream.py): Die ersten
+LLMCHAT_PDF_SPOOL_KB (256) werden gesammelt - ist das Dokument bis dahin fertig, geht es mit
+Content-Length hinaus, und Fehler koennen noch als JSON gemeldet werden.
+Danach beginnt die Antwort ohne Content-Length (Apache: chunked), jede
+fertige Seite wird sofort geschrieben. Der Speicherbedarf haengt damit nicht
+mehr von der Laenge des Chats ab, und Apache sieht laufend Ausgabe statt
+minutenlang keine (Timeout).
+
+Budget: LLMCHAT_PDF_MAX_PAGES Seiten (2000) und LLMCHAT_PDF_MAX_MB (100).
+Laesst schon die Textmenge mehr Seiten erwarten, antwortet das Script sofort
+mit 413. Wird das Budget erst beim Rendern ueberschritten, endet das PDF nach
+der laufenden Seite mit einer Hinweisseite (oder 413, solange noch nichts
+gesendet wurde).
+"""
 
 import json
 import sys
-import os
-from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import cm
-from reportlab.lib.colors import HexColor
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle
-from reportlab.lib.enums import TA_LEFT, TA_CENTER
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-
-def send_response(status_code, data, content_type='application/json'):
+
+from llmchat import exportcache, exportpdf, exports, pdfstream
+from llmchat.config import env_int
+from llmchat.exportpdf import MAX_BYTES, MAX_PAGES
+from llmchat.web import run_cgi, send_json
+
+SPOOL_BYTES = env_int('LLMCHAT_PDF_SPOOL_KB', 256) * 1024
+FILENAME = exports.filename('pdf', None)
+
+def send_response(resp, status_code, data, content_type='application/json', cache_key=None):
     """Sendet HTTP-Response zurück."""
     if isinstance(data, bytes):
-        # Für Binärdaten: alles über stdout.buffer schreiben
-        headers = f"Status: {status_code}\r\n"
-        headers += f"Content-Type: {content_type}\r\n"
-        headers += "Access-Control-Allow-Origin: *\r\n"
-        headers += "Access-Control-Allow-Methods: POST, OPTIONS\r\n"
-        headers += "Access-Control-Allow-Headers: Content-Type\r\n"
-        headers += f"Content-Disposition: attachment; filename=\"deepseek-chat-export.pdf\"\r\n"
-        headers += f"Content-Length: {len(data)}\r\n"
-        headers += "\r\n"
-        sys.stdout.buffer.write(headers.encode('utf-8'))
-        sys.stdout.buffer.write(data)
-        sys.stdout.buffer.flush()
-    else:
-        # Für JSON-Daten: normale print Ausgabe
-        print(f"Status: {status_code}")
-        print(f"Content-Type: {content_type}")
-        print("Access-Control-Allow-Origin: *")
-        print("Access-Control-Allow-Methods: POST, OPTIONS")
-        print("Access-Control-Allow-Headers: Content-Type")
-        print()
-        print(json.dumps(data, ensure_ascii=False))
-        sys.stdout.flush()
-
-def calculate_statistics(messages):
-    """Berechnet Statistiken aus den Nachrichten."""
-    total_messages = len(messages)
-    user_messages = len([m for m in messages if m['role'] == 'user'])
-    ai_messages = len([m for m in messages if m['role'] == 'assistant'])
-    
-    modes = {}
-    files_count = 0
-    total_tokens = 0
-    
-    for msg in messages:
-        mode = msg.get('mode', 'chat')
-        modes[mode] = modes.get(mode, 0) + 1
-        if msg.get('hasFile', False):
-            files_count += 1
-        total_tokens += msg.get('estimatedTokens', 0)
-    
-    # Chat-Dauer
-    if messages:
-        first_time = messages[0].get('timestamp', '')
-        last_time = messages[-1].get('timestamp', '')
-        duration = f"{first_time} bis {last_time}"
+        # Für Binärdaten: Rohdaten mit Content-Length
+        exports.send_file(resp, 'pdf', data, FILENAME)
+        exportcache.store(cache_key, data, FILENAME)
     else:
-        duration = "Keine Nachrichten"
-    
-    return {
-        'total': total_messages,
-        'user': user_messages,
-        'ai': ai_messages,
-        'modes': modes,
-        'files': files_count,
-        'tokens': total_tokens,
-        'duration': duration
-    }
-
-def create_pdf(chat_data):
-    """Erstellt PDF aus Chat-Daten."""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm)
-    
-    # Styles
-    styles = getSampleStyleSheet()
-    
-    # Custom Styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=HexColor('#4dabf7'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=HexColor('#0056b3'),
-        spaceAfter=12,
-        spaceBefore=12
-    )
-    
-    user_style = ParagraphStyle(
-        'UserMessage',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=HexColor('#4dabf7'),
-        leftIndent=20,
-        spaceAfter=6
-    )
-    
-    ai_style = ParagraphStyle(
-        'AIMessage',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=HexColor('#000000'),
-        leftIndent=40,
-        spaceAfter=12
-    )
-    
-    stats_style = ParagraphStyle(
-        'Stats',
-        parent=styles['Normal'],
-        fontSize=9,
-        spaceAfter=6
-    )
-    
-    # Content aufbauen
-    story = []
-    
-    # Titel
-    story.append(Paragraph("DeepSeek Chat - Export", title_style))
-    story.append(Spacer(1, 0.5*cm))
-    
-    # Server-Info
-    server_info = chat_data.get('serverInfo', {})
-    story.append(Paragraph(f"<b>Server:</b> {server_info.get('name', 'Unbekannt')} (IP: {server_info.get('ip', 'Unbekannt')})", styles['Normal']))
-    story.append(Paragraph(f"<b>Export-Datum:</b> {chat_data.get('timestamp', 'Unbekannt')}", styles['Normal']))
-    
-    settings = chat_data.get('settings', {})
-    story.append(Paragraph(f"<b>Einstellungen:</b> {settings.get('addressForm', 'sie')}-Form, Modus: {settings.get('defaultMode', 'chat')}", styles['Normal']))
-    story.append(Spacer(1, 0.5*cm))
-    
-    # Statistiken
-    messages = chat_data.get('messages', [])
-    stats = calculate_statistics(messages)
-    
-    story.append(Paragraph("Statistiken", heading_style))
-    story.append(Paragraph(f"<b>Nachrichten gesamt:</b> {stats['total']} (Benutzer: {stats['user']}, KI: {stats['ai']})", stats_style))
-    
-    modes_text = ", ".join([f"{mode}: {count}x" for mode, count in stats['modes'].items()])
-    story.append(Paragraph(f"<b>Verwendete Modi:</b> {modes_text}", stats_style))
-    story.append(Paragraph(f"<b>Hochgeladene Dateien:</b> {stats['files']}", stats_style))
-    story.append(Paragraph(f"<b>Geschaetzte Token-Nutzung:</b> {stats['tokens']}", stats_style))
-    story.append(Paragraph(f"<b>Chat-Dauer:</b> {stats['duration']}", stats_style))
-    story.append(Spacer(1, 0.5*cm))
-    
-    # Inhaltsverzeichnis
-    story.append(Paragraph("Inhaltsverzeichnis", heading_style))
-    for idx, msg in enumerate(messages, 1):
-        role = "Benutzer" if msg['role'] == 'user' else "KI"
-        preview = msg['content'][:50] + "..." if len(msg['content']) > 50 else msg['content']
-        preview = preview.replace('<', '&lt;').replace('>', '&gt;')
-        story.append(Paragraph(f"Nachricht {idx} ({role}): {preview}", stats_style))
-    
-    story.append(PageBreak())
-    
-    # Nachrichten
-    story.append(Paragraph("Chat-Verlauf", heading_style))
-    
-    for idx, msg in enumerate(messages, 1):
-        role = "Benutzer" if msg['role'] == 'user' else "KI"
-        timestamp = msg.get('timestamp', '')
-        mode = msg.get('mode', 'chat')
-        content = msg['content'].replace('<', '&lt;').replace('>', '&gt;').replace('\n', '<br/>')
-        
-        # Mode-Badge
-        mode_color = '#28a745' if mode == 'deepthink' else '#17a2b8' if mode == 'search' else '#6c757d'
-        mode_badge = f'<font color="{mode_color}">[{mode.upper()}]</font>'
-        
-        # Nachricht
-        style = user_style if msg['role'] == 'user' else ai_style
-        story.append(Paragraph(f"<b>Nachricht {idx} - {role}</b> {mode_badge} <i>({timestamp})</i>", heading_style))
-        story.append(Paragraph(content, style))
-        story.append(Spacer(1, 0.3*cm))
-    
-    # PDF erstellen
-    doc.build(story)
-    pdf_data = buffer.getvalue()
-    buffer.close()
-    
-    return pdf_data
-
-def main():
+        # Für JSON-Daten
+        send_json(resp, status_code, data)
+
+class PDFOutput:
+    """Ausgabeziel fuer pdfstream: erst puffern, ab SPOOL_BYTES direkt senden.
+
+    Mit cache_key wird das fertige PDF im Export-Cache abgelegt (finish()).
+    """
+
+    def __init__(self, resp, spool_bytes=SPOOL_BYTES, cache_key=None):
+        self.resp = resp
+        self.spool_bytes = spool_bytes
+        self.cache_key = cache_key
+        self.recorder = exportcache.Recorder(cache_key)
+        self.buffer = []
+        self.size = 0
+        self.streaming = False
+
+    def write(self, data):
+        if not data:
+            return
+        if self.streaming:
+            self.recorder.add(data)
+            self.resp.write(data)
+            self.resp.flush()
+            return
+        self.buffer.append(data)
+        self.size += len(data)
+        if self.size >= self.spool_bytes:
+            self.streaming = True
+            self.resp.start(200, exports.file_headers('pdf', FILENAME))
+            self._drain()
+
+    def _drain(self):
+        for chunk in self.buffer:
+            self.recorder.add(chunk)
+            self.resp.write(chunk)
+        self.buffer = []
+        self.resp.flush()
+
+    def finish(self):
+        """Fertiges Dokument: Rest senden (kleines PDF komplett mit Content-Length)."""
+        if not self.streaming:
+            send_response(self.resp, 200, b''.join(self.buffer), content_type='application/pdf',
+                          cache_key=self.cache_key)
+            self.buffer = []
+            return
+        self.resp.flush()
+        exportcache.store(self.cache_key, self.recorder.data(), FILENAME)
+
+def handle(req, resp):
     try:
-        request_method = os.environ.get('REQUEST_METHOD', '')
+        request_method = req.method
 
         # OPTIONS Request
         if request_method == 'OPTIONS':
-            send_response(200, {'status': 'ok'})
+            send_response(resp, 200, {'status': 'ok'})
             return
 
         # Nur POST erlaubt
         if request_method != 'POST':
-            send_response(405, {'error': f'Methode nicht erlaubt: {request_method}'})
+            send_response(resp, 405, {'error': f'Methode nicht erlaubt: {request_method}'})
             return
 
-        # Content-Length lesen
-        content_length = int(os.environ.get('CONTENT_LENGTH', 0))
-        if content_length == 0:
-            send_response(400, {'error': 'Leere Anfrage'})
+        # Content-Length pruefen
+        if req.content_length == 0:
+            send_response(resp, 400, {'error': 'Leere Anfrage'})
             return
 
         # POST-Daten lesen
-        post_data = sys.stdin.read(content_length)
-        request_data = json.loads(post_data)
+        request_data = req.json()
         
         chat_data = request_data.get('chatData')
         if not chat_data:
-            send_response(400, {'error': 'Keine Chat-Daten'})
+            send_response(resp, 400, {'error': 'Keine Chat-Daten'})
             return
+        cache_key = exportcache.cache_key('pdf', chat_data)
+        entry = exportcache.lookup(cache_key)
+        if entry is not None:
+            meta, data = entry
+            exports.send_file(resp, 'pdf', data, meta.get('filename') or FILENAME)
+            return
+        doc = exports.normalize(chat_data)
 
-        # PDF erstellen
-        pdf_data = create_pdf(chat_data)
-        
-        # PDF zurückschicken
-        send_response(200, pdf_data, content_type='application/pdf')
+        # Budget vorab pruefen
+        estimate = exportpdf.estimate_pages(doc)
+        if MAX_PAGES and estimate > MAX_PAGES:
+            send_response(resp, 413, {
+                'error': f'Export zu groß: mindestens {estimate} Seiten, erlaubt sind {MAX_PAGES}',
+                'pages': estimate, 'maxPages': MAX_PAGES})
+            return
+
+        # PDF erstellen und seitenweise zurückschicken
+        out = PDFOutput(resp, cache_key=cache_key)
+        try:
+            exportpdf.render(doc, out)
+        except pdfstream.BudgetExceeded as e:
+            if not out.streaming:
+                send_response(resp, 413, {'error': f'Export zu groß: {e}', 'pages': e.pages,
+                                          'maxPages': MAX_PAGES, 'maxBytes': MAX_BYTES})
+                return
+            print(f'export-pdf: {e}, PDF nach {e.pages} Seiten mit Hinweis beendet', file=sys.stderr)
+            out.resp.flush()
+            return
+        except Exception as e:
+            if not out.streaming:
+                raise
+            # Status und Header sind schon gesendet - nur noch abbrechen
+            print(f'export-pdf: Abbruch während der Ausgabe: {e}', file=sys.stderr)
+            return
+        out.finish()
 
     except json.JSONDecodeError as e:
-        send_response(400, {'error': 'Ungültiges JSON', 'details': str(e)})
+        send_response(resp, 400, {'error': 'Ungültiges JSON', 'details': str(e)})
     except Exception as e:
-        send_response(500, {'error': 'Interner Serverfehler', 'details': str(e)})
+        send_response(resp, 500, {'error': 'Interner Serverfehler', 'details': str(e)})
 
 if __name__ == '__main__':
-    main()
+    run_cgi(handle)
 
@@ -1,79 +1,33 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-export-txt.py - Chat als TXT exportieren
+export-txt.py - Chat als TXT exportieren (Renderer in llmchat/exports.py)
 /var/www/deepseek-chat/cgi-bin/export-txt.py
 """
 
-import sys
 import json
-import os
-from datetime import datetime
 
-def send_response(content, content_type, filename):
-    if isinstance(content, str):
-        content = content.encode('utf-8')
-    sys.stdout.buffer.write(f"Content-Type: {content_type}\r\n".encode())
-    sys.stdout.buffer.write(f"Content-Disposition: attachment; filename=\"{filename}\"\r\n".encode())
-    sys.stdout.buffer.write(f"Content-Length: {len(content)}\r\n".encode())
-    sys.stdout.buffer.write(b"\r\n")
-    sys.stdout.buffer.write(content)
-    sys.stdout.buffer.flush()
+from llmchat import exports
+from llmchat.web import run_cgi
 
-def send_error(message, code=500):
-    sys.stdout.write(f"Status: {code}\r\n")
-    sys.stdout.write("Content-Type: application/json\r\n\r\n")
-    sys.stdout.write(json.dumps({"error": message}))
-    sys.stdout.flush()
+def send_error(resp, message, code=500):
+    resp.start(code, [('Content-Type', 'application/json')])
+    resp.write(json.dumps({"error": message}))
+    resp.flush()
 
-def main():
+def handle(req, resp):
     try:
-        if os.environ.get('REQUEST_METHOD') != 'POST':
-            send_error("Nur POST erlaubt", 405)
+        if req.method != 'POST':
+            send_error(resp, "Nur POST erlaubt", 405)
             return
 
-        content_length = int(os.environ.get('CONTENT_LENGTH', 0))
-        raw_data = sys.stdin.buffer.read(content_length)
-        data = json.loads(raw_data.decode('utf-8'))
+        data = req.json()
         chat_data = data.get('chatData', {})
-        messages = chat_data.get('messages', [])
-        server_info = chat_data.get('serverInfo', {})
-        timestamp = chat_data.get('timestamp', datetime.now().isoformat())
-
-        lines = []
-        lines.append("=" * 60)
-        lines.append("DEEPSEEK CHAT - EXPORT")
-        lines.append("=" * 60)
-        lines.append(f"Server: {server_info.get('name', 'DeepSeek Chat')}")
-        lines.append(f"IP:     {server_info.get('ip', 'unbekannt')}")
-        lines.append(f"Datum:  {timestamp[:10]}  Uhrzeit: {timestamp[11:19]}")
-        lines.append(f"Anzahl Nachrichten: {len(messages)}")
-        lines.append("=" * 60)
-        lines.append("")
-
-        for msg in messages:
-            role = msg.get('role', 'unknown')
-            content = msg.get('content', '')
-            msg_time = msg.get('timestamp', '')[:19].replace('T', ' ')
-
-            if role == 'user':
-                lines.append(f"USER [{msg_time}]:")
-                lines.append("-" * 40)
-            else:
-                lines.append(f"DEEPSEEK AI [{msg_time}]:")
-                lines.append("-" * 40)
-
-            lines.append(content)
-            lines.append("")
-            lines.append("=" * 60)
-            lines.append("")
-
-        txt_content = "\n".join(lines)
-        filename = f"deepseek-chat-{timestamp[:10]}.txt"
-        send_response(txt_content, "text/plain; charset=utf-8", filename)
+        content, filename = exports.export('txt', chat_data)
+        exports.send_file(resp, 'txt', content, filename)
 
     except Exception as e:
-        send_error(str(e))
+        send_error(resp, str(e))
 
 if __name__ == '__main__':
-    main()
+    run_cgi(handle)
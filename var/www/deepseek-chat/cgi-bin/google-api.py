@@ -1,5 +1,3 @@
-############ FILE: var/www/deepseek-chat/cgi-bin/google-api.py ############
----------------------------------------------------------
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
@@ -35,53 +33,19 @@
 # =============================================================================
 
 import json
-import sys
 import os
 import traceback
 import urllib.request
 import urllib.error
-import datetime
 
-def log_to_file(status_code, response_data):
-    """Schreibt ausgewählte Informationen in die Log-Datei (ohne API-Key)."""
-    try:
-        if os.environ.get('REQUEST_METHOD') == 'OPTIONS':
-            return
-        log_path = '/var/www/deepseek-chat/logs/multi-llm-chat.log'
-        os.makedirs(os.path.dirname(log_path), exist_ok=True)
-        ip = os.environ.get('REMOTE_ADDR', 'unknown')
-        method = os.environ.get('REQUEST_METHOD', 'unknown')
-        path = os.environ.get('REQUEST_URI', 'unknown')
-        timestamp = datetime.datetime.now().isoformat()
-        error_msg = None
-        details = None
-        if isinstance(response_data, dict):
-            error_msg = response_data.get('error')
-            details = response_data.get('details')
-        log_line = f"{timestamp} | IP: {ip} | {method} {path} | Status: {status_code}"
-        if error_msg:
-            log_line += f" | Error: {error_msg}"
-        if details:
-            # Details auf 300 Zeichen begrenzen
-            details_short = details[:300].replace('\n', ' ')
-            log_line += f" | Details: {details_short}"
-        log_line += "\n"
-        with open(log_path, 'a') as f:
-            f.write(log_line)
-    except Exception:
-        pass
+from llmchat import blobs, relay, responsecache, sessions, sse, stream, tokens, upstream
+from llmchat.log import log_request
+from llmchat.web import run_cgi, send_json, start_sse
 
-def send_error(status_code, data):
+def send_error(req, resp, status_code, data):
     """Sendet Fehler-Response als JSON."""
-    print(f"Status: {status_code}")
-    print("Content-Type: application/json")
-    print("Access-Control-Allow-Origin: *")
-    print("Access-Control-Allow-Methods: POST, OPTIONS")
-    print("Access-Control-Allow-Headers: Content-Type")
-    print()
-    print(json.dumps(data, ensure_ascii=False))
-    sys.stdout.flush()
-    log_to_file(status_code, data)
+    send_json(resp, status_code, data)
+    log_request(req, status_code, data)
 
 def convert_messages_to_gemini(messages, audio_data=None, audio_mime_type=None):
     """Konvertiert OpenAI-Format messages in Gemini-Format."""
@@ -108,51 +72,53 @@ def convert_messages_to_gemini(messages, audio_data=None, audio_mime_type=None):
             })
     return system_instruction, contents
 
-def main():
+def handle(req, resp):
     try:
         # API-Key aus Umgebungsvariable laden
         api_key = os.environ.get('GOOGLE_API_KEY')
         if not api_key:
-            send_error(500, {
+            send_error(req, resp, 500, {
                 'error': 'API-Key nicht konfiguriert. Bitte GOOGLE_API_KEY in /etc/apache2/envvars setzen.'
             })
             return
 
-        request_method = os.environ.get('REQUEST_METHOD', '')
+        request_method = req.method
 
         # OPTIONS Request (CORS Preflight)
         if request_method == 'OPTIONS':
-            send_error(200, {'status': 'ok'})
+            send_error(req, resp, 200, {'status': 'ok'})
             return
 
         # Nur POST erlaubt
         if request_method != 'POST':
-            send_error(405, {
+            send_error(req, resp, 405, {
                 'error': f'Methode nicht erlaubt: {request_method}. Nur POST ist erlaubt.'
             })
             return
 
-        # Content-Length lesen
-        content_length = int(os.environ.get('CONTENT_LENGTH', 0))
-        if content_length == 0:
-            send_error(400, {
+        # Content-Length pruefen
+        if req.content_length == 0:
+            send_error(req, resp, 400, {
                 'error': 'Leere Anfrage. Bitte model, messages und max_tokens senden.'
             })
             return
 
         # POST-Daten lesen
-        post_data = sys.stdin.read(content_length)
-        request_data = json.loads(post_data)
+        request_data = req.json()
 
         # Validierung
         model = request_data.get('model', 'gemini-2.0-flash')
-        messages = request_data.get('messages', [])
+        # Sitzungs-Modus (llmchat/sessions.py): nur die neue Nachricht, Verlauf aus SESSIONS_DIR
+        turn = sessions.prepare_turn(request_data)
+        messages = turn.messages if turn else request_data.get('messages', [])
+        # Anhaenge (llmchat/blobs.py) erst hier aufloesen, gespeichert bleibt die Referenz
+        messages = blobs.resolve_messages(messages)
         max_tokens = request_data.get('max_tokens', 2000)
         audio_data = request_data.get('audio_data', None)
         audio_mime_type = request_data.get('audio_mime_type', None)
 
         if not messages or not isinstance(messages, list):
-            send_error(400, {
+            send_error(req, resp, 400, {
                 'error': 'Ungueltige Anfrage: messages Array erforderlich'
             })
             return
@@ -179,7 +145,20 @@ def main():
             'Content-Type': 'application/json'
         }
 
-        req = urllib.request.Request(
+        # Vorpruefung (llmchat/tokens.py): nahe am Kontextfenster exakt zaehlen
+        tokens.preflight(model, messages, request_data.get('max_context_tokens'))
+
+        # Antwort-Cache (opt-in, llmchat/responsecache.py): Treffer ohne Upstream abspielen
+        cache_key = responsecache.cache_key('google', model, messages, max_tokens, audio_data)
+        cached = responsecache.lookup(cache_key, request_data)
+        if cached is not None:
+            responsecache.replay(resp, cached)
+            if turn:
+                turn.commit(cached)
+            log_request(req, 200, {}, tag='CACHE')
+            return
+
+        req_upstream = urllib.request.Request(
             api_url,
             data=json.dumps(api_request_data).encode('utf-8'),
             headers=headers,
@@ -188,7 +167,7 @@ def main():
 
         # API-Verbindung herstellen (VOR dem Senden der SSE-Header)
         try:
-            response = urllib.request.urlopen(req, timeout=60)
+            response = upstream.urlopen(req_upstream, timeout=60)
         except urllib.error.HTTPError as e:
             error_body = e.read().decode('utf-8')
             # HTTP 429: prüfen ob Tageslimit (RESOURCE_EXHAUSTED per_day)
@@ -197,13 +176,13 @@ def main():
                 daily_keywords = ['per_day', 'daily', 'RATE_LIMIT_EXCEEDED']
                 is_daily = any(kw.lower() in error_body.lower() for kw in daily_keywords)
                 if is_daily:
-                    send_error(e.code, {
+                    send_error(req, resp, e.code, {
                         'error': f'Google Gemini API Fehler: {e.code}',
                         'error_type': 'daily_limit',
                         'details': error_body
                     })
                 else:
-                    send_error(e.code, {
+                    send_error(req, resp, e.code, {
                         'error': f'Google Gemini API Fehler: {e.code}',
                         'details': error_body
                     })
@@ -212,92 +191,60 @@ def main():
                 if e.code == 400:
                     context_keywords = ['token', 'context', 'length', 'maximum', 'INVALID_ARGUMENT']
                     if sum(1 for kw in context_keywords if kw.lower() in error_body.lower()) >= 2:
-                        send_error(e.code, {
+                        send_error(req, resp, e.code, {
                             'error': f'Google Gemini API Fehler: {e.code}',
                             'error_type': 'context_exceeded',
                             'details': error_body
                         })
                         return
-                send_error(e.code, {
+                send_error(req, resp, e.code, {
                     'error': f'Google Gemini API Fehler: {e.code}',
                     'details': error_body
                 })
             return
         except urllib.error.URLError as e:
-            send_error(500, {
+            send_error(req, resp, 500, {
                 'error': 'Verbindung zur Google Gemini API fehlgeschlagen',
                 'details': str(e.reason)
             })
             return
 
         # SSE-Header senden (erst nach erfolgreicher API-Verbindung)
-        print("Status: 200")
-        print("Content-Type: text/event-stream")
-        print("Access-Control-Allow-Origin: *")
-        print("Access-Control-Allow-Methods: POST, OPTIONS")
-        print("Access-Control-Allow-Headers: Content-Type")
-        print("Cache-Control: no-cache")
-        print("X-Accel-Buffering: no")
-        print()
-        sys.stdout.flush()
+        start_sse(resp)
 
         # Gemini SSE-Stream lesen und in DeepSeek-kompatibles Format konvertieren
-        with response:
-            buffer = ''
-            for chunk in response:
-                decoded = chunk.decode('utf-8')
-                buffer += decoded
-                # Zeilen verarbeiten
-                while '\n' in buffer:
-                    line, buffer = buffer.split('\n', 1)
-                    line = line.strip()
-                    if not line:
-                        continue
-                    if line.startswith('data: '):
-                        data_str = line[6:].strip()
-                        if not data_str or data_str == '[DONE]':
-                            sys.stdout.write('data: [DONE]\n\n')
-                            sys.stdout.flush()
-                            continue
-                        try:
-                            gemini_data = json.loads(data_str)
-                            # Gemini -> DeepSeek Format konvertieren
-                            candidates = gemini_data.get('candidates', [])
-                            if candidates:
-                                parts = candidates[0].get('content', {}).get('parts', [])
-                                if parts:
-                                    text_token = parts[0].get('text', '')
-                                    if text_token:
-                                        openai_chunk = {
-                                            'choices': [{
-                                                'delta': {'content': text_token}
-                                            }]
-                                        }
-                                        sys.stdout.write(f'data: {json.dumps(openai_chunk)}\n\n')
-                                        sys.stdout.flush()
-                        except json.JSONDecodeError:
-                            pass
+        with response, stream.StreamWriter(resp) as out:
+            capture = sessions.Capture(out, turn)
+            recorder = responsecache.Recorder(capture, cache_key, {'model': model})
+            relay.relay_gemini(response, recorder)
+            recorder.write(sse.DONE)
+        recorder.commit()
+        capture.commit()
+
+        log_request(req, 200, {})
 
-        sys.stdout.write('data: [DONE]\n\n')
-        sys.stdout.flush()
-        log_to_file(200, {})
+    except sessions.SessionError as e:
+        send_error(req, resp, e.status_code, e.data())
+
+    except tokens.ContextExceeded as e:
+        send_error(req, resp, 400, e.data())
 
     except json.JSONDecodeError as e:
-        send_error(400, {
+        send_error(req, resp, 400, {
             'error': 'Ungültiges JSON',
             'details': str(e)
         })
 
     except Exception as e:
         error_details = traceback.format_exc()
-        send_error(500, {
+        if resp.started:
+            log_request(req, 500, {'error': 'Stream abgebrochen', 'details': str(e)})
+            return
+        send_error(req, resp, 500, {
             'error': 'Interner Serverfehler',
             'message': str(e),
             'details': error_details
         })
 
 if __name__ == '__main__':
-    main()
-
-
-
+    run_cgi(handle)
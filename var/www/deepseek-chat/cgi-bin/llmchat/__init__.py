@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""
+llmchat - gemeinsame Bibliothek der CGI-Scripts in /cgi-bin/.
+
+Die Scripts im cgi-bin-Verzeichnis sind duenne Handler der Form
+handle(req, resp). Sie laufen entweder klassisch als CGI (ein Prozess
+pro Anfrage, siehe llmchat.web.run_cgi) oder im langlebigen
+Applikationsserver (siehe llmchat.server), der alle Handler einmalig
+importiert und unter denselben URLs ausliefert.
+"""
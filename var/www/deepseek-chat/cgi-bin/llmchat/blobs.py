@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+Inhaltsadressierter Speicher fuer Anhaenge (Datei-Inhalte) mit Referenzzaehlung.
+
+Bisher steht der Inhalt jeder hochgeladenen Datei im content der Nachricht:
+dieselbe PDF in zehn Sitzungen liegt zehnmal auf der Platte, wird bei jedem
+save-session.py neu serialisiert und bei jeder Frage erneut hochgeladen.
+Jetzt laedt index.html den Inhalt einmal hoch (blob.py; vorher prueft es
+per SHA-256, ob er schon vorhanden ist) und schreibt nur eine Referenz
+
+    [[blob:sha256:<64 hex>]]
+
+in den content. Aufgeloest wird erst dort, wo der Text gebraucht wird:
+in den Proxies beim Aufbau der Anbieter-Anfrage, in den Exporten und in
+count-tokens.py (resolve_messages). Der Kompressor laesst Datei-Inhalte
+wie bisher weg (describe).
+
+Ablage:
+
+  BLOBS_DIR/<sha[:2]>/<sha>   Inhalt (Bytes)
+  BLOBS_DIR/refs.db           SQLite: blobs(sha, size, created, refcount),
+                              refs(session_id, sha)
+
+Referenzen pflegt llmchat/sessions.py beim Speichern, Aendern und Loeschen
+einer Sitzung (set_refs/add_refs); refcount zaehlt die Sitzungen, die einen
+Anhang verwenden. Unreferenzierte Anhaenge raeumt gc() weg, sobald sie
+aelter als LLMCHAT_BLOB_GRACE Sekunden sind (Vorgabe 1 Tag - ein gerade
+hochgeladener Anhang ist bis zum naechsten Speichern unreferenziert).
+Hochladen und die Abfrage per meta=1 (info(sha, touch=True)) setzen created
+neu: index.html laedt einen vorhandenen Anhang nicht erneut hoch, er darf
+bis zum naechsten Speichern nicht verschwinden. gc() prueft refcount und
+created je Anhang noch einmal in der Transaktion, in der er geloescht wird:
+
+  python3 -m llmchat.blobs gc [--dry-run]
+  python3 -m llmchat.blobs rebuild      # Referenzen aus allen Sitzungen neu zaehlen
+
+Einstellungen (Umgebungsvariablen):
+
+  LLMCHAT_BLOB_MAX_MB=20        Groesste annehmbare Datei
+  LLMCHAT_BLOB_GRACE=86400      Schonfrist unreferenzierter Anhaenge
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from llmchat.config import BLOBS_DIR, env_int
+
+MAX_BYTES = env_int('LLMCHAT_BLOB_MAX_MB', 20) * 1024 * 1024
+GRACE = env_int('LLMCHAT_BLOB_GRACE', 86400)
+DB_PATH = os.path.join(BLOBS_DIR, 'refs.db')
+
+REF_PREFIX = '[[blob:sha256:'
+REF_RE = re.compile(r'\[\[blob:sha256:([0-9a-f]{64})\]\]')
+SHA_RE = re.compile(r'\A[0-9a-f]{64}\Z')
+MAX_DEPTH = 3  # Anhaenge, die selbst Referenzen enthalten (z.B. kontext.txt)
+MISSING = '[Anhang nicht mehr vorhanden]'
+OMITTED = '[Datei-Inhalt — nicht komprimiert]'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha      TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    created  REAL NOT NULL,
+    refcount INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS refs (
+    session_id TEXT NOT NULL,
+    sha        TEXT NOT NULL,
+    PRIMARY KEY (session_id, sha)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS blobs_unreferenced ON blobs (refcount, created);
+"""
+
+_local = threading.local()
+
+
+class BlobError(ValueError):
+    """Ungueltiger oder zu grosser Anhang (blob.py: 400/413)."""
+
+
+def ref(sha):
+    return f'{REF_PREFIX}{sha}]]'
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def path(sha):
+    return os.path.join(BLOBS_DIR, sha[:2], sha)
+
+
+# =============================================================================
+# DATENBANK
+# =============================================================================
+def _connect():
+    con = getattr(_local, 'con', None)
+    if con is None:
+        os.makedirs(BLOBS_DIR, mode=0o700, exist_ok=True)
+        con = sqlite3.connect(DB_PATH, timeout=10, isolation_level=None)
+        con.execute('PRAGMA journal_mode=WAL')
+        con.execute('PRAGMA synchronous=NORMAL')
+        con.executescript(_SCHEMA)
+        _local.con = con
+    return con
+
+
+@contextmanager
+def _transaction():
+    con = _connect()
+    con.execute('BEGIN IMMEDIATE')
+    try:
+        yield con
+    except BaseException:
+        con.execute('ROLLBACK')
+        raise
+    con.execute('COMMIT')
+
+
+# =============================================================================
+# ANHAENGE
+# =============================================================================
+def put(data):
+    """Legt data ab (falls noch nicht vorhanden); liefert den SHA-256 (hex)."""
+    if len(data) > MAX_BYTES:
+        raise BlobError(f'Anhang groesser als {MAX_BYTES // 1048576} MB')
+    sha = digest(data)
+    # Zuerst den Eintrag: created neu gesetzt = gc() laesst den Anhang in Ruhe
+    with _transaction() as con:
+        con.execute('INSERT INTO blobs (sha, size, created) VALUES (?, ?, ?) '
+                    'ON CONFLICT (sha) DO UPDATE SET created = excluded.created',
+                    (sha, len(data), time.time()))
+    target = path(sha)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), mode=0o700, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, target)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+    return sha
+
+
+def info(sha, touch=False):
+    """{'sha256', 'size', 'refs'} oder None; touch=True setzt created neu (Schonfrist fuer gc)."""
+    if not SHA_RE.match(sha or ''):
+        return None
+    if not touch:
+        try:
+            size = os.path.getsize(path(sha))
+        except OSError:
+            return None
+        row = _connect().execute('SELECT refcount FROM blobs WHERE sha = ?', (sha,)).fetchone()
+        return {'sha256': sha, 'size': size, 'refs': row[0] if row else 0}
+    # In der Transaktion: gc() loescht entweder vorher (-> None) oder sieht das neue created
+    with _transaction() as con:
+        try:
+            size = os.path.getsize(path(sha))
+        except OSError:
+            return None
+        con.execute('INSERT INTO blobs (sha, size, created) VALUES (?, ?, ?) '
+                    'ON CONFLICT (sha) DO UPDATE SET created = excluded.created',
+                    (sha, size, time.time()))
+        refcount = con.execute('SELECT refcount FROM blobs WHERE sha = ?', (sha,)).fetchone()[0]
+    return {'sha256': sha, 'size': size, 'refs': refcount}
+
+
+def _read_text(sha):
+    # Kein Cache: bis zu MAX_BYTES je Anhang blieben in jedem WSGI-Prozess
+    # liegen (auch nach gc); das wiederholte Lesen bedient der Seiten-Cache
+    with open(path(sha), 'rb') as f:
+        return f.read().decode('utf-8', errors='replace')
+
+
+def read(sha):
+    """Inhalt als Bytes oder None."""
+    if not SHA_RE.match(sha or ''):
+        return None
+    try:
+        with open(path(sha), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+# =============================================================================
+# REFERENZEN IM TEXT
+# =============================================================================
+def refs_in_text(text):
+    if not isinstance(text, str) or REF_PREFIX not in text:
+        return set()
+    return set(REF_RE.findall(text))
+
+
+def refs_in(messages):
+    """SHA-256 aller Anhaenge, auf die eine Nachrichtenliste verweist."""
+    shas = set()
+    for msg in messages or []:
+        if isinstance(msg, dict):
+            shas |= refs_in_text(msg.get('content'))
+    return shas
+
+
+def resolve(text, depth=0):
+    """Ersetzt Referenzen durch den Inhalt des Anhangs."""
+    if not isinstance(text, str) or REF_PREFIX not in text or depth >= MAX_DEPTH:
+        return text
+
+    def replace(match):
+        try:
+            return resolve(_read_text(match.group(1)), depth + 1)
+        except OSError:
+            return MISSING
+    return REF_RE.sub(replace, text)
+
+
+def resolve_messages(messages):
+    """Nachrichtenliste mit aufgeloesten Anhaengen (nur betroffene Nachrichten kopiert)."""
+    if not isinstance(messages, list):
+        return messages
+    result = []
+    for msg in messages:
+        if isinstance(msg, dict) and isinstance(msg.get('content'), str) and REF_PREFIX in msg['content']:
+            msg = dict(msg, content=resolve(msg['content']))
+        result.append(msg)
+    return result
+
+
+def describe(text):
+    """Referenzen durch einen Platzhalter ersetzen (Kompressor)."""
+    if not isinstance(text, str) or REF_PREFIX not in text:
+        return text
+    return REF_RE.sub(OMITTED, text)
+
+
+# =============================================================================
+# REFERENZZAEHLUNG
+# =============================================================================
+def _change(con, session_id, added, removed):
+    for sha in added:
+        con.execute('INSERT OR IGNORE INTO refs (session_id, sha) VALUES (?, ?)', (session_id, sha))
+        con.execute('UPDATE blobs SET refcount = refcount + 1 WHERE sha = ?', (sha,))
+    for sha in removed:
+        con.execute('DELETE FROM refs WHERE session_id = ? AND sha = ?', (session_id, sha))
+        con.execute('UPDATE blobs SET refcount = MAX(refcount - 1, 0) WHERE sha = ?', (sha,))
+
+
+def set_refs(session_id, shas):
+    """Setzt die Anhaenge einer Sitzung (leer: Sitzung geloescht)."""
+    shas = set(shas)
+    if not shas and not os.path.exists(DB_PATH):
+        return  # noch nie ein Anhang gespeichert
+    with _transaction() as con:
+        current = {row[0] for row in con.execute('SELECT sha FROM refs WHERE session_id = ?', (session_id,))}
+        _change(con, session_id, shas - current, current - shas)
+
+
+def add_refs(session_id, shas):
+    """Ergaenzt Anhaenge einer Sitzung (angehaengte Nachrichten)."""
+    if not shas:
+        return
+    with _transaction() as con:
+        current = {row[0] for row in con.execute('SELECT sha FROM refs WHERE session_id = ?', (session_id,))}
+        _change(con, session_id, set(shas) - current, ())
+
+
+def rebuild(sessions, out=sys.stdout):
+    """Zaehlt alle Referenzen neu; sessions: iterierbar ueber (session_id, chatData)."""
+    with _transaction() as con:
+        con.execute('DELETE FROM refs')
+        con.execute('UPDATE blobs SET refcount = 0')
+        total = 0
+        for session_id, chat_data in sessions:
+            shas = refs_in((chat_data or {}).get('messages'))
+            _change(con, session_id, shas, ())
+            total += len(shas)
+    print(f'{total} Referenzen neu gezaehlt', file=out)
+
+
+def unreferenced(grace=GRACE):
+    """[(sha, Bytes)] unreferenzierter Anhaenge aelter als grace (gc, llmchat.retention)."""
+    limit = time.time() - grace
+    con = _connect()
+    known = {}
+    for sha, size, created, refcount in con.execute('SELECT sha, size, created, refcount FROM blobs'):
+        known[sha] = (size, created, refcount)
+    victims = [(sha, size) for sha, (size, created, refcount) in known.items()
+               if refcount == 0 and created < limit]
+    # Dateien ohne Eintrag (z.B. Absturz zwischen Schreiben und INSERT)
+    try:
+        prefixes = os.listdir(BLOBS_DIR)
+    except OSError:
+        prefixes = []
+    for prefix in prefixes:
+        directory = os.path.join(BLOBS_DIR, prefix)
+        if len(prefix) != 2 or not os.path.isdir(directory):
+            continue
+        for entry in os.scandir(directory):
+            if entry.name not in known and entry.stat().st_mtime < limit:
+                victims.append((entry.name, entry.stat().st_size))
+    return victims
+
+
+def remove(sha, grace=GRACE):
+    """Loescht einen Kandidaten aus unreferenced(); False, wenn er inzwischen gebraucht wird."""
+    limit = time.time() - grace
+    with _transaction() as con:
+        row = con.execute('SELECT refcount, created FROM blobs WHERE sha = ?', (sha,)).fetchone()
+        if row and (row[0] > 0 or row[1] >= limit):
+            return False  # inzwischen wieder referenziert, hochgeladen oder per meta=1 abgefragt
+        con.execute('DELETE FROM blobs WHERE sha = ?', (sha,))
+        try:
+            os.remove(os.path.join(BLOBS_DIR, sha[:2], sha))
+            os.rmdir(os.path.join(BLOBS_DIR, sha[:2]))  # nur wenn leer
+        except OSError:
+            pass
+    return True
+
+
+def gc(dry_run=False, grace=GRACE, out=sys.stdout):
+    """Loescht unreferenzierte Anhaenge aelter als grace; liefert (Anzahl, Bytes)."""
+    count = freed = 0
+    for sha, size in unreferenced(grace):
+        if dry_run or remove(sha, grace):
+            count += 1
+            freed += size
+    label = 'wuerden geloescht' if dry_run else 'geloescht'
+    print(f'{count} Anhaenge {label}, {freed / 1048576:.1f} MB', file=out)
+    return count, freed
+
+
+def stats():
+    if not os.path.exists(DB_PATH):
+        return {'blobs': 0, 'bytes': 0, 'unreferenced': 0, 'references': 0}
+    con = _connect()
+    count, size = con.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs').fetchone()
+    unreferenced = con.execute('SELECT COUNT(*) FROM blobs WHERE refcount = 0').fetchone()[0]
+    references = con.execute('SELECT COUNT(*) FROM refs').fetchone()[0]
+    return {'blobs': count, 'bytes': size, 'unreferenced': unreferenced, 'references': references}
+
+
+USAGE = 'Verwendung: python3 -m llmchat.blobs gc [--dry-run] | rebuild'
+
+
+def main(argv):
+    args = argv[1:]
+    if args and args[0] == 'gc' and set(args[1:]) <= {'--dry-run'}:
+        gc(dry_run='--dry-run' in args)
+        return 0
+    if args == ['rebuild']:
+        from llmchat import sessionstore
+        store = sessionstore.get()
+        rebuild((session_id, store.load(session_id)) for session_id in store.ids())
+        return 0
+    print(USAGE, file=sys.stderr)
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,594 @@
+# -*- coding: utf-8 -*-
+"""
+Massen-Export gespeicherter Sitzungen in ein Archiv (bulk-export.py, Kommandozeile).
+
+Bisher exportiert nur der Browser, und nur die gerade offene Sitzung
+(chatData an export-*.py). Fuer die Quartals-Archivierung waehlt ein Filter
+die Sitzungen auf dem Server aus:
+
+    {"all": true}                                  alle Sitzungen
+    {"from": "2026-07-01", "to": "2026-09-30"}     Starttag laut Session-ID (beide optional)
+    {"ids": ["2026-07-01_101500_ab12cd", ..]}      einzelne Sitzungen
+
+Je Sitzung rendert ein Prozess-Pool (LLMCHAT_BULK_WORKERS, Vorgabe: Anzahl
+der Kerne) die gewuenschten Formate ueber llmchat.exports bzw.
+llmchat.exportpdf; der Hauptprozess schreibt die Dateien in Reihenfolge der
+Sitzungen als <Session-ID>.<Endung> direkt ins Archiv (zip oder tar) unter
+ARCHIVE_DIR. Am Ende folgt export.json mit Filter, Formaten und Fehlern.
+Der Export-Cache wird gelesen (einzeln exportierte Sitzungen sind Treffer),
+aber nicht gefuellt, damit ein Quartal nicht die Eintraege des Alltags
+verdraengt.
+
+Fortschritt und Wiederaufnahme: der Stand liegt in ARCHIVE_DIR/<id>.json
+(Sitzungsliste, erledigte Sitzungen, Fehler, Pruefpunkt). Spaetestens alle
+LLMCHAT_BULK_CHECKPOINT Sekunden (5) wird ein Pruefpunkt gesetzt:
+
+  zip   Archiv schliessen (Zentralverzeichnis), das Zentralverzeichnis
+        zusaetzlich in <id>.zip.part.dir-<Offset> sichern, weiter im Modus 'a'
+  tar   Offset hinter dem letzten vollstaendigen Eintrag
+
+Bricht der Lauf ab (Absturz, Neustart, Strg-C), zeigt der Status
+"interrupted"; resume kuerzt das Teil-Archiv auf den Pruefpunkt (zip: mit
+dem gesicherten Zentralverzeichnis) und macht mit der naechsten Sitzung
+weiter. Ein laufender Export haelt flock auf <id>.lock, ein zweiter Lauf
+derselben ID wird abgewiesen. Fertige Archive (<id>.zip bzw. .tar) werden
+nach LLMCHAT_BULK_KEEP_DAYS (7) beim Anlegen neuer Exporte entfernt. Der
+Lauf selbst arbeitet mit nice LLMCHAT_BULK_NICE (10), damit Chats Vorrang
+behalten.
+
+  python3 -m llmchat.bulkexport start --all | --from JJJJ-MM-TT --to JJJJ-MM-TT | --ids ID,..
+          [--formats pdf,md,txt,rtf] [--archive zip|tar] [--workers N]
+  python3 -m llmchat.bulkexport resume <id> [--workers N]
+  python3 -m llmchat.bulkexport status [<id>]
+
+Ueber HTTP (Worker im Hintergrund, llmchat.jobs.spawn): bulk-export.py.
+"""
+
+import argparse
+import collections
+import datetime
+import fcntl
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from llmchat import exportcache, exportpdf, exports, jobs, pdfstream, sessions, sessionstore
+from llmchat.config import ARCHIVE_DIR, env_float, env_int
+
+WORKERS = env_int('LLMCHAT_BULK_WORKERS', 0) or os.cpu_count() or 1
+CHECKPOINT_SECONDS = env_float('LLMCHAT_BULK_CHECKPOINT', 5.0)
+KEEP_DAYS = env_int('LLMCHAT_BULK_KEEP_DAYS', 7)
+NICE = env_int('LLMCHAT_BULK_NICE', 10)
+
+# Archivformat -> Content-Type
+ARCHIVES = {'zip': 'application/zip', 'tar': 'application/x-tar'}
+
+QUEUED = jobs.QUEUED
+RUNNING = jobs.RUNNING
+DONE = jobs.DONE
+ERROR = jobs.ERROR
+INTERRUPTED = 'interrupted'
+
+STARTUP_SECONDS = 60   # so lange darf ein angelegter Export auf seinen Worker warten
+REPORT_ITEMS = 20      # Fehler im Status (export.json enthaelt alle)
+MANIFEST_NAME = 'export.json'
+
+
+class Busy(RuntimeError):
+    """Der Export laeuft bereits in einem anderen Prozess."""
+
+
+# =============================================================================
+# AUSWAHL
+# =============================================================================
+def _day(value, name):
+    if value is None:
+        return None
+    try:
+        return datetime.date.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        raise ValueError(f'filter.{name}: Datum im Format JJJJ-MM-TT erwartet') from None
+
+
+def select_sessions(selection):
+    """Session-IDs zum Filter (sortiert) und die nicht gefundenen IDs."""
+    if not isinstance(selection, dict):
+        raise ValueError('filter: JSON-Objekt erwartet')
+    known = sorted(item['sessionId'] for item in sessionstore.get().usage())
+    ids = selection.get('ids')
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(sessions.validate_session_id(i) for i in ids):
+            raise ValueError('filter.ids: Liste gültiger Session-IDs erwartet')
+        present = set(known)
+        ids = list(dict.fromkeys(ids))
+        return [i for i in ids if i in present], [i for i in ids if i not in present]
+    date_from, date_to = _day(selection.get('from'), 'from'), _day(selection.get('to'), 'to')
+    if date_from is None and date_to is None:
+        if selection.get('all') is not True:
+            raise ValueError('filter: ids, from/to oder all erforderlich')
+        return known, []
+    # Ohne Datum in der ID (alte Sitzungen) nur ueber all bzw. ids
+    return [i for i in known if sessions.validate_session_id(i)
+            and (date_from is None or i[:10] >= date_from)
+            and (date_to is None or i[:10] <= date_to)], []
+
+
+def validate_formats(formats):
+    formats = formats or list(exports.FORMATS)
+    if not isinstance(formats, list) or not formats or any(fmt not in exports.FORMATS for fmt in formats):
+        raise ValueError(f'formats: erlaubt sind {", ".join(exports.FORMATS)}')
+    return list(dict.fromkeys(formats))
+
+
+# =============================================================================
+# RENDERN (im Worker-Prozess)
+# =============================================================================
+def _render_pdf(chat_data, doc):
+    """(bytes oder None, Fehlertext oder None); Cache nur lesen."""
+    entry = exportcache.lookup(exportcache.cache_key('pdf', chat_data))
+    if entry is not None:
+        return entry[1], None
+    estimate = exportpdf.estimate_pages(doc)
+    if exportpdf.MAX_PAGES and estimate > exportpdf.MAX_PAGES:
+        return None, f'zu groß: mindestens {estimate} Seiten, erlaubt sind {exportpdf.MAX_PAGES}'
+    out = io.BytesIO()
+    try:
+        exportpdf.render(doc, out)
+    except pdfstream.BudgetExceeded as e:
+        return out.getvalue(), f'{e}, nach Seite {e.pages} mit Hinweisseite beendet'
+    return out.getvalue(), None
+
+
+def _watch_parent(parent):
+    """Worker beenden, sobald der Hauptprozess weg ist (z.B. kill -9)."""
+    def watch():
+        while os.getppid() == parent:
+            time.sleep(1)
+        os._exit(1)
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def render_session(session_id, formats):
+    """(session_id, [(Name im Archiv, bytes)], [{format, error}]) einer Sitzung."""
+    try:
+        chat_data = sessions.load_session(session_id)
+    except Exception as e:
+        return session_id, [], [{'format': None, 'error': f'Lesen fehlgeschlagen: {e}'}]
+    if chat_data is None:
+        return session_id, [], [{'format': None, 'error': 'Sitzung nicht gefunden'}]
+    files, problems = [], []
+    try:
+        doc = exports.normalize(chat_data)
+    except Exception as e:
+        return session_id, [], [{'format': None, 'error': f'Normalisieren fehlgeschlagen: {e}'}]
+    for fmt in formats:
+        try:
+            if fmt == 'pdf':
+                data, error = _render_pdf(chat_data, doc)
+            else:
+                data, error = exports.export(fmt, chat_data, doc, store=False)[0], None
+        except Exception as e:
+            data, error = None, str(e)
+        if data is not None:
+            files.append((f'{session_id}.{exports.FORMATS[fmt][1]}', data))
+        if error:
+            problems.append({'format': fmt, 'error': error})
+    return session_id, files, problems
+
+
+# =============================================================================
+# ARCHIVE MIT PRUEFPUNKTEN
+# =============================================================================
+class ZipWriter:
+    """ZIP-Archiv; PDFs unkomprimiert (schon komprimiert), Text mit DEFLATE."""
+
+    def __init__(self, path, checkpoint=None):
+        self.path = path
+        if checkpoint is None:
+            self.zf = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED)
+            return
+        with open(os.path.join(os.path.dirname(path), checkpoint['directory']), 'rb') as f:
+            directory = f.read()
+        with open(path, 'r+b') as f:
+            f.truncate(checkpoint['offset'])
+            f.seek(checkpoint['offset'])
+            f.write(directory)
+        self.zf = zipfile.ZipFile(path, 'a', compression=zipfile.ZIP_DEFLATED)
+
+    def add(self, name, data):
+        compress_type = zipfile.ZIP_STORED if name.endswith('.pdf') else zipfile.ZIP_DEFLATED
+        self.zf.writestr(name, data, compress_type=compress_type)
+
+    def checkpoint(self):
+        # close() schreibt das Zentralverzeichnis ab start_dir; der naechste
+        # Eintrag ueberschreibt es wieder, daher eine Kopie daneben.
+        self.zf.close()
+        offset = self.zf.start_dir
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            directory = f.read()
+        name = f'{os.path.basename(self.path)}.dir-{offset}'
+        _write_atomic(os.path.join(os.path.dirname(self.path), name), directory)
+        self.zf = zipfile.ZipFile(self.path, 'a', compression=zipfile.ZIP_DEFLATED)
+        return {'offset': offset, 'directory': name}
+
+    def close(self):
+        self.zf.close()
+
+
+class TarWriter:
+    """Unkomprimiertes tar (ein komprimierter Strom liesse sich nicht kuerzen)."""
+
+    def __init__(self, path, checkpoint=None):
+        self.fileobj = open(path, 'r+b' if checkpoint else 'wb')
+        if checkpoint:
+            self.fileobj.truncate(checkpoint['offset'])
+            self.fileobj.seek(checkpoint['offset'])
+        self.tar = tarfile.open(fileobj=self.fileobj, mode='w', format=tarfile.PAX_FORMAT)
+
+    def add(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        self.tar.addfile(info, io.BytesIO(data))
+
+    def checkpoint(self):
+        self.fileobj.flush()
+        return {'offset': self.fileobj.tell()}
+
+    def close(self):
+        self.tar.close()
+        self.fileobj.close()
+
+
+WRITERS = {'zip': ZipWriter, 'tar': TarWriter}
+
+
+# =============================================================================
+# STAND
+# =============================================================================
+def _path(archive_id, suffix):
+    return os.path.join(ARCHIVE_DIR, f'{archive_id}{suffix}')
+
+
+def archive_path(state):
+    return _path(state['id'], '.' + state['archive'])
+
+
+def _part_path(state):
+    return archive_path(state) + '.part'
+
+
+def _write_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _write(state):
+    state['updated'] = time.time()
+    _write_atomic(_path(state['id'], '.json'), json.dumps(state, ensure_ascii=False).encode('utf-8'))
+
+
+def _read(archive_id):
+    if not jobs.valid_job_id(archive_id):
+        return None
+    try:
+        with open(_path(archive_id, '.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _locked(archive_id):
+    with open(_path(archive_id, '.lock'), 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            raise Busy('Export läuft bereits') from None
+        yield
+
+
+def _running(archive_id):
+    try:
+        with _locked(archive_id):
+            return False
+    except Busy:
+        return True
+    except OSError:
+        return False
+
+
+def load(archive_id):
+    """Stand eines Exports oder None; abgebrochene Laeufe als interrupted."""
+    state = _read(archive_id)
+    if state is None:
+        return None
+    stale = state['status'] == RUNNING or (
+        state['status'] == QUEUED and time.time() - state['updated'] > STARTUP_SECONDS)
+    if stale and not _running(archive_id):
+        state['status'] = INTERRUPTED
+    return state
+
+
+def requeue(state):
+    """Abgebrochenen oder fehlgeschlagenen Export vor dem Neustart als queued markieren."""
+    state.update(status=QUEUED, error=None)
+    _write(state)
+    return state
+
+
+def public(state):
+    """Stand fuer Client und Kommandozeile (ohne Sitzungsliste und Pruefpunkt)."""
+    data = {key: value for key, value in state.items() if key not in ('sessions', 'checkpoint', 'id')}
+    data['archiveId'] = state['id']
+    data['total'] = len(state['sessions'])
+    data['percent'] = round(100.0 * state['done'] / data['total'], 1) if data['total'] else 100.0
+    data['failedCount'] = len(state['failed'])
+    data['failed'] = state['failed'][:REPORT_ITEMS]
+    return data
+
+
+def list_exports():
+    """Alle Exporte, neueste zuerst."""
+    try:
+        names = os.listdir(ARCHIVE_DIR)
+    except OSError:
+        return []
+    states = [load(name[:-5]) for name in names if name.endswith('.json')]
+    return sorted((s for s in states if s is not None), key=lambda s: s['created'], reverse=True)
+
+
+def _remove_files(state):
+    prefix = state['id']
+    try:
+        entries = list(os.scandir(ARCHIVE_DIR))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.name.startswith(prefix) and not entry.name.endswith('.json'):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+    try:
+        os.remove(_path(prefix, '.json'))
+    except OSError:
+        pass
+
+
+def cleanup(keep_days=None):
+    """Entfernt nicht laufende Exporte, die aelter als keep_days Tage sind."""
+    keep_days = KEEP_DAYS if keep_days is None else keep_days
+    limit = time.time() - keep_days * 86400
+    removed = 0
+    for state in list_exports():
+        if state['status'] in (QUEUED, RUNNING) or state['updated'] >= limit:
+            continue
+        _remove_files(state)
+        removed += 1
+    return removed
+
+
+def create(selection, formats=None, archive='zip'):
+    """Legt einen Export an (ohne ihn zu starten) und liefert den Stand."""
+    if archive not in ARCHIVES:
+        raise ValueError(f'archive: erlaubt sind {", ".join(ARCHIVES)}')
+    formats = validate_formats(formats)
+    session_ids, missing = select_sessions(selection)
+    if not session_ids:
+        raise ValueError('Keine Sitzungen zum Filter gefunden')
+    os.makedirs(ARCHIVE_DIR, mode=0o700, exist_ok=True)
+    cleanup()
+    now = time.time()
+    state = {
+        'id': uuid.uuid4().hex,
+        'status': QUEUED,
+        'created': now,
+        'filter': selection,
+        'formats': formats,
+        'archive': archive,
+        'sessions': session_ids,
+        'missing': missing,
+        'done': 0,
+        'files': 0,
+        'bytes': 0,
+        'failed': [],
+        'checkpoint': None,
+    }
+    _write(state)
+    return state
+
+
+# =============================================================================
+# LAUF
+# =============================================================================
+def _results(pool, session_ids, formats, window):
+    """Ergebnisse in Reihenfolge, hoechstens window Sitzungen gleichzeitig in Arbeit."""
+    pending = collections.deque()
+    for session_id in session_ids:
+        pending.append(pool.submit(render_session, session_id, formats))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _checkpoint(state, writer):
+    old = (state['checkpoint'] or {}).get('directory')
+    state['checkpoint'] = writer.checkpoint()
+    state['bytes'] = state['checkpoint']['offset']
+    _write(state)
+    if old and old != state['checkpoint'].get('directory'):
+        try:
+            os.remove(os.path.join(ARCHIVE_DIR, old))
+        except OSError:
+            pass
+
+
+def _manifest(state):
+    return json.dumps({
+        'created': datetime.datetime.fromtimestamp(state['created']).isoformat(timespec='seconds'),
+        'filter': state['filter'],
+        'formats': state['formats'],
+        'sessions': len(state['sessions']),
+        'missing': state['missing'],
+        'failed': state['failed'],
+    }, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def run(archive_id, workers=None, progress=None):
+    """Fuehrt einen Export aus bzw. setzt ihn am letzten Pruefpunkt fort; liefert den Stand.
+
+    progress(state) wird nach jedem Pruefpunkt aufgerufen. Busy, wenn der
+    Export schon laeuft; None, wenn es ihn nicht gibt.
+    """
+    with _locked(archive_id):
+        state = _read(archive_id)
+        if state is None or state['status'] == DONE:
+            return state
+        workers = max(1, workers or WORKERS)
+        if NICE:
+            try:
+                os.nice(NICE)
+            except OSError:
+                pass
+        part = _part_path(state)
+        state.update(status=RUNNING, started=time.time(), error=None)
+        _write(state)
+        try:
+            writer = WRITERS[state['archive']](part, state['checkpoint'])
+            # spawn statt fork: die Worker erben die Sperre nicht (sonst gaelte
+            # ein abgestuerzter Lauf als laufend, solange sie leben).
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_watch_parent, initargs=(os.getpid(),))
+            try:
+                last = time.monotonic()
+                remaining = state['sessions'][state['done']:]
+                for session_id, files, problems in _results(pool, remaining, state['formats'], 2 * workers):
+                    for name, data in files:
+                        writer.add(name, data)
+                    state['done'] += 1
+                    state['files'] += len(files)
+                    state['failed'].extend(dict(problem, sessionId=session_id) for problem in problems)
+                    if time.monotonic() - last >= CHECKPOINT_SECONDS:
+                        _checkpoint(state, writer)
+                        last = time.monotonic()
+                        if progress:
+                            progress(state)
+            finally:
+                pool.shutdown(cancel_futures=True)
+            writer.add(MANIFEST_NAME, _manifest(state))
+            writer.close()
+        except Exception as e:
+            # Zaehler des letzten Pruefpunkts behalten: resume setzt dort an
+            state = _read(archive_id)
+            state.update(status=ERROR, error=str(e))
+            _write(state)
+            return state
+        os.replace(part, archive_path(state))
+        state.update(status=DONE, bytes=os.path.getsize(archive_path(state)), finished=time.time(),
+                     checkpoint=None)
+        _write(state)
+        for entry in os.scandir(ARCHIVE_DIR):
+            if entry.name.startswith(os.path.basename(part) + '.dir-'):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+        return state
+
+
+# =============================================================================
+# KOMMANDOZEILE
+# =============================================================================
+def _print(state, out=sys.stdout):
+    data = public(state)
+    print(f"{data['archiveId']}  {data['status']:<12}{data['done']:>7}/{data['total']:<7}"
+          f"{data['percent']:>6.1f} %{data['failedCount']:>6} Fehler{data['bytes'] / 1048576:>10.1f} MB",
+          file=out, flush=True)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python3 -m llmchat.bulkexport',
+                                     description='Massen-Export gespeicherter Sitzungen in ein Archiv')
+    commands = parser.add_subparsers(dest='command', required=True)
+    start = commands.add_parser('start', help='neuen Export anlegen und ausfuehren')
+    selection = start.add_mutually_exclusive_group(required=True)
+    selection.add_argument('--all', action='store_true')
+    selection.add_argument('--from', dest='date_from', metavar='JJJJ-MM-TT')
+    selection.add_argument('--ids', help='Session-IDs, durch Komma getrennt')
+    start.add_argument('--to', dest='date_to', metavar='JJJJ-MM-TT')
+    start.add_argument('--formats', default=','.join(exports.FORMATS))
+    start.add_argument('--archive', choices=tuple(ARCHIVES), default='zip')
+    start.add_argument('--workers', type=int)
+    resume = commands.add_parser('resume', help='abgebrochenen Export fortsetzen')
+    resume.add_argument('archive_id')
+    resume.add_argument('--workers', type=int)
+    status = commands.add_parser('status', help='Stand eines oder aller Exporte')
+    status.add_argument('archive_id', nargs='?')
+    args = parser.parse_args(argv[1:])
+
+    if args.command == 'status':
+        states = [load(args.archive_id)] if args.archive_id else list_exports()
+        for state in states:
+            if state is None:
+                print('Export nicht gefunden', file=sys.stderr)
+                return 1
+            _print(state)
+        return 0
+
+    if args.command == 'start':
+        if args.ids:
+            selection = {'ids': args.ids.split(',')}
+        elif args.all:
+            selection = {'all': True}
+        else:
+            selection = {'from': args.date_from, 'to': args.date_to}
+        try:
+            state = create(selection, args.formats.split(','), args.archive)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        archive_id = state['id']
+    else:
+        archive_id = args.archive_id
+    try:
+        state = run(archive_id, args.workers, progress=_print)
+    except Busy as e:
+        print(e, file=sys.stderr)
+        return 1
+    if state is None:
+        print('Export nicht gefunden', file=sys.stderr)
+        return 1
+    _print(state)
+    if state['status'] == DONE:
+        print(archive_path(state))
+    elif state.get('error'):
+        print(state['error'], file=sys.stderr)
+    return 0 if state['status'] == DONE else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
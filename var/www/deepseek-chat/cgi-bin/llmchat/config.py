@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Zentrale Pfade und Einstellungen.
+
+Alle Werte koennen ueber Umgebungsvariablen (z.B. in /etc/apache2/envvars)
+ueberschrieben werden; die Vorgaben entsprechen der Produktionsinstallation.
+"""
+
+import os
+
+# Installationsverzeichnis (DocumentRoot)
+BASE_DIR = os.environ.get('LLMCHAT_BASE_DIR', '/var/www/deepseek-chat')
+
+# Verzeichnis der CGI-Scripts (enthaelt dieses Paket)
+CGI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOG_PATH = os.path.join(BASE_DIR, 'logs', 'multi-llm-chat.log')
+SESSIONS_DIR = os.path.join(BASE_DIR, 'sessions')
+SESSION_DB = os.path.join(SESSIONS_DIR, 'sessions.db')
+SEARCH_DB = os.path.join(SESSIONS_DIR, 'search.db')
+KOMPRESSOR_DIR = os.path.join(BASE_DIR, 'kompressor')
+CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+JOBS_DIR = os.path.join(BASE_DIR, 'jobs')
+TOKENIZER_DIR = os.path.join(BASE_DIR, 'tokenizers')
+BLOBS_DIR = os.path.join(BASE_DIR, 'blobs')
+ARCHIVE_DIR = os.path.join(BASE_DIR, 'archives')
+
+# Interpreter fuer Hintergrund-Jobs (llmchat/jobs.py); sys.executable ist
+# unter mod_wsgi nicht zwingend Python, sondern z.B. das Apache-Binary
+PYTHON = os.environ.get('LLMCHAT_PYTHON', '/usr/bin/python3')
+
+
+def env_int(name, default):
+    """Liest eine ganzzahlige Einstellung aus der Umgebung."""
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_float(name, default):
+    """Liest eine Gleitkomma-Einstellung aus der Umgebung."""
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_bool(name, default=False):
+    """Liest einen Schalter (1/0, true/false, on/off) aus der Umgebung."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
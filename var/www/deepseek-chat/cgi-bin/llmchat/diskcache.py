@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Inhaltsadressierter Datei-Cache mit TTL, LRU-Verdraengung und Zaehlern.
+
+Grundlage fuer die Caches unter BASE_DIR/cache/ (Antworten, Exporte, ...).
+Jeder Eintrag ist eine Datei
+
+    <Verzeichnis>/<key[:2]>/<key>.bin
+
+bestehend aus einer JSON-Kopfzeile (Erstellzeit, Metadaten) und den
+Nutzdaten. Schreiben erfolgt atomar (temporaere Datei + os.replace), daher
+sehen parallele CGI-Prozesse nie halbe Eintraege. Die mtime einer Datei ist
+ihr letzter Zugriff (LRU); ueberschreitet der Cache max_bytes, werden die am
+laengsten nicht genutzten Eintraege geloescht, bis 90 % der Grenze erreicht
+sind. Trefferzaehler liegen in <Verzeichnis>/stats.json (per flock
+prozessuebergreifend gezaehlt), ebenso die laufende Summe stored_bytes:
+put() zaehlt sie fort und durchsucht das Verzeichnis erst, wenn sie
+max_bytes uebersteigt (evict() setzt sie danach auf den tatsaechlichen
+Stand). Geloeschte oder abgelaufene Eintraege zaehlen bis dahin weiter mit -
+die Summe ist eine Naeherung (eher zu gross), kein stat() pro Eintrag bei jedem put().
+
+    cache = DiskCache('/var/www/deepseek-chat/cache/responses', 200 * 2**20, ttl=86400)
+    key = make_key('openai', model, messages, max_tokens)
+    data = cache.get(key)          # bytes oder None
+    cache.put(key, data, meta={'model': model})
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+_SUFFIX = '.bin'
+_STATS_FILE = 'stats.json'
+_LOCK_FILE = '.lock'
+
+
+def make_key(*parts):
+    """SHA-256 ueber die kanonische JSON-Darstellung aller Teile."""
+    canonical = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+    """Datei-Cache; alle Methoden sind fehlertolerant (Cache ist optional)."""
+
+    def __init__(self, directory, max_bytes, ttl=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+    # --- Pfade ---------------------------------------------------------------
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + _SUFFIX)
+
+    # --- Lesen/Schreiben -----------------------------------------------------
+    def get(self, key, count=True):
+        """Liefert die Nutzdaten oder None (abgelaufen, fehlt, defekt)."""
+        entry = self.get_entry(key, count=count)
+        return None if entry is None else entry[1]
+
+    def get_entry(self, key, count=True):
+        """Liefert (meta, data) oder None."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                data = f.read()
+        except (OSError, ValueError):
+            if count:
+                self.count('misses')
+            return None
+        if self.ttl and time.time() - header.get('created', 0) > self.ttl:
+            self._remove(path)
+            if count:
+                self.count('misses', expired=1)
+            return None
+        try:
+            os.utime(path)  # LRU: letzter Zugriff
+        except OSError:
+            pass
+        if count:
+            self.count('hits')
+        return header.get('meta', {}), data
+
+    def put(self, key, data, meta=None):
+        """Speichert einen Eintrag atomar; danach ggf. Verdraengung."""
+        path = self._path(key)
+        header = json.dumps({'created': time.time(), 'meta': meta or {}},
+                            ensure_ascii=False).encode('utf-8')
+        size = len(data) + len(header) + 1
+        if size > self.max_bytes:
+            return False
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        try:
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(header + b'\n')
+                    f.write(data)
+                os.chmod(tmp, 0o600)
+                os.replace(tmp, path)
+            except BaseException:
+                self._remove(tmp)
+                raise
+        except OSError:
+            return False
+        stored = self._add_stored(size - old_size)
+        # Summe unbekannt (stats.json fehlt, aeltere Version) oder ueber der Grenze
+        if stored is None or stored > self.max_bytes:
+            self.evict()
+        return True
+
+    def delete(self, key):
+        return self._remove(self._path(key))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    # --- Verdraengung --------------------------------------------------------
+    def entries(self):
+        """Liste (mtime, groesse, pfad) aller Eintraege."""
+        result = []
+        try:
+            shards = list(os.scandir(self.directory))
+        except OSError:
+            return result
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            try:
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(_SUFFIX):
+                        st = entry.stat()
+                        result.append((st.st_mtime, st.st_size, entry.path))
+            except OSError:
+                continue
+        return result
+
+    def evict(self):
+        """LRU-Verdraengung bis 90 % von max_bytes; liefert Anzahl geloeschter."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            self._set_stored_bytes(total)
+            return 0
+        entries.sort()
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            if self._remove(path):
+                total -= size
+                removed += 1
+        if removed:
+            self.count('evictions', n=removed)
+        self._set_stored_bytes(total)
+        return removed
+
+    def clear(self):
+        removed = 0
+        for _, _, path in self.entries():
+            removed += self._remove(path)
+        return removed
+
+    # --- Zaehler -------------------------------------------------------------
+    def count(self, name, n=1, **more):
+        """Erhoeht Zaehler in stats.json (prozessuebergreifend per flock)."""
+        def change(stats):
+            stats[name] = stats.get(name, 0) + n
+            for extra, value in more.items():
+                stats[extra] = stats.get(extra, 0) + value
+        self._update_stats(change)
+
+    def _add_stored(self, delta):
+        """Zaehlt einen Speichervorgang; liefert stored_bytes danach oder None (unbekannt)."""
+        result = []
+
+        def change(stats):
+            stats['stores'] = stats.get('stores', 0) + 1
+            if 'stored_bytes' in stats:
+                stats['stored_bytes'] += delta
+                result.append(stats['stored_bytes'])
+        self._update_stats(change)
+        return result[0] if result else None
+
+    def _set_stored_bytes(self, total):
+        def change(stats):
+            stats['stored_bytes'] = total
+        self._update_stats(change)
+
+    def _update_stats(self, change):
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            with open(os.path.join(self.directory, _LOCK_FILE), 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                stats_path = os.path.join(self.directory, _STATS_FILE)
+                try:
+                    with open(stats_path, 'r', encoding='utf-8') as f:
+                        stats = json.load(f)
+                except (OSError, ValueError):
+                    stats = {}
+                change(stats)
+                tmp = stats_path + '.tmp'
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(stats, f)
+                os.replace(tmp, stats_path)
+        except OSError:
+            pass
+
+    def stats(self):
+        """Zaehler plus aktuelle Anzahl/Groesse der Eintraege."""
+        try:
+            with open(os.path.join(self.directory, _STATS_FILE), 'r', encoding='utf-8') as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            stats = {}
+        for name in ('hits', 'misses', 'stores', 'evictions', 'expired'):
+            stats.setdefault(name, 0)
+        entries = self.entries()
+        stats['entries'] = len(entries)
+        stats['bytes'] = sum(size for _, size, _ in entries)
+        stats['max_bytes'] = self.max_bytes
+        stats['ttl'] = self.ttl
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else None
+        return stats
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Cache fertiger Exporte (export-pdf.py, export-markdown.py, export-txt.py,
+export-rtf.py, export-bundle.py).
+
+Jeder Klick auf Exportieren rendert bisher neu - auch wenn dieselbe
+unveraenderte Sitzung zweimal exportiert wird oder eine einzelne Nachricht
+(Export-Menue am Nachrichtenende) erneut. Schluessel ist ein SHA-256 ueber
+
+    Format, Stand der Renderer (mtime/Groesse von RENDERERS), normalisiertes chatData
+
+key_data() behaelt nur, was die Exporte lesen: je Nachricht role, content,
+timestamp, mode, hasFile, estimatedTokens; serverInfo name/ip; settings
+addressForm/defaultMode. Anhang-Referenzen bleiben unaufgeloest (sie sind
+selbst Hashes), ein Treffer liest also auch keine Anhaenge. Vom
+Export-Zeitstempel (index.html setzt ihn bei jedem Klick neu) zaehlt nur
+der Tag: am selben Tag zeigt ein Treffer Datum und Uhrzeit der ersten
+Erzeugung.
+
+Gespeichert wird die fertige Datei mit ihrem Dateinamen, nur vollstaendige
+Exporte (kein abgebrochenes PDF) bis MAX_ENTRY_BYTES. Einzel-Export und
+Bundle teilen sich die Eintraege.
+
+Einstellungen (Umgebungsvariablen):
+
+  LLMCHAT_EXPORT_CACHE=0                Cache ausschalten (Vorgabe: an)
+  LLMCHAT_EXPORT_CACHE_TTL=604800       Lebensdauer eines Eintrags (7 Tage)
+  LLMCHAT_EXPORT_CACHE_MAX_MB=200       Groessengrenze (LRU-Verdraengung)
+
+Zaehler: GET /cgi-bin/cache-stats.py (exports)
+"""
+
+import os
+
+from llmchat.config import CACHE_DIR, env_bool, env_int
+from llmchat.diskcache import DiskCache, make_key
+
+ENABLED = env_bool('LLMCHAT_EXPORT_CACHE', True)
+TTL = env_int('LLMCHAT_EXPORT_CACHE_TTL', 7 * 86400)
+MAX_BYTES = env_int('LLMCHAT_EXPORT_CACHE_MAX_MB', 200) * 1024 * 1024
+MAX_ENTRY_BYTES = 16 * 1024 * 1024
+
+MESSAGE_FIELDS = ('role', 'content', 'timestamp', 'mode', 'hasFile', 'estimatedTokens')
+SERVER_FIELDS = ('name', 'ip')
+SETTINGS_FIELDS = ('addressForm', 'defaultMode')
+
+# Module, deren Stand in den Schluessel eingeht (Zwischenform und Renderer)
+RENDERERS = tuple(os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+                  for name in ('exports.py', 'exportpdf.py', 'pdfstream.py'))
+
+cache = DiskCache(os.path.join(CACHE_DIR, 'exports'), MAX_BYTES, ttl=TTL)
+
+
+def _pick(data, fields):
+    if not isinstance(data, dict):
+        return data
+    return {name: data[name] for name in fields if name in data}
+
+
+def key_data(chat_data):
+    """Die fuer das Ergebnis massgeblichen Teile von chatData."""
+    messages = chat_data.get('messages', [])
+    timestamp = chat_data.get('timestamp')
+    return {
+        'messages': [_pick(msg, MESSAGE_FIELDS) for msg in messages] if isinstance(messages, list) else messages,
+        'serverInfo': _pick(chat_data.get('serverInfo', {}), SERVER_FIELDS),
+        'settings': _pick(chat_data.get('settings', {}), SETTINGS_FIELDS),
+        'day': timestamp[:10] if isinstance(timestamp, str) else None,
+    }
+
+
+def _revision():
+    revision = []
+    for path in RENDERERS:
+        try:
+            st = os.stat(path)
+        except OSError:
+            revision.append(None)
+            continue
+        revision.append([st.st_mtime_ns, st.st_size])
+    return revision
+
+
+def cache_key(fmt, chat_data):
+    """Schluessel fuer chatData im Format fmt (None, wenn der Cache aus ist)."""
+    if not ENABLED:
+        return None
+    return make_key('export', fmt, _revision(), key_data(chat_data))
+
+
+def lookup(key):
+    """(meta, bytes) oder None; meta: {"filename": ..}."""
+    if key is None:
+        return None
+    return cache.get_entry(key)
+
+
+def store(key, data, filename):
+    if key is None or not data or len(data) > MAX_ENTRY_BYTES:
+        return False
+    return cache.put(key, data, meta={'filename': filename})
+
+
+class Recorder:
+    """Sammelt gestreamte Ausgabe mit (bis MAX_ENTRY_BYTES) fuer store()."""
+
+    def __init__(self, key):
+        self._parts = [] if key is not None else None
+        self._size = 0
+
+    def add(self, data):
+        if self._parts is None:
+            return
+        self._size += len(data)
+        if self._size > MAX_ENTRY_BYTES:
+            self._parts = None
+        else:
+            self._parts.append(data)
+
+    def data(self):
+        return None if self._parts is None else b''.join(self._parts)
+
+
+def stats():
+    result = cache.stats()
+    result['enabled'] = ENABLED
+    return result
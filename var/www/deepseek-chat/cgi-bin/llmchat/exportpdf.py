@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+PDF-Renderer der Exporte (export-pdf.py, export-bundle.py).
+
+Liest die Zwischenform aus llmchat.exports und schreibt das PDF seitenweise
+ueber llmchat.pdfstream. Text wird vor der Uebergabe an platypus-Paragraphen
+escaped (& < >).
+
+Budget: LLMCHAT_PDF_MAX_PAGES Seiten (2000) und LLMCHAT_PDF_MAX_MB (100).
+estimate_pages() schaetzt vorab (eher zu niedrig); render() schliesst ein zu
+grosses Dokument nach der laufenden Seite mit einer Hinweisseite ab und
+wirft pdfstream.BudgetExceeded.
+"""
+
+from xml.sax.saxutils import escape
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.lib.colors import HexColor
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+from reportlab.lib.enums import TA_CENTER
+
+from llmchat import pdfstream
+from llmchat.config import env_int
+from llmchat.exports import role_label
+
+MAX_PAGES = env_int('LLMCHAT_PDF_MAX_PAGES', 2000)
+MAX_BYTES = env_int('LLMCHAT_PDF_MAX_MB', 100) * 1024 * 1024
+# Mehr Zeichen bzw. Zeilen passen nicht auf eine Seite (gemessen: etwa 4700
+# Zeichen Fliesstext, 52 Zeilen); die Schaetzung bleibt damit unter der
+# echten Seitenzahl, und die Vorabpruefung weist nur eindeutige Faelle ab.
+CHARS_PER_PAGE = 6000
+LINES_PER_PAGE = 65
+
+
+def estimate_pages(doc):
+    """Vorsichtige Schaetzung der Seitenzahl (eher zu niedrig)."""
+    chars = lines = 0
+    for msg in doc['messages']:
+        content = msg['content']
+        chars += len(content)
+        lines += content.count('\n')
+    return max(chars // CHARS_PER_PAGE, lines // LINES_PER_PAGE)
+
+
+def pdf_styles():
+    """Absatz-Stile des Exports."""
+    # Styles
+    styles = getSampleStyleSheet()
+
+    # Custom Styles
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=HexColor('#4dabf7'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=HexColor('#0056b3'),
+        spaceAfter=12,
+        spaceBefore=12
+    )
+
+    user_style = ParagraphStyle(
+        'UserMessage',
+        parent=styles['Normal'],
+        fontSize=10,
+        textColor=HexColor('#4dabf7'),
+        leftIndent=20,
+        spaceAfter=6
+    )
+
+    ai_style = ParagraphStyle(
+        'AIMessage',
+        parent=styles['Normal'],
+        fontSize=10,
+        textColor=HexColor('#000000'),
+        leftIndent=40,
+        spaceAfter=12
+    )
+
+    stats_style = ParagraphStyle(
+        'Stats',
+        parent=styles['Normal'],
+        fontSize=9,
+        spaceAfter=6
+    )
+
+    return {
+        'styles': styles, 'title': title_style, 'heading': heading_style,
+        'user': user_style, 'ai': ai_style, 'stats': stats_style,
+    }
+
+
+def pdf_story(doc, s):
+    """Flowables des Exports, Nachricht fuer Nachricht (Generator fuer pdfstream.Story)."""
+    styles, title_style, heading_style = s['styles'], s['title'], s['heading']
+    user_style, ai_style, stats_style = s['user'], s['ai'], s['stats']
+
+    # Titel
+    yield Paragraph("DeepSeek Chat - Export", title_style)
+    yield Spacer(1, 0.5*cm)
+
+    # Server-Info
+    server = doc['server']
+    yield Paragraph(f"<b>Server:</b> {escape(server['name'] or 'Unbekannt')} (IP: {escape(server['ip'] or 'Unbekannt')})", styles['Normal'])
+    yield Paragraph(f"<b>Export-Datum:</b> {escape(doc['exported'] or 'Unbekannt')}", styles['Normal'])
+
+    settings = doc['settings']
+    yield Paragraph(f"<b>Einstellungen:</b> {escape(settings['addressForm'])}-Form, Modus: {escape(settings['defaultMode'])}", styles['Normal'])
+    yield Spacer(1, 0.5*cm)
+
+    # Statistiken
+    messages = doc['messages']
+    stats = doc['stats']
+
+    yield Paragraph("Statistiken", heading_style)
+    yield Paragraph(f"<b>Nachrichten gesamt:</b> {stats['total']} (Benutzer: {stats['user']}, KI: {stats['ai']})", stats_style)
+
+    modes_text = escape(", ".join([f"{mode}: {count}x" for mode, count in stats['modes'].items()]))
+    yield Paragraph(f"<b>Verwendete Modi:</b> {modes_text}", stats_style)
+    yield Paragraph(f"<b>Hochgeladene Dateien:</b> {stats['files']}", stats_style)
+    yield Paragraph(f"<b>Geschaetzte Token-Nutzung:</b> {stats['tokens']}", stats_style)
+    yield Paragraph(f"<b>Chat-Dauer:</b> {escape(stats['duration'])}", stats_style)
+    yield Spacer(1, 0.5*cm)
+
+    # Inhaltsverzeichnis
+    yield Paragraph("Inhaltsverzeichnis", heading_style)
+    for msg in messages:
+        preview = msg['content'][:50] + "..." if len(msg['content']) > 50 else msg['content']
+        yield Paragraph(f"Nachricht {msg['index']} ({role_label(msg)}): {escape(preview)}", stats_style)
+
+    yield PageBreak()
+
+    # Nachrichten
+    yield Paragraph("Chat-Verlauf", heading_style)
+
+    for msg in messages:
+        mode = msg['mode']
+        content = escape(msg['content']).replace('\n', '<br/>')
+
+        # Mode-Badge
+        mode_color = '#28a745' if mode == 'deepthink' else '#17a2b8' if mode == 'search' else '#6c757d'
+        mode_badge = f'<font color="{mode_color}">[{escape(mode.upper())}]</font>'
+
+        # Nachricht
+        style = user_style if msg['role'] == 'user' else ai_style
+        yield Paragraph(f"<b>Nachricht {msg['index']} - {role_label(msg)}</b> {mode_badge} <i>({escape(msg['timestamp'])})</i>", heading_style)
+        yield Paragraph(content, style)
+        yield Spacer(1, 0.3*cm)
+
+
+def budget_notice(error):
+    """Text der Hinweisseite, wenn das Budget beim Rendern ueberschritten wird."""
+    return [
+        'Export abgebrochen - der Chat-Verlauf ist unvollständig.',
+        f'{error} (nach Seite {error.pages}).',
+        'Bitte kürzere Abschnitte exportieren oder LLMCHAT_PDF_MAX_PAGES / LLMCHAT_PDF_MAX_MB erhöhen.',
+    ]
+
+
+def render(doc, out):
+    """Schreibt das PDF der Zwischenform doc seitenweise nach out (write(bytes)).
+
+    Gibt die Seitenzahl zurueck; siehe pdfstream.render fuer BudgetExceeded.
+    """
+    template = SimpleDocTemplate(out, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm)
+    return pdfstream.render(template, pdf_story(doc, pdf_styles()), out,
+                            max_pages=MAX_PAGES, max_bytes=MAX_BYTES, notice=budget_notice)
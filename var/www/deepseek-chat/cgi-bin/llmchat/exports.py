@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+"""
+Gemeinsamer Kern der Exporte (export-*.py, export-bundle.py).
+
+Bisher hatte jedes Export-Script seine eigene Kopie von
+calculate_statistics(), loeste Anhaenge selbst auf und las die Nachrichten
+mit eigenen Annahmen (Rollen, Zeitstempel, nur String-Inhalte). Jetzt gibt
+es eine Zwischenform, die normalize() in einem Durchgang erzeugt:
+
+    {"exported": "<ISO-Zeit des Exports oder None>",
+     "server":   {"name": .., "ip": ..},          (None, wenn nicht gesendet)
+     "settings": {"addressForm": .., "defaultMode": ..},
+     "messages": [{"index": 1, "role": "user"|"assistant"|.., "content": "<Text>",
+                   "timestamp": "<Anzeige>", "mode": "chat", "hasFile": False,
+                   "tokens": 0}, ..],
+     "stats":    {"total", "user", "ai", "modes", "files", "tokens", "duration"}}
+
+  - Anhang-Referenzen sind aufgeloest (llmchat.blobs), multimodale Inhalte
+    auf ihren Text reduziert, Bilder als [Bild]
+  - ISO-Zeitstempel werden zu "JJJJ-MM-TT HH:MM:SS", andere (index.html:
+    toLocaleString) bleiben, wie sie sind
+
+Die Renderer (render_markdown/_txt/_rtf hier, PDF in llmchat.exportpdf)
+lesen nur diese Form. export() liefert die fertige Datei eines Textformats
+ueber den Export-Cache (llmchat.exportcache).
+"""
+
+import re
+from datetime import datetime
+
+from llmchat import blobs, exportcache
+from llmchat.web import cors_headers
+
+# Format -> (Content-Type, Dateiendung)
+FORMATS = {
+    'pdf': ('application/pdf', 'pdf'),
+    'md': ('text/markdown; charset=utf-8', 'md'),
+    'txt': ('text/plain; charset=utf-8', 'txt'),
+    'rtf': ('application/rtf', 'rtf'),
+}
+TEXT_FORMATS = ('md', 'txt', 'rtf')
+
+IMAGE_PLACEHOLDER = '[Bild]'
+_ISO_RE = re.compile(r'^(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})')
+
+
+# =============================================================================
+# ZWISCHENFORM
+# =============================================================================
+def content_text(content):
+    """Text einer Nachricht (String oder multimodales Array)."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for item in content:
+            if isinstance(item, str):
+                parts.append(item)
+            elif isinstance(item, dict):
+                if item.get('type') == 'text':
+                    parts.append(item.get('text', ''))
+                elif item.get('type') in ('image', 'image_url'):
+                    parts.append(IMAGE_PLACEHOLDER)
+        return '\n'.join(part for part in parts if part)
+    return '' if content is None else str(content)
+
+
+def display_time(value):
+    """ISO-Zeitstempel lesbar machen; alles andere unveraendert als Text."""
+    if not isinstance(value, str):
+        return '' if value is None else str(value)
+    match = _ISO_RE.match(value)
+    return f'{match.group(1)} {match.group(2)}' if match else value
+
+
+def calculate_statistics(messages):
+    """Berechnet Statistiken aus den (normalisierten) Nachrichten."""
+    modes = {}
+    for msg in messages:
+        modes[msg['mode']] = modes.get(msg['mode'], 0) + 1
+    if messages:
+        duration = f"{messages[0]['timestamp']} bis {messages[-1]['timestamp']}"
+    else:
+        duration = "Keine Nachrichten"
+    return {
+        'total': len(messages),
+        'user': sum(1 for msg in messages if msg['role'] == 'user'),
+        'ai': sum(1 for msg in messages if msg['role'] == 'assistant'),
+        'modes': modes,
+        'files': sum(1 for msg in messages if msg['hasFile']),
+        'tokens': sum(msg['tokens'] for msg in messages),
+        'duration': duration,
+    }
+
+
+def normalize(chat_data):
+    """chatData (wie von index.html gesendet) -> Zwischenform."""
+    messages = []
+    raw_messages = chat_data.get('messages', [])
+    for msg in blobs.resolve_messages(raw_messages if isinstance(raw_messages, list) else []):
+        if not isinstance(msg, dict):
+            continue
+        tokens = msg.get('estimatedTokens', 0)
+        messages.append({
+            'index': len(messages) + 1,
+            'role': msg.get('role') or 'unknown',
+            'content': content_text(msg.get('content')),
+            'timestamp': display_time(msg.get('timestamp', '')),
+            'mode': msg.get('mode') or 'chat',
+            'hasFile': bool(msg.get('hasFile', False)),
+            'tokens': tokens if isinstance(tokens, (int, float)) else 0,
+        })
+    server_info = chat_data.get('serverInfo') or {}
+    settings = chat_data.get('settings') or {}
+    exported = chat_data.get('timestamp')
+    return {
+        'exported': exported if isinstance(exported, str) else None,
+        'server': {'name': server_info.get('name'), 'ip': server_info.get('ip')},
+        'settings': {'addressForm': settings.get('addressForm', 'sie'),
+                     'defaultMode': settings.get('defaultMode', 'chat')},
+        'messages': messages,
+        'stats': calculate_statistics(messages),
+    }
+
+
+def role_label(msg):
+    return "Benutzer" if msg['role'] == 'user' else "KI"
+
+
+def export_time(doc):
+    """Export-Zeitpunkt als ISO-Text (fehlt er, dann jetzt)."""
+    return doc['exported'] or datetime.now().isoformat()
+
+
+def filename(fmt, doc):
+    """Dateiname des Anhangs wie bisher je Script."""
+    ext = FORMATS[fmt][1]
+    if fmt in ('txt', 'rtf'):
+        return f"deepseek-chat-{export_time(doc)[:10]}.{ext}"
+    return f"deepseek-chat-export.{ext}"
+
+
+# =============================================================================
+# TEXT-RENDERER
+# =============================================================================
+def render_markdown(doc):
+    """Erstellt Markdown aus der Zwischenform."""
+    lines = []
+
+    # Titel
+    lines.append("# DeepSeek Chat - Export")
+    lines.append("")
+
+    # Server-Info
+    server = doc['server']
+    lines.append(f"**Server:** {server['name'] or 'Unbekannt'} (IP: {server['ip'] or 'Unbekannt'})")
+    lines.append(f"**Export-Datum:** {doc['exported'] or 'Unbekannt'}")
+
+    settings = doc['settings']
+    lines.append(f"**Einstellungen:** {settings['addressForm']}-Form, Modus: {settings['defaultMode']}")
+    lines.append("")
+    lines.append("---")
+    lines.append("")
+
+    # Statistiken
+    messages = doc['messages']
+    stats = doc['stats']
+
+    lines.append("## Statistiken")
+    lines.append("")
+    lines.append(f"- **Nachrichten gesamt:** {stats['total']} (Benutzer: {stats['user']}, KI: {stats['ai']})")
+
+    modes_text = ", ".join([f"{mode}: {count}x" for mode, count in stats['modes'].items()])
+    lines.append(f"- **Verwendete Modi:** {modes_text}")
+    lines.append(f"- **Hochgeladene Dateien:** {stats['files']}")
+    lines.append(f"- **Geschaetzte Token-Nutzung:** {stats['tokens']}")
+    lines.append(f"- **Chat-Dauer:** {stats['duration']}")
+    lines.append("")
+    lines.append("---")
+    lines.append("")
+
+    # Inhaltsverzeichnis
+    lines.append("## Inhaltsverzeichnis")
+    lines.append("")
+    for msg in messages:
+        preview = msg['content'][:50] + "..." if len(msg['content']) > 50 else msg['content']
+        lines.append(f"- [Nachricht {msg['index']} ({role_label(msg)})](#nachricht-{msg['index']}): {preview}")
+    lines.append("")
+    lines.append("---")
+    lines.append("")
+
+    # Nachrichten
+    lines.append("## Chat-Verlauf")
+    lines.append("")
+
+    for msg in messages:
+        idx = msg['index']
+        lines.append(f"### Nachricht {idx} - {role_label(msg)} [{msg['mode'].upper()}] {{#nachricht-{idx}}}")
+        lines.append(f"*{msg['timestamp']}*")
+        lines.append("")
+        lines.append(msg['content'])
+        lines.append("")
+        lines.append("---")
+        lines.append("")
+
+    # Footer
+    lines.append("*Exportiert mit DeepSeek Chat v1.0*")
+
+    return "\n".join(lines) + "\n"
+
+
+def render_txt(doc):
+    """Erstellt reinen Text aus der Zwischenform."""
+    messages = doc['messages']
+    server = doc['server']
+    timestamp = export_time(doc)
+
+    lines = []
+    lines.append("=" * 60)
+    lines.append("DEEPSEEK CHAT - EXPORT")
+    lines.append("=" * 60)
+    lines.append(f"Server: {server['name'] or 'DeepSeek Chat'}")
+    lines.append(f"IP:     {server['ip'] or 'unbekannt'}")
+    lines.append(f"Datum:  {timestamp[:10]}  Uhrzeit: {timestamp[11:19]}")
+    lines.append(f"Anzahl Nachrichten: {len(messages)}")
+    lines.append("=" * 60)
+    lines.append("")
+
+    for msg in messages:
+        if msg['role'] == 'user':
+            lines.append(f"USER [{msg['timestamp']}]:")
+        else:
+            lines.append(f"DEEPSEEK AI [{msg['timestamp']}]:")
+        lines.append("-" * 40)
+        lines.append(msg['content'])
+        lines.append("")
+        lines.append("=" * 60)
+        lines.append("")
+
+    return "\n".join(lines)
+
+
+def escape_rtf(text):
+    """Text fuer RTF escapen und Umlaute konvertieren"""
+    # RTF Sonderzeichen escapen
+    text = text.replace('\\', '\\\\')
+    text = text.replace('{', '\\{')
+    text = text.replace('}', '\\}')
+    # Umlaute als RTF-Codes
+    text = text.replace('ä', "\\'e4")
+    text = text.replace('ö', "\\'f6")
+    text = text.replace('ü', "\\'fc")
+    text = text.replace('ß', "\\'df")
+    text = text.replace('Ä', "\\'c4")
+    text = text.replace('Ö', "\\'d6")
+    text = text.replace('Ü', "\\'dc")
+    # Zeilenumbrueche
+    text = text.replace('\n', '\\par\n')
+    return text
+
+
+def render_rtf(doc):
+    """Erstellt RTF aus der Zwischenform (ohne externe Library)."""
+    messages = doc['messages']
+    server = doc['server']
+    timestamp = export_time(doc)
+    date_str = timestamp[:10]
+    time_str = timestamp[11:19]
+
+    # RTF Dokument aufbauen
+    rtf_parts = []
+    rtf_parts.append(r'{\rtf1\ansi\ansicpg1252\deff0')
+    rtf_parts.append(r'{\fonttbl{\f0\fswiss\fcharset0 Arial;}{\f1\fmodern\fcharset0 Courier New;}}')
+    rtf_parts.append(r'{\colortbl;\red0\green86\blue179;\red40\green40\blue40;\red220\green53\blue69;\red40\green167\blue69;}')
+    rtf_parts.append(r'\f0\fs22\sa200')
+    rtf_parts.append('')
+
+    # Titel
+    rtf_parts.append(r'{\pard\qc\sb300{\b\fs32\cf1 DeepSeek Chat - Export}\par}')
+    rtf_parts.append(r'{\pard\qc\sb100{\fs20\cf2 ' + f'Server: {escape_rtf(server["name"] or "DeepSeek Chat")}' + r'}\par}')
+    rtf_parts.append(r'{\pard\qc\sb100{\fs20\cf2 ' + f'IP: {escape_rtf(server["ip"] or "unbekannt")}' + r'}\par}')
+    rtf_parts.append(r'{\pard\qc\sb100{\fs20\cf2 ' + f'Datum: {date_str}  Uhrzeit: {time_str}' + r'}\par}')
+    rtf_parts.append(r'{\pard\qc\sb100{\fs20\cf2 ' + f'Nachrichten: {len(messages)}' + r'}\par}')
+    rtf_parts.append(r'{\pard\brdrb\brdrs\brdrw10\brsp20 \par}')
+    rtf_parts.append('')
+
+    for msg in messages:
+        if msg['role'] == 'user':
+            label = f"USER [{msg['timestamp']}]"
+            color = r'\cf1'
+        else:
+            label = f"DEEPSEEK AI [{msg['timestamp']}]"
+            color = r'\cf4'
+
+        # Rolle als Header
+        rtf_parts.append(r'{\pard\sb200{\b\fs24' + color + ' ' + escape_rtf(label) + r'}\par}')
+        rtf_parts.append(r'{\pard\sb50\brdrb\brdrs\brdrw5\brsp10 \par}')
+        # Nachrichtentext
+        rtf_parts.append(r'{\pard\sb100\f0\fs22\cf2 ' + escape_rtf(msg['content']) + r'\par}')
+        rtf_parts.append(r'{\pard\sb200\brdrb\brdrs\brdrw15\brsp20 \par}')
+        rtf_parts.append('')
+
+    rtf_parts.append('}')
+    return '\n'.join(rtf_parts)
+
+
+RENDERERS = {
+    'md': (render_markdown, 'utf-8'),
+    'txt': (render_txt, 'utf-8'),
+    'rtf': (render_rtf, 'latin-1'),
+}
+
+
+def render(fmt, doc):
+    """Datei eines Textformats als bytes."""
+    renderer, encoding = RENDERERS[fmt]
+    return renderer(doc).encode(encoding, errors='replace')
+
+
+# =============================================================================
+# EXPORT MIT CACHE
+# =============================================================================
+def export(fmt, chat_data, doc=None, store=True):
+    """(bytes, Dateiname) eines Textformats; Treffer aus dem Export-Cache.
+
+    doc: bereits normalisierte Zwischenform (export-bundle.py), sonst wird
+    chatData erst bei einem Cache-Fehlschlag normalisiert. store=False liest
+    nur aus dem Cache (Massen-Export, llmchat.bulkexport).
+    """
+    key = exportcache.cache_key(fmt, chat_data)
+    entry = exportcache.lookup(key)
+    if entry is not None:
+        meta, data = entry
+        return data, meta.get('filename') or filename(fmt, doc or normalize(chat_data))
+    if doc is None:
+        doc = normalize(chat_data)
+    data, name = render(fmt, doc), filename(fmt, doc)
+    if store:
+        exportcache.store(key, data, name)
+    return data, name
+
+
+def file_headers(fmt, name):
+    """Antwort-Header eines Exports (ohne Content-Length)."""
+    return [('Content-Type', FORMATS[fmt][0])] + cors_headers() + [
+        ('Content-Disposition', f'attachment; filename="{name}"'),
+    ]
+
+
+def send_file(resp, fmt, data, name):
+    resp.start(200, file_headers(fmt, name) + [('Content-Length', str(len(data)))])
+    resp.write(data)
+    resp.flush()
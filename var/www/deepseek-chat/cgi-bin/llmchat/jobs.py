@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Hintergrund-Jobs fuer lange Aufrufe (Kontext-Komprimierung, ...).
+
+Ein Handler legt einen Job an und antwortet sofort mit dessen ID; die
+eigentliche Arbeit erledigt ein abgekoppelter Prozess desselben Scripts
+(eigene Session, stdin/stdout geschlossen), der weder an den CGI-Request
+noch an einen Thread des Applikationsservers gebunden ist:
+
+    job_id = jobs.create('compress', payload)
+    jobs.spawn(__file__, job_id)            # startet: <script> --job <id>
+    ...
+    job = jobs.load(job_id)                 # Status fuer GET ?job=<id>
+
+Jeder Job ist eine JSON-Datei JOBS_DIR/<id>.json (Rechte 600, atomar
+geschrieben) mit status queued -> running -> done | error. Ein Job, der
+laenger als LLMCHAT_JOB_TIMEOUT Sekunden (Vorgabe 300) nicht fertig wird
+(z.B. Worker abgestuerzt), wird als Fehler gemeldet. Abgeschlossene Jobs
+werden nach LLMCHAT_JOB_KEEP Sekunden (Vorgabe 3600) beim Anlegen neuer
+Jobs entfernt. Der Worker laeuft mit LLMCHAT_PYTHON (Vorgabe /usr/bin/python3
+wie die Shebangs der Scripts).
+"""
+
+import json
+import os
+import re
+import subprocess
+import tempfile
+import time
+import uuid
+
+from llmchat.config import JOBS_DIR, PYTHON, env_int
+
+TIMEOUT = env_int('LLMCHAT_JOB_TIMEOUT', 300)
+KEEP = env_int('LLMCHAT_JOB_KEEP', 3600)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+ERROR = 'error'
+
+_JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def valid_job_id(job_id):
+    return isinstance(job_id, str) and bool(_JOB_ID_RE.match(job_id))
+
+
+def _path(job_id):
+    return os.path.join(JOBS_DIR, f'{job_id}.json')
+
+
+def _write(job):
+    os.makedirs(JOBS_DIR, mode=0o700, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=JOBS_DIR, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, _path(job['id']))
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def create(kind, payload):
+    """Legt einen Job an und liefert seine ID."""
+    cleanup()
+    now = time.time()
+    job = {
+        'id': uuid.uuid4().hex,
+        'kind': kind,
+        'status': QUEUED,
+        'created': now,
+        'updated': now,
+        'payload': payload,
+    }
+    _write(job)
+    return job['id']
+
+
+def load(job_id):
+    """Job-Daten oder None; haengende Jobs werden als Fehler gemeldet."""
+    if not valid_job_id(job_id):
+        return None
+    try:
+        with open(_path(job_id), 'r', encoding='utf-8') as f:
+            job = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if job.get('status') in (QUEUED, RUNNING) and time.time() - job.get('created', 0) > TIMEOUT:
+        job['status'] = ERROR
+        job['error'] = f'Zeitueberschreitung nach {TIMEOUT} s'
+    return job
+
+
+def update(job_id, **fields):
+    """Aktualisiert Felder eines Jobs (nur der Worker schreibt)."""
+    job = load(job_id)
+    if job is None:
+        return None
+    job.update(fields)
+    job['updated'] = time.time()
+    if job['status'] in (DONE, ERROR):
+        job.pop('payload', None)  # Eingabedaten werden nicht mehr gebraucht
+    _write(job)
+    return job
+
+
+def public(job):
+    """Job-Daten fuer den Client (ohne Eingabedaten)."""
+    data = {key: value for key, value in job.items() if key != 'payload'}
+    data['jobId'] = data.pop('id')
+    data['elapsed'] = round(job.get('updated', job['created']) - job['created'], 1)
+    return data
+
+
+def spawn(script, job_id):
+    """Startet `LLMCHAT_PYTHON <script> --job <id>` abgekoppelt im Hintergrund."""
+    subprocess.Popen(
+        [PYTHON, os.path.abspath(script), '--job', job_id],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True, close_fds=True,
+    )
+
+
+def job_argument(argv):
+    """Job-ID aus der Kommandozeile (`--job <id>`) oder None."""
+    if len(argv) == 3 and argv[1] == '--job' and valid_job_id(argv[2]):
+        return argv[2]
+    return None
+
+
+def cleanup(keep=None):
+    """Entfernt abgeschlossene oder verwaiste Jobs, die aelter als keep Sekunden sind."""
+    keep = KEEP if keep is None else keep
+    limit = time.time() - max(keep, TIMEOUT)
+    removed = 0
+    try:
+        entries = list(os.scandir(JOBS_DIR))
+    except OSError:
+        return removed
+    for entry in entries:
+        try:
+            if entry.name.endswith('.json') and entry.stat().st_mtime < limit:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
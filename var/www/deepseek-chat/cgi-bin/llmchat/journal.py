@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Aenderungs-Journal einer Sitzung (append-only, JSON Lines).
+
+Bisher schickt index.html nach jeder Antwort, jeder Komprimierung und vor
+jedem Laden einer Sitzung den kompletten Verlauf, und die Sitzungsdatei wird
+komplett neu geschrieben - die Schreiblast waechst quadratisch mit der
+Laenge eines Gespraechs. Stattdessen sendet der Browser nur noch Deltas:
+
+    {"sessionId": ..., "offset": "3f9a61c2b0d4:7",
+     "ops": [{"op": "append",   "messages": [...]},
+             {"op": "truncate", "count": 12},
+             {"op": "replace",  "start": 0, "end": 30, "messages": [summary]},
+             {"op": "meta",     "fields": {"settings": {...}}}]}
+
+offset ist der zuletzt bekannte Journal-Stand (opak; Antwort von save- und
+load-session.py). Weicht er vom gespeicherten Stand ab, antwortet
+save-session.py mit 409 / session_out_of_sync und dem aktuellen offset;
+index.html speichert dann einmalig den vollen Verlauf.
+
+Dateiformat der files-Engine (llmchat/sessionstore.py):
+
+  <id>.json      Snapshot (chatData + "_journal": {"gen": .., "applied": n})
+  <id>.journal   je Zeile {"g": gen, "n": n, "ops": [...]}
+
+Lesen = Snapshot + alle Zeilen derselben Generation mit n > applied. Ein
+volles Speichern beginnt eine neue Generation (Snapshot, Journal geloescht).
+Die Verdichtung schreibt den Snapshot mit applied = n neu und loescht das
+Journal - Zeilen, die ein Absturz dazwischen uebrig laesst, werden beim
+Lesen uebersprungen. Verdichtet wird, sobald das Journal groesser ist als
+LLMCHAT_SESSION_JOURNAL_RATIO (1.0) x Snapshot, mindestens aber
+LLMCHAT_SESSION_JOURNAL_MIN_KB (64); ausserdem per
+
+    python3 -m llmchat.sessionstore compact
+"""
+
+import json
+import os
+import uuid
+
+from llmchat.config import env_float, env_int
+
+COMPACT_MIN_BYTES = env_int('LLMCHAT_SESSION_JOURNAL_MIN_KB', 64) * 1024
+COMPACT_RATIO = env_float('LLMCHAT_SESSION_JOURNAL_RATIO', 1.0)
+
+OPS = ('append', 'truncate', 'replace', 'meta')
+
+
+class JournalError(ValueError):
+    """Ungueltige Operation (save-session.py: 400)."""
+
+
+class OffsetMismatch(Exception):
+    """Journal-Stand des Browsers ist veraltet (save-session.py: 409)."""
+
+    def __init__(self, offset):
+        super().__init__('Journal-Stand weicht ab')
+        self.offset = offset
+
+
+def _index(value, name):
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise JournalError(f'{name} muss eine Zahl >= 0 sein')
+    return value
+
+
+def validate(ops):
+    """Prueft Aufbau und Typen aller Operationen."""
+    if not isinstance(ops, list) or not ops:
+        raise JournalError('ops muss eine nicht-leere Liste sein')
+    for op in ops:
+        kind = op.get('op') if isinstance(op, dict) else None
+        if kind not in OPS:
+            raise JournalError(f'Unbekannte Operation: {kind}')
+        if kind in ('append', 'replace') and not isinstance(op.get('messages'), list):
+            raise JournalError(f'{kind}: messages erforderlich')
+        if kind == 'truncate':
+            _index(op.get('count'), 'count')
+        if kind == 'replace':
+            if _index(op.get('start'), 'start') > _index(op.get('end'), 'end'):
+                raise JournalError('replace: start > end')
+        if kind == 'meta' and not isinstance(op.get('fields'), dict):
+            raise JournalError('meta: fields erforderlich')
+
+
+def apply(chat_data, ops):
+    """Wendet Operationen auf chatData an (veraendert und liefert chat_data)."""
+    messages = chat_data.setdefault('messages', [])
+    for op in ops:
+        kind = op['op']
+        if kind == 'append':
+            messages.extend(op['messages'])
+        elif kind == 'truncate':
+            del messages[op['count']:]
+        elif kind == 'replace':
+            if op['end'] > len(messages):
+                raise JournalError('replace: end hinter dem Verlaufsende')
+            messages[op['start']:op['end']] = op['messages']
+        elif kind == 'meta':
+            chat_data.update({key: value for key, value in op['fields'].items() if key != 'messages'})
+    return chat_data
+
+
+# =============================================================================
+# OFFSET / DATEIEN
+# =============================================================================
+def new_generation():
+    return uuid.uuid4().hex[:12]
+
+
+def make_offset(generation, n):
+    return f'{generation}:{n}'
+
+
+def read(path, generation, applied):
+    """Operationen (n, ops) der Generation mit n > applied, in Reihenfolge."""
+    entries = []
+    try:
+        f = open(path, 'r', encoding='utf-8')
+    except OSError:
+        return entries
+    with f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # abgebrochene Zeile nach einem Absturz
+            if isinstance(entry, dict) and entry.get('g') == generation and entry.get('n', 0) > applied:
+                entries.append((entry['n'], entry['ops']))
+    return entries
+
+
+def append(path, generation, n, ops):
+    """Haengt eine Zeile an; liefert die neue Groesse des Journals."""
+    line = json.dumps({'g': generation, 'n': n, 'ops': ops}, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8') + b'\n'
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        size = os.fstat(fd).st_size
+        if size:
+            # Unvollstaendige letzte Zeile (Absturz) nicht fortsetzen
+            with open(path, 'rb') as f:
+                f.seek(size - 1)
+                if f.read(1) != b'\n':
+                    line = b'\n' + line
+        os.write(fd, line)
+        return size + len(line)
+    finally:
+        os.close(fd)
+
+
+def needs_compaction(journal_size, snapshot_size):
+    return journal_size > max(COMPACT_MIN_BYTES, snapshot_size * COMPACT_RATIO)
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Request-Logging nach /var/www/deepseek-chat/logs/multi-llm-chat.log.
+
+Format (unveraendert gegenueber den bisherigen log_to_file()-Funktionen):
+
+  <ISO-Zeit> | IP: <ip> | <Methode> <URI> | Status: <code>[ | <Tag>][ | Error: ..][ | Details: ..]
+"""
+
+import datetime
+import os
+
+from llmchat.config import LOG_PATH
+
+
+def log_request(req, status_code, response_data, log_path=LOG_PATH, tag=None):
+    """Schreibt ausgewaehlte Informationen in die Log-Datei (ohne API-Key)."""
+    try:
+        if req.method == 'OPTIONS':
+            return
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        timestamp = datetime.datetime.now().isoformat()
+        error_msg = None
+        details = None
+        if isinstance(response_data, dict):
+            error_msg = response_data.get('error')
+            details = response_data.get('details')
+        log_line = f"{timestamp} | IP: {req.remote_addr} | {req.method or 'unknown'} {req.uri} | Status: {status_code}"
+        if tag:
+            log_line += f" | {tag}"
+        if error_msg:
+            log_line += f" | Error: {error_msg}"
+        if details:
+            # Details auf 300 Zeichen begrenzen
+            details_short = str(details)[:300].replace('\n', ' ')
+            log_line += f" | Details: {details_short}"
+        log_line += "\n"
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(log_line)
+    except Exception:
+        pass
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+PDF seitenweise ausgeben statt am Stueck (export-pdf.py, export-bundle.py).
+
+reportlab haelt alle Seiten bis canvas.save() im Speicher und setzt die
+Datei erst dann zusammen (PDFDocument.format -> PDFFile -> ein bytes-Objekt);
+der Aufrufer kopiert das Ergebnis noch einmal aus dem BytesIO. Bei langen
+Sitzungen ist der Speicherbedarf ein Vielfaches der PDF-Groesse, und das
+erste Byte kommt erst nach dem kompletten Rendern.
+
+Hier schreibt das Dokument jede fertige Seite samt Inhalts-Stream sofort in
+die Ausgabe und gibt beide frei. Uebrig bleiben nur kleine gemeinsame
+Objekte (Seitenbaum, Schriften, Katalog, Info); sie folgen beim Speichern
+zusammen mit Xref und Trailer. Objektnummern vergibt reportlab wie gewohnt,
+die Positionen fuer die Xref-Tabelle werden beim Schreiben mitgezaehlt - das
+Ergebnis ist ein gewoehnliches PDF, Byte fuer Byte wie vorher bis auf die
+Reihenfolge der Objekte.
+
+Die Story wird ueber Story() aus einem Generator nachgefuellt: platypus
+sieht immer nur LOOKAHEAD Flowables, statt vorab alle Nachrichten als
+Paragraphen zu bekommen.
+
+    pages = pdfstream.render(doc, flowables(), out, max_pages=2000,
+                             notice=lambda e: ['Export abgebrochen', str(e)])
+
+out braucht nur write(bytes). Ueberschreitet das Dokument max_pages bzw.
+max_bytes (0 = ohne Grenze), wird nach der laufenden Seite abgebrochen, eine
+Hinweisseite mit den Zeilen aus notice(error) angehaengt, die Datei gueltig
+abgeschlossen und BudgetExceeded geworfen.
+"""
+
+from reportlab.pdfbase import pdfdoc
+from reportlab.pdfgen import canvas as rl_canvas
+
+LOOKAHEAD = 64
+
+
+class BudgetExceeded(Exception):
+    """Seiten- oder Groessenbudget des Dokuments ueberschritten."""
+
+    def __init__(self, message, pages, size):
+        super().__init__(message)
+        self.pages = pages
+        self.size = size
+
+
+class Story(list):
+    """Flowable-Liste, die sich beim Abarbeiten aus einem Iterator nachfuellt.
+
+    platypus entnimmt Flowables vorne per del (BaseDocTemplate.build,
+    handle_flowable, handle_keepWithNext) und legt geteilte Reste per
+    Slice-Zuweisung/insert wieder vorne ab; nur del verkleinert die Liste.
+    """
+
+    def __init__(self, flowables, lookahead=LOOKAHEAD):
+        super().__init__()
+        self._source = iter(flowables)
+        self._lookahead = lookahead
+        self._fill()
+
+    def _fill(self):
+        while self._source is not None and len(self) < self._lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._fill()
+
+
+class _Output(pdfdoc.PDFFile):
+    """PDFFile, das direkt in out schreibt und nur den Offset mitzaehlt."""
+
+    def __init__(self, out, pdf_version):
+        self.strings = None
+        self.write = out.write
+        self.offset = 0
+        self.add(pdfdoc.pdfdocEnc('%%PDF-%s.%s' % pdf_version) +
+                 b'\n%\223\214\213\236 ReportLab Generated PDF document (opensource)\n')
+
+    def format(self, document):
+        return b''
+
+
+class _StreamingDocument(pdfdoc.PDFDocument):
+    """PDFDocument, das Seiten beim Hinzufuegen schreibt (siehe _Canvas)."""
+
+    def _start_stream(self, out, max_pages, max_bytes):
+        # Die Version steht im Kopf vor allen Seiten; spaeteres
+        # ensureMinPdfVersion (Transparenz) muss schon abgedeckt sein.
+        version = max([self._pdfVersion] + list(pdfdoc.PDF_SUPPORT_VERSION.values()))
+        self._pdfVersion = version
+        self._file = _Output(out, version)
+        self._written = set()
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+
+    def _emit(self, oid):
+        data = pdfdoc.PDFIndirectObject(oid, self.idToObject[oid]).format(self)
+        self.idToOffset[oid] = self._file.add(data)
+        self._written.add(oid)
+        self.idToObject[oid] = None
+
+    def addPage(self, page):
+        super().addPage(page)
+        # Beim Formatieren registriert die Seite ihren Inhalts-Stream (und
+        # beim ersten Mal den Seitenbaum, der bis zum Schluss offen bleibt).
+        self._emit(page.__InternalName__)
+        contents = page.Contents
+        if isinstance(contents, pdfdoc.PDFStream):
+            self._emit(contents.__InternalName__)
+        page.stream = page.Contents = page.Resources = None
+
+    def page_count(self):
+        return self.pageCounter - 1
+
+    def check_budget(self):
+        pages, size = self.page_count(), self._file.offset
+        if self.max_pages and pages > self.max_pages:
+            raise BudgetExceeded(f'Seitenbudget von {self.max_pages} Seiten überschritten', pages, size)
+        if self.max_bytes and size > self.max_bytes:
+            raise BudgetExceeded(f'Größenbudget von {self.max_bytes // (1024 * 1024)} MB überschritten',
+                                 pages, size)
+
+    def format(self):
+        # Wie PDFDocument.format, aber bereits geschriebene Objekte bleiben
+        # aussen vor; alles geht direkt in die Ausgabe.
+        cat, info = self.Catalog, self.info
+        self.Reference(cat)
+        self.Reference(info)
+        numbertoid = self.numberToId
+        counter, ids = 0, []
+        while True:
+            counter += 1
+            if counter not in numbertoid:
+                break
+            oid = numbertoid[counter]
+            if oid not in self._written:
+                self._emit(oid)
+            ids.append(oid)
+        xref = pdfdoc.PDFCrossReferenceTable()
+        xref.addsection(0, ids)
+        xrefoffset = self._file.add(xref.format(self))
+        trailer = pdfdoc.PDFTrailer(startxref=xrefoffset, Size=len(numbertoid) + 1,
+                                    Root=self.Reference(cat), Info=self.Reference(info), ID=self.ID())
+        self._file.add(trailer.format(self))
+        return b''
+
+
+class _Canvas(rl_canvas.Canvas):
+    """Canvas mit _StreamingDocument; prueft das Budget nach jeder Seite."""
+
+    def __init__(self, out, *args, max_pages=0, max_bytes=0, **kwargs):
+        super().__init__(out, *args, **kwargs)
+        self._doc.__class__ = _StreamingDocument
+        self._doc._start_stream(out, max_pages, max_bytes)
+
+    def showPage(self):
+        super().showPage()
+        self._doc.check_budget()
+
+
+def render(doc, flowables, out, max_pages=0, max_bytes=0, notice=None):
+    """Baut doc (platypus-DocTemplate) aus flowables (Iterable) nach out.
+
+    Gibt die Seitenzahl zurueck. Bei ueberschrittenem Budget wird die Datei
+    mit Hinweisseite abgeschlossen und BudgetExceeded geworfen.
+    """
+    canvases = []
+
+    def canvasmaker(filename, *args, **kwargs):
+        canv = _Canvas(out, *args, max_pages=max_pages, max_bytes=max_bytes, **kwargs)
+        canvases.append(canv)
+        return canv
+
+    try:
+        doc.build(Story(flowables), canvasmaker=canvasmaker)
+    except BudgetExceeded as e:
+        canv = canvases[-1]
+        canv._doc.max_pages = canv._doc.max_bytes = 0
+        width, height = canv._pagesize
+        y = height - 72
+        canv.setFont('Helvetica-Bold', 14)
+        for line in (notice(e) if notice else [str(e)]):
+            canv.drawString(72, y, line)
+            canv.setFont('Helvetica', 11)
+            y -= 20
+        canv.showPage()
+        canv.save()
+        raise
+    return canvases[-1]._doc.page_count()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Relay-Schleifen der Streaming-Proxies (Upstream-SSE -> Browser-SSE).
+
+index.html liest aus jedem Event nur choices[0].delta.content. OpenAI,
+Groq und Hugging Face liefern bereits genau dieses Format; das bisherige
+json.loads() + dict-Aufbau + json.dumps() pro Token ist dort reine
+CPU-Last. relay_openai() kennt daher drei Modi:
+
+  passthrough  Event-Payload unveraendert weiterleiten (wie deepseek-api.py)
+  filter       Inhalt von "content" per Byte-Regex herausschneiden und als
+               {"choices": [{"delta": {"content": ...}}]} ausgeben — gleiche
+               Form wie bisher, ohne JSON-Parser (Vorgabe)
+  reencode     bisheriges Verhalten: json.loads() + json.dumps() pro Event
+
+Events, die nicht wie ein OpenAI-Chunk aussehen (kein "choices", Fehler-
+Objekte, "content" hinter verschachtelten Objekten, ...), laufen in jedem
+Modus ueber den vollstaendigen Re-Encode-Pfad. Gemini (relay_gemini) hat
+ein anderes Format und wird immer umkodiert.
+
+Einstellung (Umgebungsvariable, z.B. in /etc/apache2/envvars):
+
+  LLMCHAT_STREAM_MODE=filter              fuer alle drei Anbieter
+  LLMCHAT_STREAM_MODE_GROQ=passthrough    nur fuer einen Anbieter
+                                          (_OPENAI, _GROQ, _HUGGINGFACE)
+
+Messung: python3 benchmarks/passthrough.py (CPU-Zeit pro 1.000 Token).
+"""
+
+import json
+import os
+import re
+
+from llmchat import sse
+
+MODES = ('passthrough', 'filter', 'reencode')
+DEFAULT_MODE = 'filter'
+
+# "delta": {... "content": "<JSON-String>" — ohne verschachtelte Objekte davor
+_CONTENT_RE = re.compile(rb'"delta"\s*:\s*\{[^{}]*?"content"\s*:\s*("(?:[^"\\]|\\.)*")')
+_EMPTY_STRING = b'""'
+
+
+def stream_mode(provider=None):
+    """Relay-Modus fuer einen Anbieter (openai, groq, huggingface)."""
+    mode = None
+    if provider:
+        mode = os.environ.get(f'LLMCHAT_STREAM_MODE_{provider.upper()}')
+    mode = (mode or os.environ.get('LLMCHAT_STREAM_MODE') or DEFAULT_MODE).strip().lower()
+    return mode if mode in MODES else DEFAULT_MODE
+
+
+def _reencode_openai(data, out):
+    """Vollstaendiger Pfad: Event parsen und nur delta.content weitergeben."""
+    try:
+        chunk_data = json.loads(data)
+    except ValueError:
+        return
+    if not isinstance(chunk_data, dict):
+        return
+    choices = chunk_data.get('choices', [])
+    if choices:
+        delta = choices[0].get('delta', {})
+        text_token = delta.get('content', '')
+        if text_token:
+            out.write(sse.encode_delta(text_token))
+
+
+def relay_openai(response, out, provider=None, mode=None):
+    """Leitet einen OpenAI-kompatiblen Upstream-Stream an den Browser weiter.
+
+    out ist ein llmchat.stream.StreamWriter (entscheidet selbst ueber flush).
+    """
+    mode = mode or stream_mode(provider)
+    search = _CONTENT_RE.search
+    for data in sse.iter_data(response):
+        if not data:
+            continue
+        if data == sse.DONE_DATA:
+            out.write(sse.DONE)
+            out.flush()
+            continue
+        if mode == 'reencode' or data[:1] != b'{' or b'"choices"' not in data:
+            _reencode_openai(data, out)
+            continue
+        if mode == 'passthrough':
+            out.write(b'data: ' + data + b'\n\n')
+            continue
+        # filter
+        match = search(data)
+        if match is None:
+            # z.B. "content": null (Rollen-/Abschluss-Event) oder unbekannte Form
+            _reencode_openai(data, out)
+            continue
+        token = match.group(1)
+        if token != _EMPTY_STRING:
+            out.write(sse.DELTA_PREFIX + token + sse.DELTA_SUFFIX)
+
+
+def relay_gemini(response, out):
+    """Gemini-SSE (candidates/content/parts) in das OpenAI-Format umkodieren.
+
+    Leere Daten und [DONE] werden uebersprungen: den Abschluss schreibt der
+    Aufrufer genau einmal am Ende (index.html bricht bei [DONE] ab und
+    verwirft den Rest des gelesenen Blocks).
+    """
+    for data in sse.iter_data(response):
+        if not data or data == sse.DONE_DATA:
+            continue
+        try:
+            gemini_data = json.loads(data)
+        except ValueError:
+            continue
+        candidates = gemini_data.get('candidates', [])
+        if candidates:
+            parts = candidates[0].get('content', {}).get('parts', [])
+            if parts:
+                text_token = parts[0].get('text', '')
+                if text_token:
+                    out.write(sse.encode_delta(text_token))
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Antwort-Cache der Chat-Proxies (opt-in) mit SSE-Wiedergabe.
+
+Identische Anfragen (Neu-Generieren nach einem Verbindungsabbruch, derselbe
+Prompt in einem zweiten Tab, dieselbe Datei-Analyse) muessen nicht erneut
+zum Anbieter. Schluessel ist ein SHA-256 ueber
+
+    Anbieter, Modell, messages, max_tokens   (+ ggf. Audio-Daten)
+
+Gespeichert wird exakt der SSE-Body, den der Proxy an index.html gesendet
+hat; ein Treffer wird mit voller Geschwindigkeit als text/event-stream
+wiedergegeben. Nur vollstaendig abgeschlossene Streams mit Inhalt werden
+gespeichert.
+
+Einstellungen (Umgebungsvariablen):
+
+  LLMCHAT_RESPONSE_CACHE=1              Cache einschalten (Vorgabe: aus)
+  LLMCHAT_RESPONSE_CACHE_TTL=86400      Lebensdauer eines Eintrags (Sekunden)
+  LLMCHAT_RESPONSE_CACHE_MAX_MB=200     Groessengrenze (LRU-Verdraengung)
+
+Eine einzelne Anfrage kann den Cache mit "cache": false im Request-Body
+umgehen (die neue Antwort wird trotzdem gespeichert).
+Zaehler: GET /cgi-bin/cache-stats.py
+"""
+
+import os
+
+from llmchat.config import CACHE_DIR, env_bool, env_int
+from llmchat.diskcache import DiskCache, make_key
+from llmchat.web import start_sse
+
+ENABLED = env_bool('LLMCHAT_RESPONSE_CACHE', False)
+TTL = env_int('LLMCHAT_RESPONSE_CACHE_TTL', 86400)
+MAX_BYTES = env_int('LLMCHAT_RESPONSE_CACHE_MAX_MB', 200) * 1024 * 1024
+MAX_ENTRY_BYTES = 8 * 1024 * 1024
+
+cache = DiskCache(os.path.join(CACHE_DIR, 'responses'), MAX_BYTES, ttl=TTL)
+
+
+def cache_key(provider, model, messages, max_tokens, *extra):
+    if not ENABLED:
+        return None
+    return make_key('response', provider, model, messages, max_tokens, *extra)
+
+
+def lookup(key, request_data=None):
+    """Gespeicherter SSE-Body oder None (aus, umgangen oder kein Treffer)."""
+    if key is None:
+        return None
+    if request_data is not None and request_data.get('cache') is False:
+        cache.count('bypassed')
+        return None
+    return cache.get(key)
+
+
+def replay(resp, body):
+    """Spielt einen gespeicherten Stream als SSE ab."""
+    start_sse(resp)
+    resp.write(body)
+    resp.flush()
+
+
+class Recorder:
+    """Zwischen Relay und StreamWriter: reicht alles durch und zeichnet auf."""
+
+    def __init__(self, out, key, meta=None):
+        self._out = out
+        self._key = key
+        self._meta = meta
+        self._parts = [] if key is not None else None
+        self._size = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._out.write(data)
+        if self._parts is not None:
+            self._size += len(data)
+            if self._size > MAX_ENTRY_BYTES:
+                self._parts = None
+            else:
+                self._parts.append(data)
+
+    def flush(self):
+        self._out.flush()
+
+    def commit(self):
+        """Nach erfolgreichem Stream-Ende aufrufen: Aufzeichnung speichern."""
+        if not self._parts:
+            return False
+        body = b''.join(self._parts)
+        self._parts = None
+        if b'"content"' not in body:
+            return False  # leere Antwort nicht cachen
+        return cache.put(self._key, body, meta=self._meta)
+
+
+def stats():
+    result = cache.stats()
+    result['enabled'] = ENABLED
+    return result
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+Aufbewahrung und Aufraeumen der wachsenden Ablagen (retention.py, Timer).
+
+Sitzungen, Caches und das Log wuchsen bisher unbegrenzt; mit der Zahl der
+Dateien werden os.listdir/scandir langsamer und irgendwann ist die Platte
+voll. Jede Ablage hat eine Alters- und/oder Groessengrenze:
+
+  sessions    Sitzungen ohne Aktivitaet seit LLMCHAT_RETAIN_SESSION_DAYS
+              Tagen, danach die aeltesten bis LLMCHAT_RETAIN_SESSION_MB
+              (beides 0 = unbegrenzt, Vorgabe; geloescht wird ueber
+              llmchat.sessions, also mit Anhang-Referenzen und Suchindex)
+  caches      Eintraege der Antwort-, Kompressor- und Export-Caches
+              (llmchat.diskcache), die laenger als ihre TTL nicht genutzt
+              wurden, danach LRU bis unter die Groessengrenze des Caches
+  kompressor  Alte kompressor_<Zeit>.txt aus der Zeit vor dem Cache, aelter
+              als LLMCHAT_RETAIN_KOMPRESSOR_DAYS (30)
+  logs        multi-llm-chat.log ab LLMCHAT_RETAIN_LOG_MB (20) nach
+              multi-llm-chat.log.1.gz rotieren, LLMCHAT_RETAIN_LOG_KEEP (5)
+              Archive behalten
+  blobs       unreferenzierte Anhaenge (llmchat.blobs, nach den Sitzungen)
+
+Begrenzte Last: hoechstens LLMCHAT_RETAIN_MAX_DELETES (1000) Loeschungen pro
+Lauf ueber alle Ablagen, nach je 50 eine Pause von LLMCHAT_RETAIN_PAUSE Sekunden (0.05); der
+Rest folgt beim naechsten Lauf. Der Timer aus install.sh startet den Lauf
+zusaetzlich mit Nice=19 und IOSchedulingClass=idle. Nur ein Lauf zur Zeit
+(flock auf logs/.retention.lock), das Ergebnis liegt in logs/retention.json.
+
+  python3 -m llmchat.retention report               # Trockenlauf
+  python3 -m llmchat.retention run [--dry-run] [sessions logs ...]
+
+Bericht und Massen-Loeschen ueber HTTP: retention.py.
+"""
+
+import fcntl
+import gzip
+import json
+import os
+import shutil
+import sys
+import time
+
+from llmchat import blobs, exportcache, responsecache, sessions, sessionstore, summarycache
+from llmchat.config import KOMPRESSOR_DIR, LOG_PATH, env_float, env_int
+
+SESSION_DAYS = env_int('LLMCHAT_RETAIN_SESSION_DAYS', 0)
+SESSION_MB = env_int('LLMCHAT_RETAIN_SESSION_MB', 0)
+KOMPRESSOR_DAYS = env_int('LLMCHAT_RETAIN_KOMPRESSOR_DAYS', 30)
+LOG_MB = env_int('LLMCHAT_RETAIN_LOG_MB', 20)
+LOG_KEEP = max(1, env_int('LLMCHAT_RETAIN_LOG_KEEP', 5))
+MAX_DELETES = env_int('LLMCHAT_RETAIN_MAX_DELETES', 1000)
+PAUSE = env_float('LLMCHAT_RETAIN_PAUSE', 0.05)
+BATCH = 50
+
+STORES = ('sessions', 'caches', 'kompressor', 'logs', 'blobs')
+REPORT_ITEMS = 20  # Eintraege pro Ablage im Bericht
+
+LOG_DIR = os.path.dirname(LOG_PATH)
+LOCK_PATH = os.path.join(LOG_DIR, '.retention.lock')
+REPORT_PATH = os.path.join(LOG_DIR, 'retention.json')
+
+
+class Busy(RuntimeError):
+    """Ein anderer Lauf haelt die Sperre."""
+
+
+def settings():
+    return {
+        'sessionDays': SESSION_DAYS, 'sessionMB': SESSION_MB,
+        'kompressorDays': KOMPRESSOR_DAYS, 'logMB': LOG_MB, 'logKeep': LOG_KEEP,
+        'maxDeletes': MAX_DELETES,
+    }
+
+
+# =============================================================================
+# KANDIDATEN (je Ablage eine Liste {id, bytes, reason})
+# =============================================================================
+def plan_sessions(now, days=None, quota_mb=None):
+    days = SESSION_DAYS if days is None else days
+    quota_mb = SESSION_MB if quota_mb is None else quota_mb
+    entries = sorted(sessionstore.get().usage(), key=lambda entry: (entry['updated'], entry['sessionId']))
+    victims = []
+    if days > 0:
+        limit = now - days * 86400
+        victims = [dict(entry, reason='age') for entry in entries if entry['updated'] < limit]
+        entries = entries[len(victims):]
+    if quota_mb > 0:
+        total = sum(entry['bytes'] for entry in entries)
+        for entry in entries:
+            if total <= quota_mb * 1048576:
+                break
+            victims.append(dict(entry, reason='quota'))
+            total -= entry['bytes']
+    return [{'id': entry['sessionId'], 'bytes': entry['bytes'], 'reason': entry['reason'],
+             'updated': entry['updated']} for entry in victims]
+
+
+def plan_caches(now):
+    victims = []
+    for cache in (responsecache.cache, summarycache.cache, exportcache.cache):
+        entries = sorted(cache.entries())  # (mtime, groesse, pfad), aelteste zuerst
+        if cache.ttl:
+            expired = [entry for entry in entries if entry[0] < now - cache.ttl]
+            victims += [{'id': path, 'bytes': size, 'reason': 'age'} for _, size, path in expired]
+            entries = entries[len(expired):]
+        total = sum(size for _, size, _ in entries)
+        if total > cache.max_bytes:
+            # wie DiskCache.evict(): bis 90 % der Grenze
+            for _, size, path in entries:
+                if total <= cache.max_bytes * 0.9:
+                    break
+                victims.append({'id': path, 'bytes': size, 'reason': 'quota'})
+                total -= size
+    return victims
+
+
+def plan_kompressor(now, days=None):
+    days = KOMPRESSOR_DAYS if days is None else days
+    if days <= 0:
+        return []
+    victims = []
+    try:
+        entries = list(os.scandir(KOMPRESSOR_DIR))
+    except OSError:
+        return victims
+    for entry in entries:
+        if entry.name.startswith('kompressor_') and entry.name.endswith('.txt'):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            if st.st_mtime < now - days * 86400:
+                victims.append({'id': entry.path, 'bytes': st.st_size, 'reason': 'age'})
+    return victims
+
+
+def plan_blobs():
+    return [{'id': sha, 'bytes': size, 'reason': 'unreferenced'} for sha, size in blobs.unreferenced()]
+
+
+def _archive(n):
+    return f'{LOG_PATH}.{n}.gz'
+
+
+def plan_logs(now, quota_mb=None, keep=None):
+    quota_mb = LOG_MB if quota_mb is None else quota_mb
+    keep = LOG_KEEP if keep is None else keep
+    try:
+        size = os.path.getsize(LOG_PATH)
+    except OSError:
+        size = 0
+    rotate = quota_mb > 0 and size > quota_mb * 1048576
+    # Erst die Archive, die nach dem Verschieben ueber keep hinaus laegen, dann rotieren
+    victims = []
+    n = keep if rotate else keep + 1
+    while os.path.exists(_archive(n)):
+        victims.append({'id': _archive(n), 'bytes': os.path.getsize(_archive(n)), 'reason': 'keep'})
+        n += 1
+    if rotate:
+        victims.append({'id': LOG_PATH, 'bytes': size, 'reason': 'rotate'})
+    return victims
+
+
+# =============================================================================
+# AUSFUEHREN
+# =============================================================================
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+
+def rotate_log(keep=None):
+    """multi-llm-chat.log -> .1.gz, aeltere Archive eins weiter (bis keep)."""
+    keep = LOG_KEEP if keep is None else keep
+    for n in range(keep - 1, 0, -1):
+        if os.path.exists(_archive(n)):
+            os.replace(_archive(n), _archive(n + 1))
+    # Umbenennen ist atomar; log_request() oeffnet die Datei bei jeder Zeile neu
+    rotating = LOG_PATH + '.rotating'
+    os.replace(LOG_PATH, rotating)
+    with open(rotating, 'rb') as src, gzip.open(_archive(1) + '.tmp', 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(_archive(1) + '.tmp', _archive(1))
+    _remove(rotating)
+    return True
+
+
+def _delete(store, item):
+    if store == 'sessions':
+        return sessions.delete_session(item['id'])
+    if store == 'logs':
+        return rotate_log() if item['reason'] == 'rotate' else _remove(item['id'])
+    if store == 'blobs':
+        return blobs.remove(item['id'])
+    return _remove(item['id'])
+
+
+def _execute(store, items, budget, dry_run):
+    """Loescht bis zu budget Eintraege mit Pausen; liefert (geloescht, Bytes)."""
+    deleted = freed = 0
+    for item in items[:budget]:
+        if dry_run or _delete(store, item):
+            deleted += 1
+            freed += item['bytes']
+            if not dry_run and deleted % BATCH == 0:
+                time.sleep(PAUSE)
+    return deleted, freed
+
+
+def _plan(store, now):
+    if store == 'sessions':
+        return plan_sessions(now)
+    if store == 'caches':
+        return plan_caches(now)
+    if store == 'kompressor':
+        return plan_kompressor(now)
+    if store == 'blobs':
+        return plan_blobs()
+    return plan_logs(now)
+
+
+def run(dry_run=False, stores=STORES, max_deletes=None, now=None):
+    """Ein Lauf ueber die gewaehlten Ablagen; liefert den Bericht (Dict)."""
+    now = time.time() if now is None else now
+    max_deletes = MAX_DELETES if max_deletes is None else max_deletes
+    os.makedirs(LOG_DIR, exist_ok=True)
+    with open(LOCK_PATH, 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            raise Busy('Aufraeumen laeuft bereits') from None
+        started = time.monotonic()
+        budget = max_deletes
+        report = {'dryRun': dry_run, 'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(now)),
+                  'settings': settings(), 'stores': {}}
+        for store in stores:
+            items = _plan(store, now)
+            deleted, freed = _execute(store, items, budget, dry_run)
+            budget -= deleted
+            report['stores'][store] = {
+                'candidates': len(items),
+                'bytes': sum(item['bytes'] for item in items),
+                'deleted': deleted,
+                'freed': freed,
+                'deferred': len(items) - deleted,
+                'items': items[:REPORT_ITEMS],
+            }
+        report['seconds'] = round(time.monotonic() - started, 2)
+        if not dry_run:
+            tmp = REPORT_PATH + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False)
+            os.replace(tmp, REPORT_PATH)
+    return report
+
+
+def last_report():
+    try:
+        with open(REPORT_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# =============================================================================
+# MASSEN-LOESCHEN (retention.py POST)
+# =============================================================================
+def delete_sessions(session_ids):
+    """Loescht die angegebenen Sitzungen; liefert (geloescht, nicht gefunden)."""
+    deleted, missing = [], []
+    for i, session_id in enumerate(session_ids, 1):
+        (deleted if sessions.delete_session(session_id) else missing).append(session_id)
+        if i % BATCH == 0:
+            time.sleep(PAUSE)
+    return deleted, missing
+
+
+def delete_inactive_sessions(days, dry_run=False):
+    """Sitzungen ohne Aktivitaet seit days Tagen; liefert (Kandidaten, geloescht)."""
+    items = plan_sessions(time.time(), days, 0)
+    deleted, _ = _execute('sessions', items, MAX_DELETES, dry_run)
+    return items, deleted
+
+
+USAGE = 'Verwendung: python3 -m llmchat.retention report | run [--dry-run] [' + ' '.join(STORES) + ']'
+
+
+def _print(report, out=sys.stdout):
+    label = 'Trockenlauf' if report['dryRun'] else 'Lauf'
+    print(f"{label} {report['started']} ({report['seconds']} s)", file=out)
+    print(f'{"Ablage":<12}{"Kandidaten":>12}{"MB":>10}{"geloescht":>11}{"frei MB":>10}{"spaeter":>9}', file=out)
+    for store, result in report['stores'].items():
+        print(f"{store:<12}{result['candidates']:>12}{result['bytes'] / 1048576:>10.1f}"
+              f"{result['deleted']:>11}{result['freed'] / 1048576:>10.1f}{result['deferred']:>9}", file=out)
+
+
+def main(argv):
+    args = argv[1:]
+    if args == ['report']:
+        args = ['run', '--dry-run']
+    if not args or args[0] != 'run':
+        print(USAGE, file=sys.stderr)
+        return 2
+    dry_run = '--dry-run' in args
+    stores = [arg for arg in args[1:] if arg != '--dry-run'] or list(STORES)
+    if any(store not in STORES for store in stores):
+        print(USAGE, file=sys.stderr)
+        return 2
+    try:
+        _print(run(dry_run=dry_run, stores=stores))
+    except Busy as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
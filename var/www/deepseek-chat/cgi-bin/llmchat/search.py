@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+Volltextsuche ueber alle gespeicherten Sitzungen (search-sessions.py).
+
+Bisher liess sich ein altes Gespraech nur ueber die Vorschau-Liste finden;
+ein grep ueber die Sitzungsdateien waechst linear mit dem Gesamtbestand.
+Jetzt fuehrt llmchat/sessions.py einen invertierten Index mit (SQLite FTS5,
+SESSIONS_DIR/search.db, unabhaengig von der Speicher-Engine):
+
+  docs      rowid, session_id, seq, role       eine Zeile pro Nachricht
+  fts       content (FTS5, rowid = docs.rowid) unicode61, Umlaute/Akzente
+                                               gefaltet, Praefix-Index 2/3
+  sessions  session_id, timestamp, preview     fuer die Trefferliste
+
+Aktualisiert wird inkrementell: volles Speichern indiziert die Sitzung neu,
+angehaengte Nachrichten (Journal-append, Sitzungs-Modus) kommen dazu,
+truncate/replace indizieren die Sitzung neu, Loeschen entfernt sie.
+Referenzen auf Anhaenge (llmchat/blobs.py) werden nicht mitindiziert.
+
+Suchsyntax (query()):
+
+  wort wort         alle Woerter muessen vorkommen (UND)
+  praef*            Praefix
+  "genaue phrase"   Phrase
+  -wort             ausschliessen
+
+Ergebnisse nach BM25 gerankt und pro Sitzung zusammengefasst, mit bis zu
+drei Fundstellen (Snippets). Index neu aufbauen (im Verzeichnis cgi-bin):
+
+  python3 -m llmchat.search rebuild
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from llmchat import blobs, sessions, sessionstore
+from llmchat.config import SEARCH_DB
+
+MAX_RESULTS = 100
+SNIPPETS_PER_SESSION = 3
+SNIPPET_TOKENS = 16
+_HIT_START, _HIT_END = '\ue000', '\ue001'  # Markierungen im Snippet (Private Use Area)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    rowid      INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    seq        INTEGER NOT NULL,
+    role       TEXT
+);
+CREATE INDEX IF NOT EXISTS docs_session ON docs (session_id, seq);
+CREATE VIRTUAL TABLE IF NOT EXISTS fts USING fts5 (
+    content,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    timestamp  TEXT NOT NULL DEFAULT '',
+    preview    TEXT NOT NULL DEFAULT ''
+);
+"""
+
+_TERM_RE = re.compile(r'(-?)"([^"]*)"|(\S+)')
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+_local = threading.local()
+
+
+class QueryError(ValueError):
+    """Leere oder ungueltige Suchanfrage (search-sessions.py: 400)."""
+
+
+def _connect():
+    con = getattr(_local, 'con', None)
+    if con is None:
+        os.makedirs(os.path.dirname(SEARCH_DB), mode=0o700, exist_ok=True)
+        con = sqlite3.connect(SEARCH_DB, timeout=10, isolation_level=None)
+        con.execute('PRAGMA journal_mode=WAL')
+        con.execute('PRAGMA synchronous=NORMAL')
+        con.executescript(_SCHEMA)
+        _local.con = con
+    return con
+
+
+@contextmanager
+def _transaction():
+    con = _connect()
+    con.execute('BEGIN IMMEDIATE')
+    try:
+        yield con
+    except BaseException:
+        con.execute('ROLLBACK')
+        raise
+    con.execute('COMMIT')
+
+
+def _text(msg):
+    """Suchbarer Text einer Nachricht (ohne Anhang-Referenzen, Umlaute echt)."""
+    content = msg.get('content') if isinstance(msg, dict) else None
+    if not isinstance(content, str):
+        return ''
+    if blobs.REF_PREFIX in content:
+        content = blobs.REF_RE.sub(' ', content)
+    return sessions.decode_umlauts_from_ai(content)
+
+
+# =============================================================================
+# INDEX PFLEGEN
+# =============================================================================
+def _remove(con, session_id):
+    rowids = [row[0] for row in con.execute('SELECT rowid FROM docs WHERE session_id = ?', (session_id,))]
+    for start in range(0, len(rowids), 500):
+        chunk = rowids[start:start + 500]
+        marks = ','.join('?' * len(chunk))
+        con.execute(f'DELETE FROM fts WHERE rowid IN ({marks})', chunk)
+        con.execute(f'DELETE FROM docs WHERE rowid IN ({marks})', chunk)
+
+
+def _insert(con, session_id, first_seq, messages):
+    for seq, msg in enumerate(messages, first_seq):
+        text = _text(msg)
+        if not text.strip():
+            continue
+        rowid = con.execute('INSERT INTO docs (session_id, seq, role) VALUES (?, ?, ?)',
+                            (session_id, seq, msg.get('role'))).lastrowid
+        con.execute('INSERT INTO fts (rowid, content) VALUES (?, ?)', (rowid, text))
+
+
+def _session_row(con, session_id, chat_data):
+    con.execute('INSERT INTO sessions (session_id, timestamp, preview) VALUES (?, ?, ?) '
+                'ON CONFLICT (session_id) DO UPDATE SET timestamp = excluded.timestamp, '
+                'preview = excluded.preview',
+                (session_id, chat_data.get('timestamp', ''),
+                 sessionstore.preview_text(chat_data.get('messages') or [])))
+
+
+def index_session(session_id, chat_data):
+    """Sitzung (neu) indizieren."""
+    with _transaction() as con:
+        _remove(con, session_id)
+        _insert(con, session_id, 0, chat_data.get('messages') or [])
+        _session_row(con, session_id, chat_data)
+
+
+def add_messages(session_id, messages, timestamp):
+    """Angehaengte Nachrichten nachtragen (Journal-append, Sitzungs-Modus)."""
+    with _transaction() as con:
+        row = con.execute('SELECT MAX(seq) FROM docs WHERE session_id = ?', (session_id,)).fetchone()
+        _insert(con, session_id, (row[0] + 1) if row[0] is not None else 0, messages)
+        # Vorschau nur bei neuer Sitzung (erste Nachricht), sonst bleibt sie
+        con.execute('INSERT INTO sessions (session_id, timestamp, preview) VALUES (?, ?, ?) '
+                    'ON CONFLICT (session_id) DO UPDATE SET timestamp = excluded.timestamp',
+                    (session_id, timestamp, sessionstore.preview_text(messages)))
+
+
+def remove_session(session_id):
+    with _transaction() as con:
+        _remove(con, session_id)
+        con.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+
+def rebuild(out=sys.stdout):
+    """Index aus allen Sitzungen der konfigurierten Engine neu aufbauen."""
+    store = sessionstore.get()
+    started = time.monotonic()
+    count = 0
+    with _transaction() as con:
+        con.execute('DELETE FROM docs')
+        con.execute('DELETE FROM fts')
+        con.execute('DELETE FROM sessions')
+        for session_id in store.ids():
+            chat_data = store.load(session_id)
+            if not isinstance(chat_data, dict):
+                continue
+            _insert(con, session_id, 0, chat_data.get('messages') or [])
+            _session_row(con, session_id, chat_data)
+            count += 1
+    _connect().execute("INSERT INTO fts (fts) VALUES ('optimize')")
+    print(f'{count} Sitzungen indiziert, {time.monotonic() - started:.1f} s', file=out)
+    return count
+
+
+# =============================================================================
+# SUCHEN
+# =============================================================================
+def _quote(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def parse_query(query):
+    """Suchanfrage -> FTS5-Ausdruck (nur Woerter, Praefixe, Phrasen, NOT)."""
+    include, exclude = [], []
+    for negate, phrase, word in _TERM_RE.findall(query or ''):
+        if phrase:
+            words = _WORD_RE.findall(phrase)
+            term = _quote(' '.join(words)) if words else None
+        else:
+            negate = '-' if word.startswith('-') and len(word) > 1 else ''
+            prefix = word.endswith('*')
+            words = _WORD_RE.findall(word)
+            if not words:
+                continue
+            # "e-mail" wie eine Phrase behandeln, Praefix nur am letzten Wort
+            term = _quote(' '.join(words)) + ('*' if prefix else '')
+        if term:
+            (exclude if negate else include).append(term)
+    if not include:
+        raise QueryError('Suchbegriff erforderlich')
+    expression = ' AND '.join(include)
+    if exclude:
+        expression += ' NOT ' + ' NOT '.join(exclude)
+    return expression
+
+
+def _segments(snippet):
+    """Snippet mit Markierungen -> [[Text, Treffer?], ...] (index.html setzt <mark>)."""
+    segments = []
+    for part in re.split(f'({_HIT_START}.*?{_HIT_END})', snippet, flags=re.S):
+        if not part:
+            continue
+        if part.startswith(_HIT_START):
+            segments.append([part[1:-1], True])
+        else:
+            segments.append([part, False])
+    return segments
+
+
+def query(text, limit=20):
+    """Gerankte Sitzungen zur Suchanfrage (Liste von Dicts)."""
+    expression = parse_query(text)
+    limit = max(1, min(limit, MAX_RESULTS))
+    con = _connect()
+    try:
+        # Erst nur ranken (FTS5-Spalte rank = bm25, ohne Join), Snippets danach
+        # nur fuer die behaltenen Zeilen: snippet() ist der teure Teil
+        rows = con.execute('SELECT rowid, rank FROM fts WHERE fts MATCH ? ORDER BY rank LIMIT ?',
+                           (expression, limit * 10)).fetchall()
+    except sqlite3.OperationalError as e:
+        raise QueryError(f'Ungueltige Suchanfrage: {e}') from None
+    docs = {}
+    for start in range(0, len(rows), 500):
+        chunk = [rowid for rowid, _ in rows[start:start + 500]]
+        marks = ','.join('?' * len(chunk))
+        for rowid, session_id, seq, role in con.execute(
+                f'SELECT rowid, session_id, seq, role FROM docs WHERE rowid IN ({marks})', chunk):
+            docs[rowid] = (session_id, seq, role)
+    results, wanted = {}, {}
+    for rowid, rank in rows:
+        if rowid not in docs:
+            continue
+        session_id, seq, role = docs[rowid]
+        result = results.get(session_id)
+        if result is None:
+            if len(results) >= limit:
+                continue
+            result = results[session_id] = {'sessionId': session_id, 'score': round(-rank, 3),
+                                            'matches': 0, 'snippets': []}
+        result['matches'] += 1
+        if len(result['snippets']) < SNIPPETS_PER_SESSION:
+            snippet = {'seq': seq, 'role': role, 'segments': []}
+            result['snippets'].append(snippet)
+            wanted[rowid] = snippet
+    if wanted:
+        marks = ','.join('?' * len(wanted))
+        for rowid, snippet in con.execute(
+                f"SELECT rowid, snippet(fts, 0, '{_HIT_START}', '{_HIT_END}', '…', {SNIPPET_TOKENS}) "
+                f'FROM fts WHERE fts MATCH ? AND rowid IN ({marks})', [expression, *wanted]):
+            wanted[rowid]['segments'] = _segments(snippet)
+    if results:
+        marks = ','.join('?' * len(results))
+        for session_id, timestamp, preview in con.execute(
+                f'SELECT session_id, timestamp, preview FROM sessions WHERE session_id IN ({marks})',
+                list(results)):
+            results[session_id]['timestamp'] = timestamp
+            results[session_id]['preview'] = preview
+    return list(results.values())
+
+
+def stats():
+    con = _connect()
+    return {
+        'sessions': con.execute('SELECT COUNT(*) FROM sessions').fetchone()[0],
+        'messages': con.execute('SELECT COUNT(*) FROM docs').fetchone()[0],
+    }
+
+
+USAGE = 'Verwendung: python3 -m llmchat.search rebuild | query <Suchbegriffe>'
+
+
+def main(argv):
+    args = argv[1:]
+    if args == ['rebuild']:
+        rebuild()
+        return 0
+    if len(args) >= 2 and args[0] == 'query':
+        try:
+            for result in query(' '.join(args[1:])):
+                snippet = ''.join(text for text, _ in result['snippets'][0]['segments'])
+                print(f"{result['score']:8.2f}  {result['sessionId']}  {snippet}")
+        except QueryError as e:
+            print(e, file=sys.stderr)
+            return 2
+        return 0
+    print(USAGE, file=sys.stderr)
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
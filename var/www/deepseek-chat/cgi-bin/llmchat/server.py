@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Langlebiger WSGI-Applikationsserver fuer alle cgi-bin-Endpunkte.
+
+Statt fuer jede Anfrage einen neuen Python-Prozess zu starten (mod_cgi),
+laedt dieser Server jedes Script aus /cgi-bin/ genau einmal und ruft
+dessen handle(req, resp) direkt auf. Die URLs bleiben identisch:
+
+  POST /cgi-bin/deepseek-api.py   -> deepseek-api.py: handle()
+  GET  /cgi-bin/load-session.py   -> load-session.py: handle()
+  ...
+
+Betriebsarten:
+
+  1. mod_wsgi (Daemon-Modus) ueber llmchat/wsgi.py, siehe
+     etc/apache2/conf-available/llmchat-wsgi.conf
+  2. Eigenstaendig (z.B. hinter ProxyPass):
+       python3 -m llmchat.server --host 127.0.0.1 --port 8081 --preload
+
+Die CGI-Scripts bleiben unveraendert lauffaehig; wird die WSGI-
+Konfiguration deaktiviert, bedient Apache dieselben URLs wieder per CGI.
+"""
+
+import argparse
+import importlib.util
+import os
+import re
+import socketserver
+import sys
+import threading
+import traceback
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from llmchat.config import CGI_DIR
+from llmchat.web import Request, WSGIResponse, send_json
+
+URL_PREFIX = '/cgi-bin/'
+SCRIPT_NAME_RE = re.compile(r'^[a-z0-9][a-z0-9-]*\.py$')
+
+_handlers = {}
+_handlers_lock = threading.Lock()
+
+
+def _module_name(script):
+    return 'cgi_' + script[:-3].replace('-', '_')
+
+
+def load_handler(script):
+    """Importiert ein CGI-Script einmalig und liefert dessen handle()."""
+    handler = _handlers.get(script)
+    if handler is not None:
+        return handler
+    with _handlers_lock:
+        handler = _handlers.get(script)
+        if handler is not None:
+            return handler
+        path = os.path.join(CGI_DIR, script)
+        if not SCRIPT_NAME_RE.match(script) or not os.path.isfile(path):
+            return None
+        spec = importlib.util.spec_from_file_location(_module_name(script), path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        handler = getattr(module, 'handle', None)
+        if handler is None:
+            return None
+        _handlers[script] = handler
+        return handler
+
+
+def preload():
+    """Importiert alle Scripts vorab (Start-Kosten nur einmal pro Prozess)."""
+    loaded, failed = [], []
+    for script in sorted(os.listdir(CGI_DIR)):
+        if not SCRIPT_NAME_RE.match(script):
+            continue
+        try:
+            if load_handler(script):
+                loaded.append(script)
+        except Exception as e:
+            # z.B. reportlab fehlt: Script bleibt bis zum ersten Aufruf ungeladen
+            failed.append((script, str(e)))
+    return loaded, failed
+
+
+def request_from_wsgi(environ):
+    """Baut ein Request-Objekt aus der WSGI-Umgebung."""
+    try:
+        content_length = int(environ.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        content_length = 0
+    body = environ['wsgi.input'].read(content_length) if content_length > 0 else b''
+    headers = {}
+    for key, value in environ.items():
+        if key.startswith('HTTP_'):
+            headers[key[5:].replace('_', '-').lower()] = value
+    if environ.get('CONTENT_TYPE'):
+        headers['content-type'] = environ['CONTENT_TYPE']
+    path = environ.get('SCRIPT_NAME', '') + environ.get('PATH_INFO', '')
+    query_string = environ.get('QUERY_STRING', '')
+    uri = environ.get('REQUEST_URI') or (path + ('?' + query_string if query_string else ''))
+    return Request(
+        method=environ.get('REQUEST_METHOD', ''),
+        path=path,
+        query_string=query_string,
+        headers=headers,
+        body=body,
+        remote_addr=environ.get('REMOTE_ADDR', 'unknown'),
+        uri=uri,
+    )
+
+
+def application(environ, start_response):
+    """WSGI-Einstiegspunkt."""
+    req = request_from_wsgi(environ)
+    resp = WSGIResponse(start_response)
+    script = req.path.rsplit('/', 1)[-1]
+    if not req.path.startswith(URL_PREFIX) or not SCRIPT_NAME_RE.match(script):
+        send_json(resp, 404, {'error': f'Unbekannter Endpunkt: {req.path}'})
+        return []
+    try:
+        handler = load_handler(script)
+    except Exception as e:
+        send_json(resp, 500, {'error': f'Script {script} konnte nicht geladen werden', 'details': str(e)})
+        return []
+    if handler is None:
+        send_json(resp, 404, {'error': f'Unbekannter Endpunkt: {req.path}'})
+        return []
+    try:
+        handler(req, resp)
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    except Exception as e:
+        if not resp.started:
+            send_json(resp, 500, {'error': 'Interner Serverfehler', 'details': str(e)})
+        else:
+            traceback.print_exc(file=sys.stderr)
+    return []
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    """Ein Thread pro Verbindung (lange SSE-Streams blockieren sich nicht)."""
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-LLM Chat Applikationsserver')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--preload', action='store_true',
+                        help='alle Scripts beim Start importieren')
+    args = parser.parse_args()
+    if args.preload:
+        loaded, failed = preload()
+        print(f'Geladen: {", ".join(loaded)}')
+        for script, error in failed:
+            print(f'Nicht geladen: {script} ({error})')
+    httpd = make_server(args.host, args.port, application,
+                        server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    print(f'Applikationsserver laeuft auf http://{args.host}:{args.port}{URL_PREFIX}')
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Speicherformat der Sitzungs-Snapshots (files-Engine, llmchat/sessionstore.py).
+
+Sitzungsdateien waren eingerueckte UTF-8-JSON-Dateien inklusive Base64-Bildern
+und kompletter Dateiinhalte - das Sitzungsverzeichnis ist der groesste
+Plattenverbraucher, und grosse Sitzungen zu laden ist I/O-gebunden.
+
+Formate (LLMCHAT_SESSION_FORMAT, gilt fuer neu geschriebene Snapshots):
+
+  json      <id>.json   eingerueckt wie bisher (Vorgabe)
+  compact   <id>.json   ohne Einrueckung und Leerraum
+  zlib      <id>.jsonz  compact + zlib (Stufe 6), mit Woerterbuch falls trainiert
+  lzma      <id>.jsonz  compact + LZMA (xz)
+
+Komprimierte Dateien beginnen mit einem Kopf
+
+  b'LLMSESS1'  Kennung
+  1 Byte       Verfahren (b'z' zlib, b'x' lzma)
+  8 Byte       Woerterbuch-ID (hex) oder b'--------'
+
+Lesen erkennt das Format am Inhalt, nicht an der Endung: alte und neue
+Dateien liegen gemischt im Verzeichnis, load-session.py und alles, was
+darueber liest, merkt davon nichts.
+
+Gemeinsames Woerterbuch: viele kleine Sitzungen wiederholen dieselben
+Schluessel, Einstellungen und Satzbausteine, die zlib pro Datei nicht
+ausnutzen kann. train() sammelt die Fragmente, die in moeglichst vielen
+Sitzungen vorkommen (Dokumenthaeufigkeit x Laenge, einmalige Base64-Daten
+fallen dadurch heraus), zu einem bis zu 32 KB grossen zlib-Vorbelegungs-
+Woerterbuch (zdict). Es liegt als SESSIONS_DIR/.zdict-<id> neben den
+Sitzungen, SESSIONS_DIR/.zdict nennt das aktuelle; alte Woerterbuecher
+bleiben liegen, weil aeltere Dateien sie per ID referenzieren. LZMA bietet
+in Python kein Vorbelegungs-Woerterbuch.
+
+Umstellen und Woerterbuch trainieren (im Verzeichnis cgi-bin):
+
+  python3 -m llmchat.sessionstore convert zlib --train-dict
+"""
+
+import hashlib
+import json
+import lzma
+import os
+import re
+import struct
+import zlib
+from collections import Counter
+
+FORMATS = ('json', 'compact', 'zlib', 'lzma')
+FORMAT = os.environ.get('LLMCHAT_SESSION_FORMAT', 'json').strip().lower()
+if FORMAT not in FORMATS:
+    FORMAT = 'json'
+
+PLAIN_EXT = '.json'
+PACKED_EXT = '.jsonz'
+EXTENSIONS = (PLAIN_EXT, PACKED_EXT)
+
+MAGIC = b'LLMSESS1'
+_HEADER = struct.Struct('=8s1s8s')
+_NO_DICT = b'--------'
+_CODECS = {'zlib': b'z', 'lzma': b'x'}
+
+DICT_FILE = '.zdict'
+DICT_SIZE = 32 * 1024  # Fenstergroesse von zlib
+ZLIB_LEVEL = 6
+
+# JSON-Strings (Schluessel mit Doppelpunkt) und Woerter im Inhalt
+_FRAGMENT_RE = re.compile(rb'"(?:[^"\\]|\\.){1,64}"(?::)?|[A-Za-z\x80-\xff][\w\x80-\xff]{3,24}[ ,.:]?')
+
+_dictionaries = {}
+
+
+class FormatError(ValueError):
+    """Unbekanntes Verfahren oder fehlendes Woerterbuch."""
+
+
+def extension(fmt):
+    return PACKED_EXT if fmt in _CODECS else PLAIN_EXT
+
+
+def session_id(name):
+    """Session-ID aus einem Dateinamen des Sitzungsverzeichnisses oder None."""
+    if name.startswith('.'):
+        return None
+    for ext in EXTENSIONS:
+        if name.endswith(ext):
+            return name[:-len(ext)]
+    return None
+
+
+def _compact(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+# =============================================================================
+# WOERTERBUCH
+# =============================================================================
+def _dictionary_path(directory, dict_id):
+    return os.path.join(directory, f'{DICT_FILE}-{dict_id}')
+
+
+def load_dictionary(directory, dict_id):
+    key = (directory, dict_id)
+    zdict = _dictionaries.get(key)
+    if zdict is None:
+        try:
+            with open(_dictionary_path(directory, dict_id), 'rb') as f:
+                zdict = f.read()
+        except OSError:
+            raise FormatError(f'Woerterbuch {dict_id} fehlt') from None
+        _dictionaries[key] = zdict
+    return zdict
+
+
+def current_dictionary(directory):
+    """(ID, Bytes) des aktuellen Woerterbuchs oder (None, None)."""
+    try:
+        with open(os.path.join(directory, DICT_FILE), 'r', encoding='ascii') as f:
+            dict_id = f.read().strip()
+        return dict_id, load_dictionary(directory, dict_id)
+    except (OSError, FormatError):
+        return None, None
+
+
+def train(samples, size=DICT_SIZE):
+    """Woerterbuch aus chatData-Dicts: haeufigste Fragmente zuletzt (kurze Distanzen)."""
+    frequency = Counter()
+    for chat_data in samples:
+        frequency.update(set(_FRAGMENT_RE.findall(_compact(chat_data))))
+    ranked = sorted(((df * len(fragment), fragment) for fragment, df in frequency.items() if df > 1),
+                    reverse=True)
+    chosen, total = [], 0
+    for _, fragment in ranked:
+        if total + len(fragment) > size:
+            continue
+        chosen.append(fragment)
+        total += len(fragment)
+    return b''.join(reversed(chosen))
+
+
+def save_dictionary(directory, zdict):
+    """Legt das Woerterbuch ab, macht es zum aktuellen und liefert seine ID."""
+    dict_id = hashlib.sha256(zdict).hexdigest()[:8]
+    path = _dictionary_path(directory, dict_id)
+    if not os.path.exists(path):
+        with open(path + '.tmp', 'wb') as f:
+            f.write(zdict)
+        os.chmod(path + '.tmp', 0o600)
+        os.replace(path + '.tmp', path)
+    with open(os.path.join(directory, DICT_FILE + '.tmp'), 'w', encoding='ascii') as f:
+        f.write(dict_id + '\n')
+    os.replace(os.path.join(directory, DICT_FILE + '.tmp'), os.path.join(directory, DICT_FILE))
+    _dictionaries[(directory, dict_id)] = zdict
+    return dict_id
+
+
+# =============================================================================
+# KODIEREN / DEKODIEREN
+# =============================================================================
+def encode(data, fmt, directory):
+    """Snapshot-Bytes im Format fmt."""
+    if fmt == 'json':
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    raw = _compact(data)
+    if fmt == 'compact':
+        return raw
+    if fmt == 'lzma':
+        return _HEADER.pack(MAGIC, b'x', _NO_DICT) + lzma.compress(raw, preset=6)
+    if fmt != 'zlib':
+        raise FormatError(f'Unbekanntes Format: {fmt}')
+    dict_id, zdict = current_dictionary(directory)
+    if zdict:
+        compressor = zlib.compressobj(ZLIB_LEVEL, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(ZLIB_LEVEL)
+    return (_HEADER.pack(MAGIC, b'z', dict_id.encode('ascii') if zdict else _NO_DICT)
+            + compressor.compress(raw) + compressor.flush())
+
+
+def decode(raw, directory):
+    """Snapshot-Bytes beliebigen Formats -> JSON-Wert (ValueError bei Fehlern)."""
+    if not raw.startswith(MAGIC):
+        return json.loads(raw)
+    if len(raw) < _HEADER.size:
+        raise FormatError('Kopf unvollstaendig')
+    _, codec, dict_id = _HEADER.unpack_from(raw)
+    payload = raw[_HEADER.size:]
+    try:
+        if codec == b'x':
+            raw = lzma.decompress(payload)
+        elif codec == b'z' and dict_id == _NO_DICT:
+            raw = zlib.decompress(payload)
+        elif codec == b'z':
+            decompressor = zlib.decompressobj(zdict=load_dictionary(directory, dict_id.decode('ascii')))
+            raw = decompressor.decompress(payload) + decompressor.flush()
+        else:
+            raise FormatError(f'Unbekanntes Verfahren: {codec!r}')
+    except (zlib.error, lzma.LZMAError) as e:
+        raise FormatError(f'Defekte Sitzungsdatei: {e}') from None
+    return json.loads(raw)
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+Gespeicherte Chat-Sitzungen und serverseitiger Gespraechsstand.
+
+Bisher baut index.html bei jedem Senden das komplette messages-Array aus
+contextHistory auf (System-Prompt, komprimierte Zusammenfassung, Datei-
+Inhalte, alle bisherigen Nachrichten) und laedt es hoch. Im Sitzungs-Modus
+schickt der Browser nur noch die neue Nachricht:
+
+    {
+      "model": ..., "max_tokens": ...,
+      "sessionId": "2026-10-18_140322_ab12cd",
+      "base":    {"count": 12, "lastId": "msg_12"},   Stand, auf dem der Browser aufbaut
+      "system":  "...",                               System-Prompt (ohne Zusammenfassung)
+      "message": {"id": "msg_13", "role": "user", "content": ..., "mode": ..., "hasFile": ...},
+      "replyId": "msg_14"
+    }
+
+Der Proxy baut daraus ueber prepare_turn() dieselbe Nachrichtenliste, die
+index.html gesendet haette (Zusammenfassung im System-Prompt, Umlaut-
+Ersetzung ausser bei Datei-Nachrichten), und haengt nach erfolgreichem
+Stream-Ende Frage und Antwort an die Sitzung an (Capture/Turn.commit;
+Speicher-Engine: llmchat/sessionstore.py).
+Passt der gespeicherte Stand nicht zu base (z.B. nach Komprimierung oder
+Loeschen im Browser), antwortet der Proxy mit 409 / session_out_of_sync;
+index.html sendet dann einmalig den vollen Verlauf und speichert die
+Sitzung wie bisher ueber save-session.py.
+
+Ohne sessionId (oder mit messages) bleibt alles wie bisher.
+
+Verweist eine Sitzung auf Anhaenge (llmchat/blobs.py), werden deren
+Referenzen beim Speichern, Aendern und Loeschen mitgezaehlt; ebenso wird
+der Suchindex (llmchat/search.py) fortgeschrieben. Beides geschieht unter
+der Sperre der Sitzung (session_lock) zusammen mit dem Schreiben: zwei
+Schreibende (zwei Tabs, Proxy-Turn und volles Speichern) koennten sonst
+refs.db auf dem Stand des aelteren Schreibers hinterlassen, und gc()
+loeschte einen Anhang, den die gespeicherte Sitzung noch verwendet.
+"""
+
+import datetime
+import json
+import math
+import re
+import sqlite3
+import time
+
+from llmchat import blobs, search, sessionstore, sse
+
+# Wie TOKENS_PER_CHAR in index.html (Schaetzung fuer estimatedTokens)
+TOKENS_PER_CHAR = 0.25
+
+_UMLAUTS = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss',
+                          'Ä': 'Ae', 'Ö': 'Oe', 'Ü': 'Ue'})
+_PLACEHOLDERS = (('[[AE]]', 'ä'), ('[[OE]]', 'ö'), ('[[UE]]', 'ü'), ('[[SS]]', 'ß'),
+                 ('[[CAE]]', 'Ä'), ('[[COE]]', 'Ö'), ('[[CUE]]', 'Ü'))
+_FENCE_START_RE = re.compile(r'\A```[a-z]*\n?', re.IGNORECASE | re.ASCII)
+_FENCE_END_RE = re.compile(r'\n?```\Z')
+
+
+class SessionError(Exception):
+    """Sitzungs-Modus nicht moeglich; wird vom Proxy als JSON-Fehler gesendet."""
+
+    def __init__(self, status_code, message, error_type=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.error_type = error_type
+
+    def data(self):
+        data = {'error': str(self)}
+        if self.error_type:
+            data['error_type'] = self.error_type
+        return data
+
+
+# =============================================================================
+# SITZUNGSDATEIEN
+# =============================================================================
+def validate_session_id(session_id):
+    """Validiert die Session-ID Format: YYYY-MM-DD_HHMMSS_random."""
+    if not isinstance(session_id, str) or len(session_id) < 20:
+        return False
+    parts = session_id.split('_')
+    if len(parts) != 3 or not parts[2].isalnum():
+        return False
+    try:
+        datetime.datetime.strptime(parts[0], '%Y-%m-%d')
+        datetime.datetime.strptime(parts[1], '%H%M%S')
+        return True
+    except ValueError:
+        return False
+
+
+def load_session(session_id):
+    """Chat-Daten einer Sitzung oder None."""
+    return sessionstore.get().load(session_id)
+
+
+def session_state(session_id):
+    """(Chat-Daten, Journal-Stand) einer Sitzung oder (None, None)."""
+    return sessionstore.get().state(session_id)
+
+
+def session_page(session_id, limit=None, before=None):
+    """Seite einer Sitzung (sessionstore: page()) oder None."""
+    return sessionstore.get().page(session_id, limit, before)
+
+
+def session_version(session_id):
+    """(Versionsmerkmal, mtime) einer Sitzung ohne sie zu lesen (ETag) oder None."""
+    return sessionstore.get().version(session_id)
+
+
+def _reindex(session_id, chat_data):
+    """Anhang-Referenzen und Suchindex nach dem vollstaendigen Stand."""
+    blobs.set_refs(session_id, blobs.refs_in(chat_data.get('messages')))
+    try:
+        search.index_session(session_id, chat_data)
+    except sqlite3.Error:
+        pass  # Suchindex ist nur ein Beschleuniger; python3 -m llmchat.search rebuild
+
+
+def _index_appended(session_id, messages, timestamp):
+    blobs.add_refs(session_id, blobs.refs_in(messages))
+    try:
+        search.add_messages(session_id, messages, timestamp)
+    except sqlite3.Error:
+        pass
+
+
+def save_session(session_id, chat_data):
+    """Speichert eine Sitzung (Engine: llmchat/sessionstore.py); liefert den Journal-Stand."""
+    store = sessionstore.get()
+    with store.lock(session_id):
+        offset = store.save(session_id, chat_data)
+        _reindex(session_id, chat_data)
+    return offset
+
+
+def apply_session_ops(session_id, offset, ops):
+    """Delta (llmchat/journal.py) auf Journal-Stand offset anwenden; liefert den neuen Stand."""
+    timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+    store = sessionstore.get()
+    with store.lock(session_id):
+        offset = store.apply(session_id, offset, ops, timestamp)
+        if any(op['op'] in ('truncate', 'replace') for op in ops):
+            # Nachrichten koennen weggefallen sein: aus dem neuen Stand neu aufbauen
+            _reindex(session_id, store.load(session_id) or {})
+        else:
+            _index_appended(session_id, [msg for op in ops if op['op'] == 'append' for msg in op['messages']],
+                            timestamp)
+    return offset
+
+
+def delete_session(session_id):
+    """Loescht eine Sitzung; False wenn sie nicht existiert."""
+    store = sessionstore.get()
+    with store.lock(session_id):
+        deleted = store.delete(session_id)
+        blobs.set_refs(session_id, ())
+        try:
+            search.remove_session(session_id)
+        except sqlite3.Error:
+            pass
+    return deleted
+
+
+def list_sessions(sort='activity', limit=None, cursor=None):
+    """Vorschau der Sitzungen: (Seite, naechster Cursor oder None)."""
+    return sessionstore.get().list(sort, limit, cursor)
+
+
+def list_version():
+    """(Versionsmerkmal, mtime oder None) der Sitzungsliste (ETag) oder None."""
+    return sessionstore.get().list_version()
+
+
+def session_lock(session_id):
+    """Exklusive Sperre einer Sitzung (Lesen-Aendern-Schreiben)."""
+    return sessionstore.get().lock(session_id)
+
+
+# =============================================================================
+# NACHRICHTENLISTE WIE index.html
+# =============================================================================
+def replace_german_umlauts(text):
+    """Wie replaceGermanUmlauts() in index.html."""
+    return text.translate(_UMLAUTS) if text else text
+
+
+def decode_umlauts_from_ai(text):
+    """Wie decodeUmlautsFromAI() in index.html."""
+    for placeholder, char in _PLACEHOLDERS:
+        text = text.replace(placeholder, char)
+    return text
+
+
+def clean_reply(text):
+    """Nachbearbeitung der Antwort wie in sendMessage() (ULTIMATIVE BEREINIGUNG)."""
+    text = text.replace('\\n', '\n')
+    file_index = text.find('FILE: ')
+    if file_index != -1:
+        text = text[file_index:]
+    text = _FENCE_START_RE.sub('', text, count=1)
+    text = _FENCE_END_RE.sub('', text, count=1)
+    return decode_umlauts_from_ai(text)
+
+
+def reply_text(body):
+    """Text, den index.html aus einem SSE-Body liest (choices[0].delta.content)."""
+    decoder = sse.SSEDecoder()
+    parts = []
+    for data in decoder.feed(body) + decoder.close():
+        if not data or data == sse.DONE_DATA:
+            continue
+        try:
+            event = json.loads(data)
+        except ValueError:
+            continue
+        choices = event.get('choices') if isinstance(event, dict) else None
+        if choices and isinstance(choices[0], dict) and choices[0].get('delta'):
+            token = choices[0]['delta'].get('content') or ''
+            if token:
+                parts.append(token)
+    return ''.join(parts)
+
+
+def upstream_messages(stored, system, new_message):
+    """Nachrichtenliste fuer den Anbieter aus gespeichertem Verlauf + neuer Nachricht."""
+    effective_system = system
+    if stored and stored[0].get('compressed'):
+        effective_system += '\n\n' + stored[0].get('content', '')
+    messages = [{'role': 'system', 'content': effective_system}]
+    for msg in stored + [new_message]:
+        if msg.get('compressed'):
+            continue  # bereits im System-Prompt
+        content = msg.get('content', '')
+        if not msg.get('hasFile'):
+            content = replace_german_umlauts(content)
+        messages.append({'role': msg.get('role'), 'content': content})
+    return messages
+
+
+def _base_matches(stored, base):
+    count = base.get('count')
+    if count != len(stored):
+        return False
+    last_id = stored[-1].get('id') if stored else None
+    return base.get('lastId') == last_id
+
+
+def _timestamp():
+    return time.strftime('%d.%m.%Y, %H:%M:%S')
+
+
+# =============================================================================
+# SITZUNGS-MODUS DER PROXIES
+# =============================================================================
+class Turn:
+    """Eine Frage im Sitzungs-Modus; commit() speichert Frage und Antwort."""
+
+    def __init__(self, session_id, base, message, reply_id, messages):
+        self.session_id = session_id
+        self.base = base
+        self.message = message
+        self.reply_id = reply_id
+        self.messages = messages
+        self.committed = False
+
+    def commit(self, body):
+        """Antwort (SSE-Body wie an den Browser gesendet) an die Sitzung anhaengen."""
+        text = clean_reply(reply_text(body))
+        if not text:
+            return False
+        reply = {
+            'id': self.reply_id,
+            'role': 'assistant',
+            'content': text,
+            'mode': self.message.get('mode'),
+            'timestamp': _timestamp(),
+            'estimatedTokens': math.ceil(len(text) * TOKENS_PER_CHAR),
+        }
+        timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+        store = sessionstore.get()
+        with store.lock(self.session_id):
+            appended = store.append(
+                self.session_id, self.base.get('count'), self.base.get('lastId'),
+                [self.message, reply], timestamp)
+            if not appended:
+                return False  # inzwischen vom Browser neu gespeichert
+            _index_appended(self.session_id, [self.message, reply], timestamp)
+        self.committed = True
+        return True
+
+
+def prepare_turn(request_data):
+    """Turn fuer eine Anfrage im Sitzungs-Modus, sonst None (voller Verlauf).
+
+    Wirft SessionError bei ungueltiger Anfrage oder abweichendem Stand.
+    """
+    if 'sessionId' not in request_data or 'messages' in request_data:
+        return None
+    session_id = request_data.get('sessionId')
+    if not validate_session_id(session_id):
+        raise SessionError(400, 'Ungueltige Session-ID')
+    message = request_data.get('message')
+    base = request_data.get('base')
+    system = request_data.get('system', '')
+    if (not isinstance(message, dict) or message.get('role') != 'user'
+            or not isinstance(message.get('content'), str)
+            or not isinstance(base, dict) or not isinstance(system, str)):
+        raise SessionError(400, 'Ungueltige Anfrage: message, base und system erforderlich')
+
+    chat_data = load_session(session_id)
+    stored = (chat_data or {}).get('messages') or []
+    if chat_data is None and base.get('count') != 0:
+        raise SessionError(409, 'Session nicht gefunden', 'session_out_of_sync')
+    if not _base_matches(stored, base):
+        raise SessionError(409, 'Gespeicherter Verlauf weicht ab', 'session_out_of_sync')
+
+    messages = upstream_messages(stored, system, message)
+    return Turn(session_id, base, message, request_data.get('replyId'), messages)
+
+
+class Capture:
+    """Zwischen Relay und Ausgabe: zeichnet im Sitzungs-Modus den Body auf."""
+
+    def __init__(self, out, turn):
+        self._out = out
+        self._turn = turn
+        self._parts = [] if turn is not None else None
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._out.write(data)
+        if self._parts is not None:
+            self._parts.append(data)
+
+    def flush(self):
+        self._out.flush()
+
+    def commit(self):
+        """Nach erfolgreichem Stream-Ende aufrufen."""
+        if self._turn is None:
+            return False
+        return self._turn.commit(b''.join(self._parts))
@@ -0,0 +1,1090 @@
+# -*- coding: utf-8 -*-
+"""
+Speicher-Engines fuer Chat-Sitzungen (save-, load-, delete-session.py, Proxies).
+
+Zwei austauschbare Engines mit derselben Schnittstelle:
+
+  files   SESSIONS_DIR/JJJJ/MM/TT/<id>.json bzw. .jsonz (Snapshot) + <id>.journal (Vorgabe)
+  sqlite  SESSIONS_DIR/sessions.db, SQLite im WAL-Modus
+
+Die SQLite-Engine speichert jede Nachricht als eigene Zeile und die
+Listen-Daten (Zeitstempel, Anzahl Nachrichten, Vorschau, Einstellungen) als
+Spalten der Sitzung: die Sitzungsliste ist eine einzige Abfrage ohne eine
+Nachricht zu lesen, eine neue Antwort ist ein INSERT statt einer komplett
+neu geschriebenen Datei, und ein erneutes Speichern des ganzen Verlaufs
+schreibt nur die Nachrichten ab der ersten Abweichung. WAL erlaubt Lesen
+waehrend geschrieben wird (parallele CGI-Prozesse, WSGI-Threads).
+
+store.lock(session_id) sperrt eine Sitzung in beiden Engines per flock
+(files: Sperrdatei neben dem Snapshot, sqlite: SESSIONS_DIR/.locks/), im
+selben Thread erneut betretbar: llmchat/sessions.py haelt die Sperre ueber
+Schreiben und Anhang-Referenzen/Suchindex hinweg, die Methoden der Engine
+sperren darin ein zweites Mal ohne zu blockieren.
+
+Einstellungen (Umgebungsvariablen):
+
+  LLMCHAT_SESSION_STORE=sqlite          Engine waehlen (Vorgabe: files)
+  LLMCHAT_SESSION_LAYOUT=flat           files: alle Dateien direkt in SESSIONS_DIR
+                                        (Vorgabe: sharded, Unterverzeichnis je Tag)
+
+Verzeichnis-Layout der files-Engine: die Session-ID beginnt mit dem Datum
+(JJJJ-MM-TT_HHMMSS_zufall), sharded legt Snapshot, Journal und Sperrdatei
+unter SESSIONS_DIR/JJJJ/MM/TT/ ab. Ein flaches Verzeichnis mit zehntausenden
+Eintraegen macht jedes Anlegen, Nachschlagen und Auflisten langsamer und
+Backups muehsam. Gelesen wird in beiden Layouts (eingestelltes, anderes und
+noch einmal das eingestellte); wer schreibt, legt den Snapshot im
+eingestellten Layout ab und raeumt die alte Stelle. IDs ohne Datum bleiben
+in SESSIONS_DIR.
+
+Die Sitzungsliste der files-Engine kommt aus einem kompakten Index
+SESSIONS_DIR/.index.json (ID, Zeitstempel, Anzahl, Vorschau, Einstellungen,
+Groesse, mtime). Geschrieben wird er nur beim Lesen der Liste (atomar, unter
+.index.lock): der Index wird per stat() gegen das Verzeichnis geprueft,
+fehlende, geaenderte oder neue Dateien (gespeichert, per Journal ergaenzt
+oder von Hand kopiert) werden einzeln nachgelesen, ein fehlender oder
+defekter Index wird komplett neu aufgebaut. Keine Sitzungsdatei wird fuer
+die Liste geparst, solange der Index stimmt. Speichern und Loeschen
+schreiben nur die Listen-Version SESSIONS_DIR/.list.version neu (ein
+Zufallswert, unabhaengig von der Zahl der Sitzungen) - der Index mit
+zehntausenden Eintraegen wuerde sonst pro Antwort komplett neu geschrieben.
+
+Lange Sitzungen laedt load-session.py seitenweise von hinten (page()):
+die neuesten limit Nachrichten vor Position before, als fertig kodierte
+JSON-Texte, dazu die Metadaten und eine komprimierte Zusammenfassung
+(erste Nachricht mit compressed). Die SQLite-Engine liest dafuer nur die
+Zeilen der Seite; die files-Engine muss den Snapshot ganz dekodieren.
+
+Versionsmerkmale fuer ETag/304 (load-session.py) kosten ein stat() bzw. eine
+Zeile: files nimmt Inode, mtime und Groesse von Snapshot und Journal bzw.
+den Inhalt von .list.version, sqlite den Versionszaehler bzw. Anzahl und
+letzte Aktivitaet der Sitzungen.
+
+Sortierung der Liste: activity (letzte Aenderung, Vorgabe) oder created
+(Session-ID); Blaettern mit limit und dem gelieferten Cursor.
+
+Aenderungen landen bei der files-Engine als Zeile im Journal statt als
+komplett neu geschriebene Datei (Format und Verdichtung: llmchat/journal.py).
+Snapshots werden im Format LLMCHAT_SESSION_FORMAT geschrieben (json, compact,
+zlib, lzma; llmchat/sessionformat.py) und in jedem Format gelesen.
+
+Vorhandene JSON-Dateien uebernehmen (einmalig, im Verzeichnis cgi-bin) bzw.
+alle Journale verdichten (z.B. per cron):
+
+  python3 -m llmchat.sessionstore migrate [--force] [--delete]
+  python3 -m llmchat.sessionstore compact
+  python3 -m llmchat.sessionstore convert <json|compact|zlib|lzma> [--train-dict]
+
+Vorhandene Sitzungen ins eingestellte Layout verschieben, im laufenden
+Betrieb (je Sitzung unter deren Sperre, per Hardlink: Lesende sehen immer
+eine vollstaendige Sitzung an der alten oder der neuen Stelle):
+
+  python3 -m llmchat.sessionstore relayout [--pause SEKUNDEN]
+
+Schnittstelle beider Engines:
+
+    store = sessionstore.get()
+    store.load(session_id)               # chatData-Dict oder None
+    store.state(session_id)              # (chatData, offset) oder (None, None)
+    store.page(session_id, limit, before)  # Ausschnitt fuer load-session.py oder None
+    store.save(session_id, chat_data)    # voller Verlauf -> offset
+    store.apply(session_id, offset, ops, timestamp)  # Delta (llmchat/journal.py) -> offset
+    store.append(session_id, count, last_id, messages, timestamp)  # Sitzungs-Modus
+    store.compact(session_id)            # Journal verdichten (files)
+    store.delete(session_id)             # True/False
+    store.list(sort, limit, cursor)      # (Vorschau-Dicts, naechster Cursor)
+    store.usage()                        # [{sessionId, updated, bytes}] (llmchat/retention.py)
+    store.version(session_id)            # (Versionsmerkmal, mtime) oder None, ohne Inhalt zu lesen
+    store.list_version()                 # (Versionsmerkmal, mtime oder None) der Sitzungsliste oder None
+    with store.lock(session_id): ...     # Lesen-Aendern-Schreiben
+"""
+
+import fcntl
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from llmchat import journal, sessionformat
+from llmchat.config import SESSION_DB, SESSIONS_DIR
+
+ENGINE = os.environ.get('LLMCHAT_SESSION_STORE', 'files').strip().lower()
+LAYOUTS = ('sharded', 'flat')
+LAYOUT = os.environ.get('LLMCHAT_SESSION_LAYOUT', 'sharded').strip().lower()
+if LAYOUT not in LAYOUTS:
+    LAYOUT = 'sharded'
+
+PREVIEW_CHARS = 50
+NO_PREVIEW = 'Keine Nachricht'
+SORT_ORDERS = ('activity', 'created')
+
+INDEX_FILE = '.index.json'
+INDEX_LOCK = '.index.lock'
+LIST_VERSION_FILE = '.list.version'
+TRAIN_SAMPLES = 1000  # Sitzungen fuer das zlib-Woerterbuch (convert --train-dict)
+JOURNAL_EXT = '.journal'
+
+_DATED_ID = re.compile(r'(\d{4})-(\d{2})-(\d{2})_')
+_SHARD_NAMES = (re.compile(r'\d{4}$'), re.compile(r'\d{2}$'), re.compile(r'\d{2}$'))
+
+LOCK_DIR = '.locks'  # sqlite: Sperrdateien je Sitzung
+
+_store = None
+_store_lock = threading.Lock()
+_held = threading.local()
+
+
+def preview_text(messages):
+    """Erste 50 Zeichen der ersten User-Nachricht (Sitzungsliste)."""
+    for msg in messages:
+        if isinstance(msg, dict) and msg.get('role') == 'user':
+            content = msg.get('content')
+            return content[:PREVIEW_CHARS] if isinstance(content, str) else NO_PREVIEW
+    return NO_PREVIEW
+
+
+def preview(session_id, chat_data, updated=None):
+    """Eintrag der Sitzungsliste (Format von load-session.py GET)."""
+    messages = chat_data.get('messages', [])
+    return {
+        'sessionId': session_id,
+        'timestamp': chat_data.get('timestamp', ''),
+        'messageCount': len(messages),
+        'preview': preview_text(messages),
+        'settings': chat_data.get('settings', {}),
+        'updated': updated,
+    }
+
+
+class CursorError(ValueError):
+    """Ungueltiger Cursor oder Sortierung (load-session.py: 400)."""
+
+
+def make_cursor(item, sort):
+    if sort == 'created':
+        return item['sessionId']
+    return f"{item['updated']!r}|{item['sessionId']}"
+
+
+def parse_cursor(cursor, sort):
+    """Cursor -> (updated, session_id) bzw. (None, session_id)."""
+    if sort not in SORT_ORDERS:
+        raise CursorError(f'Unbekannte Sortierung: {sort}')
+    if cursor is None:
+        return None
+    if sort == 'created':
+        return None, cursor
+    updated, sep, session_id = cursor.partition('|')
+    try:
+        if not sep:
+            raise ValueError
+        return float(updated), session_id
+    except ValueError:
+        raise CursorError('Ungueltiger Cursor') from None
+
+
+def paginate(items, sort='activity', limit=None, cursor=None):
+    """Sortiert Vorschau-Dicts und liefert (Seite, naechster Cursor oder None)."""
+    position = parse_cursor(cursor, sort)
+    if sort == 'created':
+        items.sort(key=lambda item: item['sessionId'], reverse=True)
+        if position is not None:
+            items = [item for item in items if item['sessionId'] < position[1]]
+    else:
+        items.sort(key=lambda item: (item['updated'], item['sessionId']), reverse=True)
+        if position is not None:
+            items = [item for item in items if (item['updated'], item['sessionId']) < position]
+    if limit is None or len(items) <= limit:
+        return items, None
+    page = items[:limit]
+    return page, make_cursor(page[-1], sort)
+
+
+def _window(total, limit, before):
+    """(start, end) der Seite: limit Nachrichten vor before (None: alle bzw. bis zum Ende)."""
+    end = total if before is None else max(0, min(before, total))
+    start = 0 if limit is None else max(0, end - limit)
+    return start, end
+
+
+def _is_summary(msg):
+    return isinstance(msg, dict) and bool(msg.get('compressed'))
+
+
+def _base_matches(stored, count, last_id):
+    if count != len(stored):
+        return False
+    return last_id == (stored[-1].get('id') if stored else None)
+
+
+@contextmanager
+def _flock(path):
+    """Exklusives flock auf path; im selben Thread erneut betretbar (Sitzung sperren, darin speichern)."""
+    held = getattr(_held, 'paths', None)
+    if held is None:
+        held = _held.paths = set()
+    if path in held:
+        yield
+        return
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    with open(path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        held.add(path)
+        try:
+            yield
+        finally:
+            held.discard(path)
+
+
+def _link(source, target):
+    """Hardlink source -> target; ein vorhandenes target wird atomar ersetzt."""
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        tmp = os.path.join(os.path.dirname(target), '.tmp-' + os.path.basename(target))
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        os.link(source, tmp)
+        os.replace(tmp, target)
+
+
+# =============================================================================
+# ENGINE: JSON-DATEIEN
+# =============================================================================
+class FileStore:
+    """Snapshot <id>.json bzw. <id>.jsonz plus Journal <id>.journal, flach oder je Tag."""
+
+    name = 'files'
+
+    def __init__(self, directory=SESSIONS_DIR, fmt=sessionformat.FORMAT, layout=LAYOUT):
+        self.directory = directory
+        self.format = fmt
+        self.layout = layout
+
+    def shard_dir(self, session_id):
+        """SESSIONS_DIR/JJJJ/MM/TT fuer IDs mit Datum, sonst SESSIONS_DIR."""
+        match = _DATED_ID.match(session_id)
+        return os.path.join(self.directory, *match.groups()) if match else self.directory
+
+    def home_dir(self, session_id):
+        """Verzeichnis im eingestellten Layout (Schreibziel, Sperrdatei)."""
+        return self.shard_dir(session_id) if self.layout == 'sharded' else self.directory
+
+    def _dirs(self, session_id):
+        """Alte Stelle (anderes Layout) und eingestelltes Layout."""
+        home, shard = self.home_dir(session_id), self.shard_dir(session_id)
+        if home == shard == self.directory:
+            return (home,)
+        return (self.directory if home == shard else shard, home)
+
+    def _find(self, session_id):
+        """Vorhandener Snapshot (in einem Verzeichnis zwei Formate: der neuere) oder None.
+
+        Verschieben und Schreiben legen die Datei im eingestellten Layout an,
+        bevor sie die alte entfernen; gesucht wird daher neu, alt und noch
+        einmal neu - so wird eine Sitzung, die gerade umzieht, nie verfehlt.
+        """
+        dirs = self._dirs(session_id)
+        for directory in dirs[::-1] + dirs[1:]:
+            found = None
+            for ext in sessionformat.EXTENSIONS:
+                path = os.path.join(directory, session_id + ext)
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                if found is None or mtime > found[0]:
+                    found = (mtime, path)
+            if found is not None:
+                return found[1]
+        return None
+
+    def path(self, session_id):
+        """Vorhandener Snapshot oder Ziel im eigenen Format und Layout."""
+        return self._find(session_id) or os.path.join(
+            self.home_dir(session_id), session_id + sessionformat.extension(self.format))
+
+    def journal_path(self, session_id, snapshot=None):
+        """Journal neben dem Snapshot."""
+        return os.path.join(os.path.dirname(snapshot or self.path(session_id)), session_id + JOURNAL_EXT)
+
+    def lock_path(self, session_id):
+        return os.path.join(self.home_dir(session_id), f'.{session_id}.lock')
+
+    def lock(self, session_id):
+        return _flock(self.lock_path(session_id))
+
+    def _snapshot(self, path):
+        """(chatData, Generation, applied) des Snapshots oder None."""
+        try:
+            with open(path, 'rb') as f:
+                chat_data = sessionformat.decode(f.read(), self.directory)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(chat_data, dict):
+            return None
+        meta = chat_data.pop('_journal', None) or {}
+        return chat_data, meta.get('gen', ''), meta.get('applied', 0)
+
+    def state(self, session_id):
+        """(chatData, offset) inkl. Journal oder (None, None)."""
+        home = self.home_dir(session_id)
+        for attempt in range(2):
+            path = self._find(session_id)
+            snapshot = self._snapshot(path) if path else None
+            if snapshot is None:
+                if path is None or attempt:
+                    return None, None
+                continue  # gerade verschoben (relayout) oder ersetzt
+            chat_data, generation, n = snapshot
+            for n, ops in journal.read(self.journal_path(session_id, path), generation, n):
+                journal.apply(chat_data, ops)
+            # relayout entfernt den alten Snapshot vor dem alten Journal: steht
+            # er noch, war das gelesene Journal vollstaendig
+            if os.path.dirname(path) == home or attempt or os.path.exists(path):
+                return chat_data, journal.make_offset(generation, n)
+        return None, None
+
+    def load(self, session_id):
+        return self.state(session_id)[0]
+
+    def page(self, session_id, limit=None, before=None):
+        """Seite messages[start:end] als JSON-Texte plus Metadaten oder None."""
+        chat_data, offset = self.state(session_id)
+        if chat_data is None:
+            return None
+        messages = chat_data.pop('messages', None) or []
+        start, end = _window(len(messages), limit, before)
+        return {
+            'meta': chat_data,
+            'offset': offset,
+            'total': len(messages),
+            'start': start,
+            'end': end,
+            'summary': messages[0] if messages and _is_summary(messages[0]) else None,
+            'messages': [_dumps(msg) for msg in messages[start:end]],
+        }
+
+    def _write_file(self, path, content):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _write_json(self, path, data, **options):
+        self._write_file(path, json.dumps(data, ensure_ascii=False, **options).encode('utf-8'))
+
+    def _write_snapshot(self, session_id, chat_data, generation, applied, fmt=None):
+        fmt = fmt or self.format
+        data = dict(chat_data)
+        data['_journal'] = {'gen': generation, 'applied': applied}
+        target = os.path.join(self.home_dir(session_id), session_id + sessionformat.extension(fmt))
+        self._write_file(target, sessionformat.encode(data, fmt, self.directory))
+        # Snapshot im anderen Format bzw. Layout und Journale sind damit ueberholt
+        self._remove_files(session_id, keep=target)
+
+    def _remove_files(self, session_id, keep=None, locks=False):
+        """Snapshots, Journale und Sperrdateien der alten Stelle entfernen (ausser keep).
+
+        Die Sperrdatei im eingestellten Layout nur mit locks=True (Loeschen);
+        True wenn ein Snapshot dabei war.
+        """
+        removed = False
+        home = self.home_dir(session_id)
+        for directory in self._dirs(session_id):
+            for ext in sessionformat.EXTENSIONS:
+                path = os.path.join(directory, session_id + ext)
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    removed = True
+                except OSError:
+                    pass
+            for path in (os.path.join(directory, session_id + JOURNAL_EXT),
+                         os.path.join(directory, f'.{session_id}.lock')
+                         if locks or directory != home else None):
+                if path:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        return removed
+
+    def save(self, session_id, chat_data):
+        """Voller Verlauf: neuer Snapshot, neue Journal-Generation; liefert offset."""
+        generation = journal.new_generation()
+        self._write_snapshot(session_id, chat_data, generation, 0)
+        self._list_changed()
+        return journal.make_offset(generation, 0)
+
+    def _apply_locked(self, session_id, chat_data, offset, ops):
+        generation, _, n = offset.rpartition(':')
+        n = int(n) + 1
+        journal.apply(chat_data, ops)
+        snapshot = self.path(session_id)
+        size = journal.append(self.journal_path(session_id, snapshot), generation, n, ops)
+        try:
+            snapshot_size = os.path.getsize(snapshot)
+        except OSError:
+            snapshot_size = 0
+        if journal.needs_compaction(size, snapshot_size):
+            self._write_snapshot(session_id, chat_data, generation, n)
+        self._list_changed()
+        return journal.make_offset(generation, n)
+
+    def apply(self, session_id, offset, ops, timestamp):
+        """Delta auf Journal-Stand offset anwenden; liefert den neuen offset."""
+        journal.validate(ops)
+        ops = ops + [{'op': 'meta', 'fields': {'timestamp': timestamp}}]
+        with self.lock(session_id):
+            chat_data, current = self.state(session_id)
+            if chat_data is None or offset != current:
+                raise journal.OffsetMismatch(current)
+            return self._apply_locked(session_id, chat_data, current, ops)
+
+    def append(self, session_id, count, last_id, messages, timestamp):
+        with self.lock(session_id):
+            chat_data, offset = self.state(session_id)
+            if chat_data is None:
+                if count != 0 or last_id is not None:
+                    return False
+                self.save(session_id, {'timestamp': timestamp, 'messages': messages})
+                return True
+            if not _base_matches(chat_data.get('messages') or [], count, last_id):
+                return False
+            self._apply_locked(session_id, chat_data, offset, [
+                {'op': 'append', 'messages': messages},
+                {'op': 'meta', 'fields': {'timestamp': timestamp}},
+            ])
+        return True
+
+    def compact(self, session_id):
+        """Journal in den Snapshot uebernehmen; True wenn es etwas zu tun gab."""
+        with self.lock(session_id):
+            if not os.path.exists(self.journal_path(session_id)):
+                return False
+            chat_data, offset = self.state(session_id)
+            if chat_data is None:
+                return False
+            generation, _, n = offset.rpartition(':')
+            self._write_snapshot(session_id, chat_data, generation, int(n))
+            self._list_changed()
+        return True
+
+    def convert(self, session_id, fmt):
+        """Snapshot (inkl. Journal) im Format fmt neu schreiben; liefert (vorher, nachher) Bytes."""
+        with self.lock(session_id):
+            before = self._disk_size(session_id)
+            chat_data, offset = self.state(session_id)
+            if chat_data is None:
+                return None
+            generation, _, n = offset.rpartition(':')
+            self._write_snapshot(session_id, chat_data, generation, int(n), fmt)
+            self._list_changed()
+            return before, self._disk_size(session_id)
+
+    def _disk_size(self, session_id):
+        size = 0
+        snapshot = self.path(session_id)
+        for path in (snapshot, self.journal_path(session_id, snapshot)):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+    def delete(self, session_id):
+        if not self._remove_files(session_id, locks=True):
+            return False
+        self._list_changed()
+        return True
+
+    def _scan(self):
+        """Dateien in SESSIONS_DIR und allen Tagesverzeichnissen JJJJ/MM/TT."""
+        level = [self.directory]
+        for depth in range(len(_SHARD_NAMES) + 1):
+            subdirs = []
+            for directory in level:
+                try:
+                    entries = list(os.scandir(directory))
+                except OSError:
+                    continue
+                for entry in entries:
+                    if depth < len(_SHARD_NAMES) and _SHARD_NAMES[depth].match(entry.name):
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+            level = subdirs
+
+    def ids(self):
+        return sorted({session_id for session_id in (sessionformat.session_id(entry.name)
+                                                     for entry in self._scan()) if session_id},
+                      reverse=True)
+
+    def relayout(self, session_id):
+        """Sitzung ins eingestellte Layout verschieben; True wenn verschoben.
+
+        Hardlinks in der Reihenfolge Journal, Snapshot; danach entfernen:
+        alter Snapshot, altes Journal. state() liest damit immer eine
+        vollstaendige Sitzung (und wiederholt, falls der alte Snapshot
+        unterwegs verschwindet). mtime bleibt erhalten, der Index stimmt weiter.
+        """
+        home = self.home_dir(session_id)
+        with self.lock(session_id):
+            path = self._find(session_id)
+            if path is None or os.path.dirname(path) == home:
+                return False
+            moves = [(self.journal_path(session_id, path), os.path.join(home, session_id + JOURNAL_EXT)),
+                     (path, os.path.join(home, os.path.basename(path)))]
+            for source, target in moves:
+                try:
+                    _link(source, target)
+                except FileNotFoundError:
+                    if source == path:
+                        raise
+            for source, _ in reversed(moves):
+                try:
+                    os.remove(source)
+                except FileNotFoundError:
+                    pass
+            old_lock = os.path.join(os.path.dirname(path), f'.{session_id}.lock')
+            if old_lock != self.lock_path(session_id):
+                try:
+                    os.remove(old_lock)
+                except OSError:
+                    pass
+        return True
+
+    # --- Index der Sitzungsliste -------------------------------------------
+    @contextmanager
+    def _index_lock(self):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        with open(os.path.join(self.directory, INDEX_LOCK), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _read_index(self):
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return index if isinstance(index, dict) else None
+
+    def _write_index(self, index):
+        self._write_json(os.path.join(self.directory, INDEX_FILE), index, separators=(',', ':'))
+
+    def _index_entry(self, session_id, chat_data, st, journal_st=None):
+        updated = max(st.st_mtime, journal_st.st_mtime if journal_st else 0)
+        entry = preview(session_id, chat_data, updated)
+        entry['size'] = st.st_size
+        entry['mtime_ns'] = st.st_mtime_ns
+        entry['journal'] = journal_st.st_size if journal_st else 0
+        return entry
+
+    def _list_changed(self):
+        """Neue Listen-Version; der Index selbst heilt beim naechsten Lesen (index())."""
+        try:
+            self._write_file(os.path.join(self.directory, LIST_VERSION_FILE), os.urandom(8).hex().encode('ascii'))
+        except OSError:
+            pass  # ohne Version antwortet die Liste nur nicht mit 304
+
+    def index(self):
+        """Index aller Sitzungen; prueft per stat() und heilt Abweichungen."""
+        index = self._read_index()
+        healed = index is None
+        index = index or {}
+        current = {}
+        journals = {}
+        snapshots = {}
+        for entry in self._scan():
+            if entry.name.endswith(JOURNAL_EXT):
+                target = journals
+                session_id = entry.name[:-len(JOURNAL_EXT)]
+            else:
+                target = snapshots
+                session_id = sessionformat.session_id(entry.name)
+                if session_id is None:
+                    continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            known = target.get(session_id)
+            if known is None or st.st_mtime_ns > known.st_mtime_ns:
+                target[session_id] = st
+        for session_id, st in snapshots.items():
+            journal_st = journals.get(session_id)
+            known = index.get(session_id)
+            if (known and known.get('mtime_ns') == st.st_mtime_ns and known.get('size') == st.st_size
+                    and known.get('journal', 0) == (journal_st.st_size if journal_st else 0)):
+                current[session_id] = known
+                continue
+            chat_data = self.load(session_id)
+            healed = True
+            if isinstance(chat_data, dict):
+                current[session_id] = self._index_entry(session_id, chat_data, st, journal_st)
+        if healed or len(current) != len(index):
+            try:
+                with self._index_lock():
+                    self._write_index(current)
+            except OSError:
+                pass
+        return current
+
+    def list(self, sort='activity', limit=None, cursor=None):
+        items = [{key: value for key, value in entry.items() if key not in ('size', 'mtime_ns', 'journal')}
+                 for entry in self.index().values()]
+        return paginate(items, sort, limit, cursor)
+
+    def usage(self):
+        """Letzte Aktivitaet und Plattenbedarf (Snapshot + Journal) aller Sitzungen."""
+        return [{'sessionId': session_id, 'updated': entry['updated'],
+                 'bytes': entry.get('size', 0) + entry.get('journal', 0)}
+                for session_id, entry in self.index().items()]
+
+    def version(self, session_id):
+        """(Versionsmerkmal, mtime) aus stat() von Snapshot und Journal oder None."""
+        path = self._find(session_id)
+        try:
+            st = os.stat(path) if path else None
+        except OSError:
+            st = None
+        if st is None:
+            return None
+        try:
+            journal_st = os.stat(self.journal_path(session_id, path))
+        except OSError:
+            return f'{st.st_ino}-{st.st_mtime_ns}-{st.st_size}', st.st_mtime
+        return (f'{st.st_ino}-{st.st_mtime_ns}-{st.st_size}-{journal_st.st_mtime_ns}-{journal_st.st_size}',
+                max(st.st_mtime, journal_st.st_mtime))
+
+    def list_version(self):
+        """(Versionsmerkmal, mtime) aus .list.version oder None (Index oder Version fehlt).
+
+        Das Heilen des Index beim Lesen aendert die Version nicht. Von Hand
+        kopierte oder entfernte Dateien zeigt eine zwischengespeicherte Liste
+        erst nach dem naechsten Speichern oder Loeschen; sofort, wenn
+        .index.json entfernt wird (der naechste Abruf baut ihn neu).
+        """
+        if not os.path.exists(os.path.join(self.directory, INDEX_FILE)):
+            return None
+        try:
+            with open(os.path.join(self.directory, LIST_VERSION_FILE), 'rb') as f:
+                version = f.read(64).decode('ascii', 'replace')
+                mtime = os.fstat(f.fileno()).st_mtime
+        except OSError:
+            return None
+        return version, mtime
+
+
+# =============================================================================
+# ENGINE: SQLITE (WAL)
+# =============================================================================
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id            TEXT PRIMARY KEY,
+    timestamp     TEXT NOT NULL DEFAULT '',
+    updated       REAL NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    last_msg_id   TEXT,
+    preview       TEXT NOT NULL DEFAULT '',
+    settings      TEXT NOT NULL DEFAULT '{}',
+    extra         TEXT NOT NULL DEFAULT '{}',
+    version       INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_activity ON sessions (updated, id);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    seq        INTEGER NOT NULL,
+    msg_id     TEXT,
+    role       TEXT,
+    data       TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+_SCHEMA_VERSION = 3
+# Aenderungen bestehender Datenbanken: Zielversion -> SQL
+_MIGRATIONS = (
+    (3, 'ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0'),
+)
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+class SQLiteStore:
+    """Sitzungen und Nachrichten als Zeilen einer SQLite-Datenbank (WAL)."""
+
+    name = 'sqlite'
+
+    def __init__(self, path=SESSION_DB):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        con = getattr(self._local, 'con', None)
+        if con is not None:
+            return con
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        created = not os.path.exists(self.path)
+        con = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        con.execute('PRAGMA journal_mode=WAL')
+        con.execute('PRAGMA synchronous=NORMAL')
+        con.execute('PRAGMA foreign_keys=ON')
+        version = con.execute('PRAGMA user_version').fetchone()[0]
+        if version < _SCHEMA_VERSION:
+            if version:
+                for target, sql in _MIGRATIONS:
+                    if version < target:
+                        con.execute(sql)
+            con.executescript(_SCHEMA)
+            con.execute(f'PRAGMA user_version={_SCHEMA_VERSION}')
+        if created:
+            os.chmod(self.path, 0o600)
+        self._local.con = con
+        return con
+
+    @contextmanager
+    def _transaction(self):
+        con = self._connect()
+        con.execute('BEGIN IMMEDIATE')
+        try:
+            yield con
+        except BaseException:
+            con.execute('ROLLBACK')
+            raise
+        con.execute('COMMIT')
+
+    def lock(self, session_id):
+        """Sperre je Sitzung ueber Transaktionen hinweg (z.B. Speichern + Anhang-Referenzen)."""
+        return _flock(os.path.join(os.path.dirname(self.path), LOCK_DIR, f'.{session_id}.lock'))
+
+    def _state(self, con, session_id):
+        row = con.execute('SELECT extra, version FROM sessions WHERE id = ?', (session_id,)).fetchone()
+        if row is None:
+            return None, None
+        chat_data = json.loads(row[0])
+        chat_data['messages'] = [json.loads(data) for (data,) in con.execute(
+            'SELECT data FROM messages WHERE session_id = ? ORDER BY seq', (session_id,))]
+        return chat_data, str(row[1])
+
+    def state(self, session_id):
+        """(chatData, offset) oder (None, None); offset ist die Versionsnummer."""
+        return self._state(self._connect(), session_id)
+
+    def load(self, session_id):
+        return self.state(session_id)[0]
+
+    def page(self, session_id, limit=None, before=None):
+        """Wie FileStore.page(), liest aber nur die Zeilen der Seite."""
+        con = self._connect()
+        con.execute('BEGIN')  # Metadaten und Seite aus demselben Stand
+        try:
+            row = con.execute('SELECT extra, version, message_count FROM sessions WHERE id = ?',
+                              (session_id,)).fetchone()
+            if row is None:
+                return None
+            extra, version, total = row
+            start, end = _window(total, limit, before)
+            # Zusammenfassung des Kompressors: id compressed_<Zeit> an Position 0
+            first = con.execute("SELECT data FROM messages WHERE session_id = ? AND seq = 0"
+                                " AND msg_id LIKE 'compressed%'", (session_id,)).fetchone()
+            summary = json.loads(first[0]) if first else None
+            messages = [data for (data,) in con.execute(
+                'SELECT data FROM messages WHERE session_id = ? AND seq >= ? AND seq < ? ORDER BY seq',
+                (session_id, start, end))]
+        finally:
+            con.execute('COMMIT')
+        return {
+            'meta': json.loads(extra),
+            'offset': str(version),
+            'total': total,
+            'start': start,
+            'end': end,
+            'summary': summary if _is_summary(summary) else None,
+            'messages': messages,
+        }
+
+    def _write_session(self, con, session_id, chat_data, messages):
+        extra = {key: value for key, value in chat_data.items() if key != 'messages'}
+        last_id = messages[-1].get('id') if messages and isinstance(messages[-1], dict) else None
+        con.execute(
+            'INSERT INTO sessions (id, timestamp, updated, message_count, last_msg_id, preview, settings, extra, version)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)'
+            ' ON CONFLICT (id) DO UPDATE SET timestamp = excluded.timestamp, updated = excluded.updated,'
+            ' message_count = excluded.message_count, last_msg_id = excluded.last_msg_id,'
+            ' preview = excluded.preview, settings = excluded.settings, extra = excluded.extra,'
+            ' version = sessions.version + 1',
+            (session_id, str(chat_data.get('timestamp', '')), time.time(), len(messages), last_id,
+             preview_text(messages), _dumps(chat_data.get('settings', {})), _dumps(extra)))
+
+    @staticmethod
+    def _rows(session_id, messages, first_seq):
+        for seq, msg in enumerate(messages, first_seq):
+            msg_id = msg.get('id') if isinstance(msg, dict) else None
+            role = msg.get('role') if isinstance(msg, dict) else None
+            yield session_id, seq, msg_id, role, _dumps(msg)
+
+    def _save(self, con, session_id, chat_data):
+        """Schreibt nur die Nachrichten ab der ersten Abweichung neu; liefert offset."""
+        messages = chat_data.get('messages') or []
+        encoded = [_dumps(msg) for msg in messages]
+        stored = [data for (data,) in con.execute(
+            'SELECT data FROM messages WHERE session_id = ? ORDER BY seq', (session_id,))]
+        keep = 0
+        while keep < min(len(stored), len(encoded)) and stored[keep] == encoded[keep]:
+            keep += 1
+        self._write_session(con, session_id, chat_data, messages)
+        con.execute('DELETE FROM messages WHERE session_id = ? AND seq >= ?', (session_id, keep))
+        con.executemany('INSERT INTO messages (session_id, seq, msg_id, role, data) VALUES (?, ?, ?, ?, ?)',
+                        self._rows(session_id, messages[keep:], keep))
+        return str(con.execute('SELECT version FROM sessions WHERE id = ?', (session_id,)).fetchone()[0])
+
+    def save(self, session_id, chat_data):
+        with self._transaction() as con:
+            return self._save(con, session_id, chat_data)
+
+    def apply(self, session_id, offset, ops, timestamp):
+        """Delta auf Version offset anwenden; liefert die neue Version."""
+        journal.validate(ops)
+        with self._transaction() as con:
+            chat_data, current = self._state(con, session_id)
+            if chat_data is None or offset != current:
+                raise journal.OffsetMismatch(current)
+            journal.apply(chat_data, ops + [{'op': 'meta', 'fields': {'timestamp': timestamp}}])
+            return self._save(con, session_id, chat_data)
+
+    def compact(self, session_id):
+        return False  # Zeilen werden direkt geaendert, kein Journal
+
+    def append(self, session_id, count, last_id, messages, timestamp):
+        with self._transaction() as con:
+            row = con.execute('SELECT message_count, last_msg_id, preview, extra FROM sessions WHERE id = ?',
+                              (session_id,)).fetchone()
+            if row is None:
+                if count != 0 or last_id is not None:
+                    return False
+                self._write_session(con, session_id, {'timestamp': timestamp}, messages)
+            else:
+                stored_count, stored_last, stored_preview, extra = row
+                if count != stored_count or last_id != stored_last:
+                    return False
+                extra = json.loads(extra)
+                extra['timestamp'] = timestamp
+                if stored_preview == NO_PREVIEW:
+                    stored_preview = preview_text(messages)
+                con.execute('UPDATE sessions SET timestamp = ?, updated = ?, message_count = ?,'
+                            ' last_msg_id = ?, preview = ?, extra = ?, version = version + 1 WHERE id = ?',
+                            (timestamp, time.time(), stored_count + len(messages),
+                             messages[-1].get('id'), stored_preview, _dumps(extra), session_id))
+            con.executemany('INSERT INTO messages (session_id, seq, msg_id, role, data) VALUES (?, ?, ?, ?, ?)',
+                            self._rows(session_id, messages, count))
+        return True
+
+    def delete(self, session_id):
+        with self._transaction() as con:
+            cursor = con.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+        try:
+            os.remove(os.path.join(os.path.dirname(self.path), LOCK_DIR, f'.{session_id}.lock'))
+        except OSError:
+            pass
+        return cursor.rowcount > 0
+
+    def ids(self):
+        return [session_id for (session_id,) in self._connect().execute(
+            'SELECT id FROM sessions ORDER BY id DESC')]
+
+    def list(self, sort='activity', limit=None, cursor=None):
+        position = parse_cursor(cursor, sort)
+        query = 'SELECT id, timestamp, message_count, preview, settings, updated FROM sessions'
+        params = []
+        if sort == 'created':
+            if position is not None:
+                query += ' WHERE id < ?'
+                params.append(position[1])
+            query += ' ORDER BY id DESC'
+        else:
+            if position is not None:
+                query += ' WHERE updated < ? OR (updated = ? AND id < ?)'
+                params += [position[0], position[0], position[1]]
+            query += ' ORDER BY updated DESC, id DESC'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit + 1)
+        items = [{
+            'sessionId': session_id,
+            'timestamp': timestamp,
+            'messageCount': count,
+            'preview': preview,
+            'settings': json.loads(settings),
+            'updated': updated,
+        } for session_id, timestamp, count, preview, settings, updated in self._connect().execute(query, params)]
+        if limit is None or len(items) <= limit:
+            return items, None
+        items = items[:limit]
+        return items, make_cursor(items[-1], sort)
+
+    def usage(self):
+        """Wie FileStore.usage(); Bytes = Laenge der gespeicherten JSON-Texte."""
+        return [{'sessionId': session_id, 'updated': updated, 'bytes': size}
+                for session_id, updated, size in self._connect().execute(
+                    'SELECT s.id, s.updated, LENGTH(s.extra) + COALESCE(SUM(LENGTH(m.data)), 0)'
+                    ' FROM sessions s LEFT JOIN messages m ON m.session_id = s.id GROUP BY s.id')]
+
+    def version(self, session_id):
+        """(Versionszaehler und Zeitpunkt, updated) oder None."""
+        row = self._connect().execute('SELECT version, updated FROM sessions WHERE id = ?',
+                                      (session_id,)).fetchone()
+        return None if row is None else (f'{row[0]}-{row[1]!r}', row[1])
+
+    def list_version(self):
+        """(Anzahl und letzte Aktivitaet, None): Loeschen aendert nur die Anzahl, daher keine mtime."""
+        count, updated = self._connect().execute('SELECT COUNT(*), MAX(updated) FROM sessions').fetchone()
+        return f'{count}-{updated!r}', None
+
+
+# =============================================================================
+# AUSWAHL / MIGRATION
+# =============================================================================
+def get():
+    """Die konfigurierte Engine (einmal pro Prozess angelegt)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SQLiteStore() if ENGINE == 'sqlite' else FileStore()
+    return _store
+
+
+def migrate(force=False, delete=False, out=sys.stdout):
+    """Uebernimmt SESSIONS_DIR/*.json in die SQLite-Datenbank."""
+    source, target = FileStore(), SQLiteStore()
+    existing = set(target.ids())
+    imported = skipped = failed = 0
+    for session_id in source.ids():
+        if session_id in existing and not force:
+            skipped += 1
+            continue
+        chat_data = source.load(session_id)
+        if not isinstance(chat_data, dict):
+            print(f'FEHLER: {session_id}.json nicht lesbar', file=out)
+            failed += 1
+            continue
+        target.save(session_id, chat_data)
+        imported += 1
+        if delete:
+            source.delete(session_id)
+    print(f'{imported} importiert, {skipped} bereits vorhanden, {failed} Fehler -> {target.path}', file=out)
+    return failed == 0
+
+
+def compact_all(out=sys.stdout):
+    """Verdichtet alle Journale der konfigurierten Engine."""
+    store = get()
+    compacted = sum(1 for session_id in store.ids() if store.compact(session_id))
+    print(f'{compacted} Journale verdichtet ({store.name})', file=out)
+    return True
+
+
+def convert_all(fmt, train_dict=False, out=sys.stdout):
+    """Schreibt alle Snapshots der files-Engine im Format fmt neu."""
+    store = FileStore(fmt=fmt)
+    ids = store.ids()
+    if train_dict:
+        samples = filter(None, (store.load(session_id) for session_id in ids[:TRAIN_SAMPLES]))
+        zdict = sessionformat.train(samples)
+        dict_id = sessionformat.save_dictionary(store.directory, zdict)
+        print(f'Woerterbuch {dict_id}: {len(zdict)} Bytes aus bis zu {TRAIN_SAMPLES} Sitzungen', file=out)
+    started = time.monotonic()
+    before = after = converted = failed = 0
+    for session_id in ids:
+        sizes = store.convert(session_id, fmt)
+        if sizes is None:
+            print(f'FEHLER: {session_id} nicht lesbar', file=out)
+            failed += 1
+            continue
+        before += sizes[0]
+        after += sizes[1]
+        converted += 1
+    ratio = after / before if before else 1.0
+    print(f'{converted} Sitzungen -> {fmt}: {before / 1048576:.1f} MB -> {after / 1048576:.1f} MB '
+          f'({ratio:.1%}), {time.monotonic() - started:.1f} s, {failed} Fehler', file=out)
+    return failed == 0
+
+
+def relayout_all(pause=0.0, store=None, out=sys.stdout):
+    """Verschiebt alle Sitzungen der files-Engine ins eingestellte Layout (LLMCHAT_SESSION_LAYOUT)."""
+    store = store or FileStore()
+    started = time.monotonic()
+    moved = failed = 0
+    for session_id in store.ids():
+        try:
+            if not store.relayout(session_id):
+                continue
+        except OSError as e:
+            print(f'FEHLER: {session_id}: {e}', file=out)
+            failed += 1
+            continue
+        moved += 1
+        if pause:
+            time.sleep(pause)
+    if store.layout == 'flat':
+        # leere Tagesverzeichnisse aufraeumen (von unten nach oben)
+        for directory, _, _ in sorted(os.walk(store.directory), reverse=True):
+            parts = os.path.relpath(directory, store.directory).split(os.sep)
+            if len(parts) <= len(_SHARD_NAMES) and all(
+                    pattern.match(part) for pattern, part in zip(_SHARD_NAMES, parts)):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    pass
+    print(f'{moved} Sitzungen -> {store.layout}, {time.monotonic() - started:.1f} s, {failed} Fehler',
+          file=out)
+    return failed == 0
+
+USAGE = ('Verwendung: python3 -m llmchat.sessionstore migrate [--force] [--delete] | compact'
+         f' | convert <{"|".join(sessionformat.FORMATS)}> [--train-dict] | relayout [--pause SEKUNDEN]')
+
+
+def main(argv):
+    args = argv[1:]
+    if args == ['compact']:
+        return 0 if compact_all() else 1
+    if args[:1] == ['relayout'] and (len(args) == 1 or len(args) == 3 and args[1] == '--pause'):
+        try:
+            pause = float(args[2]) if len(args) == 3 else 0.0
+        except ValueError:
+            pause = -1
+        if pause >= 0:
+            return 0 if relayout_all(pause) else 1
+    if (len(args) in (2, 3) and args[0] == 'convert' and args[1] in sessionformat.FORMATS
+            and set(args[2:]) <= {'--train-dict'}):
+        return 0 if convert_all(args[1], train_dict='--train-dict' in args) else 1
+    if not args or args[0] != 'migrate' or set(args[1:]) - {'--force', '--delete'}:
+        print(USAGE, file=sys.stderr)
+        return 2
+    return 0 if migrate(force='--force' in args, delete='--delete' in args) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
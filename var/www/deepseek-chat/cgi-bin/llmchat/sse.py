@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Inkrementeller Server-Sent-Events-Codec auf Byte-Ebene.
+
+Ersetzt die bisherige Relay-Schleife der Proxies
+
+    buffer += chunk.decode('utf-8')
+    while '\\n' in buffer:
+        line, buffer = buffer.split('\\n', 1)
+
+die bei jeder Zeile den Rest des Puffers kopiert und bei einem an der
+Lesegrenze geteilten UTF-8-Zeichen (ä, ö, ü, ß, ...) mit
+UnicodeDecodeError abbricht.
+
+SSEDecoder arbeitet ausschliesslich auf Bytes: pro Chunk wird der Teil bis
+zum letzten Zeilenende einmal herausgeschnitten (memoryview) und in C
+zeilenweise zerlegt; nur die unvollstaendige letzte Zeile bleibt in einem
+bytearray liegen. Die Suche nach dem Zeilenende setzt dort fort, wo der
+letzte Chunk aufgehoert hat; ein grosses Event, das in vielen kleinen
+Chunks eintrifft, wird daher nur einmal durchsucht. Dekodiert wird erst
+vom Aufrufer (json.loads akzeptiert Bytes), ein geteiltes Multibyte-Zeichen
+ist so nie ein Problem.
+
+Verwendung in den Proxies:
+
+    for data in sse.iter_data(response):      # data: bytes ohne 'data: '
+        if data == sse.DONE_DATA:
+            ...
+        resp.write(sse.encode_delta(text))     # data: {"choices": [...]}\\n\\n
+
+Siehe benchmarks/sse_relay.py fuer den Vergleich mit der alten Schleife.
+"""
+
+import json
+
+READ_SIZE = 65536
+
+DONE_DATA = b'[DONE]'
+DONE = b'data: [DONE]\n\n'
+
+DELTA_PREFIX = b'data: {"choices": [{"delta": {"content": '
+DELTA_SUFFIX = b'}}]}\n\n'
+
+
+class SSEDecoder:
+    """Zerlegt einen SSE-Bytestrom inkrementell in data-Felder.
+
+    feed() liefert die Payloads aller in diesem Chunk abgeschlossenen
+    Events (data-Zeilen eines Events mit b'\\n' verbunden, wie in der
+    SSE-Spezifikation, ohne umgebenden Leerraum). Kommentare (':'), event:,
+    id: und retry: werden ignoriert. close() liefert ein Event ohne
+    abschliessende Leerzeile.
+    """
+
+    __slots__ = ('_buf', '_scan', '_data')
+
+    def __init__(self):
+        self._buf = bytearray()   # unvollstaendige letzte Zeile
+        self._scan = 0            # bis hierhin enthaelt _buf kein b'\n'
+        self._data = []           # data-Zeilen des laufenden Events
+
+    def feed(self, chunk):
+        buf = self._buf
+        if not buf:
+            # Haeufigster Fall: Chunk beginnt an einer Zeilengrenze
+            end = chunk.rfind(b'\n')
+            if end < 0:
+                buf += chunk
+                self._scan = len(buf)
+                return []
+            if end == len(chunk) - 1:
+                block = chunk
+            else:
+                block = memoryview(chunk)[:end + 1].tobytes()
+                buf += memoryview(chunk)[end + 1:]
+                self._scan = len(buf)
+        else:
+            buf += chunk
+            # Nur die neuen Bytes durchsuchen (grosse Events in vielen Chunks)
+            end = buf.rfind(b'\n', self._scan)
+            if end < 0:
+                self._scan = len(buf)
+                return []
+            with memoryview(buf) as view:
+                block = view[:end + 1].tobytes()
+            del buf[:end + 1]
+            self._scan = len(buf)
+        return self._lines(block.split(b'\n'))
+
+    def close(self):
+        """Restpuffer als letzte Zeile verarbeiten und offenes Event liefern."""
+        lines = [bytes(self._buf), b''] if self._buf else [b'']
+        self._buf.clear()
+        self._scan = 0
+        events = self._lines(lines)
+        if self._data:
+            events.append(b'\n'.join(self._data))
+            self._data = []
+        return events
+
+    def _lines(self, lines):
+        # lines endet mit dem leeren Rest hinter dem letzten b'\n'
+        lines.pop()
+        events = []
+        data = self._data
+        for line in lines:
+            if line.startswith(b'data:'):
+                data.append(line[5:].strip())
+            elif not line or line == b'\r':
+                # Leerzeile: Event abschliessen
+                if data:
+                    events.append(data[0] if len(data) == 1 else b'\n'.join(data))
+                    data.clear()
+        return events
+
+
+def iter_chunks(response, size=READ_SIZE):
+    """Liest den Upstream-Body in Chunks, sobald Daten vorliegen."""
+    read = getattr(response, 'read1', None) or response.read
+    while True:
+        chunk = read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_data(response, size=READ_SIZE):
+    """Liefert die data-Payloads (bytes, ohne Leerraum) eines SSE-Streams."""
+    decoder = SSEDecoder()
+    for chunk in iter_chunks(response, size):
+        yield from decoder.feed(chunk)
+    yield from decoder.close()
+
+
+# =============================================================================
+# ENCODER
+# =============================================================================
+def encode_data(payload):
+    """Ein SSE-Event mit einem data-Feld (payload: bytes oder str)."""
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    return b'data: ' + payload + b'\n\n'
+
+
+def encode_json(obj):
+    """Ein SSE-Event mit JSON-Payload (json.dumps-Standardformat)."""
+    return b'data: ' + json.dumps(obj).encode('ascii') + b'\n\n'
+
+
+def encode_delta(text):
+    """data: {"choices": [{"delta": {"content": text}}]} — byte-identisch zu
+    json.dumps() des bisherigen openai_chunk-dict, aber ohne dict-Aufbau."""
+    return DELTA_PREFIX + json.dumps(text).encode('ascii') + DELTA_SUFFIX
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Adaptives Zusammenfassen (Coalescing) der Token-Ausgabe an den Browser.
+
+Bisher folgte auf jedes Token-Event ein resp.flush() — ein write()-Syscall
+und meist ein eigenes TCP-Segment pro Token. Schnelle Anbieter (Groq)
+liefern mehrere hundert Token pro Sekunde.
+
+StreamWriter sammelt die Events und gibt sie gebuendelt weiter, sobald
+
+  - LLMCHAT_STREAM_FLUSH_BYTES Bytes anstehen           (Vorgabe 4096), oder
+  - das aelteste anstehende Event LLMCHAT_STREAM_FLUSH_MS
+    Millisekunden alt ist                               (Vorgabe 30)
+
+je nachdem, was zuerst eintritt. Sofort weitergegeben werden immer das
+erste Event (Zeit bis zum ersten Token bleibt unveraendert) und
+data: [DONE]. Die Zeitgrenze gilt auch, wenn der Upstream gerade schweigt:
+ein Hintergrund-Thread pro Stream gibt faellige Daten ab. Mit
+LLMCHAT_STREAM_FLUSH_MS=0 wird wie bisher jedes Event einzeln geflusht.
+
+    start_sse(resp)
+    with stream.StreamWriter(resp) as out:
+        relay.relay_openai(response, out)
+        out.write(sse.DONE)
+"""
+
+import threading
+import time
+
+from llmchat.config import env_float, env_int
+
+FLUSH_BYTES = env_int('LLMCHAT_STREAM_FLUSH_BYTES', 4096)
+FLUSH_MS = env_float('LLMCHAT_STREAM_FLUSH_MS', 30.0)
+
+_DONE_SUFFIX = b'[DONE]\n\n'
+
+
+class StreamWriter:
+    """Puffert resp.write() und flusht nach Bytes- oder Zeitgrenze."""
+
+    def __init__(self, resp, max_bytes=FLUSH_BYTES, max_delay_ms=FLUSH_MS):
+        self._resp = resp
+        self._max_bytes = max_bytes
+        self._max_delay = max(max_delay_ms, 0) / 1000.0
+        self._pending = []
+        self._pending_size = 0
+        self._deadline = None
+        self._first = True
+        self._closed = False
+        self._error = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self.writes = 0
+        self.flushes = 0
+
+    # --- oeffentliche Schnittstelle (wie Response) ------------------------------
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if not data:
+            return
+        with self._cond:
+            self._raise_error()
+            self.writes += 1
+            self._pending.append(data)
+            self._pending_size += len(data)
+            if (self._first or self._max_delay == 0 or self._pending_size >= self._max_bytes
+                    or data.endswith(_DONE_SUFFIX)):
+                self._first = False
+                self._flush_locked()
+            elif self._deadline is None:
+                self._deadline = time.monotonic() + self._max_delay
+                self._ensure_thread()
+                self._cond.notify()
+
+    def flush(self):
+        """Anstehende Daten sofort weitergeben."""
+        with self._cond:
+            self._raise_error()
+            self._flush_locked()
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+            if self._error is None:
+                self._flush_locked()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+            self._raise_error()
+        else:
+            # Bei Abbruch (z.B. BrokenPipe) nur den Thread beenden
+            try:
+                self.close()
+            except Exception:
+                pass
+        return False
+
+    # --- intern -------------------------------------------------------------
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            self._closed = True
+            raise error
+
+    def _flush_locked(self):
+        self._deadline = None
+        if not self._pending:
+            return
+        data = self._pending[0] if len(self._pending) == 1 else b''.join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        self._resp.write(data)
+        self._resp.flush()
+        self.flushes += 1
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='llmchat-stream-flush',
+                                            daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        with self._cond:
+            while not self._closed:
+                if self._deadline is None:
+                    self._cond.wait()
+                    continue
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                try:
+                    self._flush_locked()
+                except Exception as e:
+                    # z.B. Client getrennt: beim naechsten write() im Haupt-Thread melden
+                    self._error = e
+                    self._pending = []
+                    self._pending_size = 0
+                    return
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Cache der Kompressor-Zusammenfassungen (compress-context.py).
+
+Derselbe Gespraechsanfang wird oft mehrfach komprimiert: nach einem
+Neu-Generieren, das den Verlauf kuerzt, nach dem Laden einer Sitzung oder
+wenn zwei Tabs dieselbe Sitzung bearbeiten. Schluessel ist ein SHA-256 ueber
+
+    System-Prompt, Vorlage, Anbieter, Modell, normalisierter Konversationstext
+
+(Text aus build_conversation_text(); Zeilenenden vereinheitlicht,
+Leerraum am Zeilenende entfernt). Ein Treffer kommt ohne LLM-Aufruf zurueck.
+
+Das Verzeichnis KOMPRESSOR_DIR ist damit ein indizierter Cache
+(llmchat.diskcache: <key[:2]>/<key>.bin mit Metadaten Anbieter, Modell,
+Anzahl Nachrichten) mit LRU-Verdraengung statt einer stetig wachsenden
+Sammlung von kompressor_<Zeitstempel>.txt-Dateien.
+
+Einstellungen (Umgebungsvariablen):
+
+  LLMCHAT_SUMMARY_CACHE=0               Cache ausschalten (Vorgabe: an)
+  LLMCHAT_SUMMARY_CACHE_TTL=2592000     Lebensdauer eines Eintrags (30 Tage)
+  LLMCHAT_SUMMARY_CACHE_MAX_MB=50       Groessengrenze (LRU-Verdraengung)
+
+Zaehler: GET /cgi-bin/cache-stats.py (summaries)
+"""
+
+from llmchat.config import KOMPRESSOR_DIR, env_bool, env_int
+from llmchat.diskcache import DiskCache, make_key
+
+ENABLED = env_bool('LLMCHAT_SUMMARY_CACHE', True)
+TTL = env_int('LLMCHAT_SUMMARY_CACHE_TTL', 30 * 86400)
+MAX_BYTES = env_int('LLMCHAT_SUMMARY_CACHE_MAX_MB', 50) * 1024 * 1024
+
+cache = DiskCache(KOMPRESSOR_DIR, MAX_BYTES, ttl=TTL)
+
+
+def normalize(text):
+    """Konversationstext ohne bedeutungslose Leerraum-Unterschiede."""
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip()
+
+
+def cache_key(system_prompt, template, service, model, conversation_text):
+    if not ENABLED:
+        return None
+    return make_key('summary', system_prompt, template, service, model,
+                    normalize(conversation_text))
+
+
+def lookup(key):
+    """Gespeicherte Zusammenfassung (str) oder None."""
+    if key is None:
+        return None
+    data = cache.get(key)
+    return None if data is None else data.decode('utf-8')
+
+
+def store(key, summary, meta=None):
+    if key is None or not summary:
+        return False
+    return cache.put(key, summary.encode('utf-8'), meta=meta)
+
+
+def stats():
+    result = cache.stats()
+    result['enabled'] = ENABLED
+    return result
@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+"""
+Token-Zaehlung mit echten BPE-Vokabularen (statt 0,25 Token pro Zeichen).
+
+index.html schaetzt bisher content.length * 0.25. Quelltext, deutscher Text
+und Base64 werden damit deutlich falsch gezaehlt: der Kompressor greift zu
+frueh oder der Anbieter meldet context_exceeded. Dieses Modul zaehlt mit dem
+Byte-Level-BPE-Verfahren der Anbieter (tiktoken-kompatibel):
+
+  1. Vor-Zerlegung des Textes per Regex (Woerter, Zahlen, Satzzeichen, Leerraum)
+  2. je Stueck: Byte-Paare nach Rang zusammenfassen, bis keine Regel mehr greift
+
+Vokabulare (nicht im Repository, install.sh laedt sie nach TOKENIZER_DIR):
+
+  o200k_base.tiktoken   GPT-4o, GPT-4.1, GPT-5, o-Serie
+  cl100k_base.tiktoken  GPT-4, GPT-3.5 (und Rueckfall fuer andere Familien)
+  llama3.tiktoken       Llama 3 (tokenizer.model von Meta, gleiches Format)
+  deepseek.json         DeepSeek (tokenizer.json von Hugging Face)
+  qwen2.json            Qwen 2/2.5 (tokenizer.json von Hugging Face)
+
+Beim ersten Zugriff wird jedes Vokabular einmalig in eine kompakte
+Binaerdatei <name>.bin uebersetzt (Hash-Tabelle Byte-Folge -> Rang) und
+danach nur noch per mmap eingeblendet: kein Parsen von 200.000 Zeilen pro
+CGI-Prozess, und alle Prozesse teilen sich dieselben Seiten im Page-Cache.
+Familien ohne eigenes Vokabular (z.B. Gemini, SentencePiece) werden mit
+o200k_base gezaehlt und als approximate gemeldet; ist gar kein Vokabular
+vorhanden, bleibt es bei der Schaetzung (method: estimate).
+
+Die Vor-Zerlegung bildet die offiziellen Muster mit dem re-Modul der
+Standardbibliothek nach (kein \\p{L}); Abweichungen betreffen nur seltene
+Unicode-Ziffern und Kombinationszeichen. Vokabulare aus tokenizer.json
+(DeepSeek, Qwen) werden mit dieser cl100k-Vor-Zerlegung und der Token-ID
+als Rang gezaehlt - eine Naeherung, daher ebenfalls approximate. Die
+Vorpruefung der Proxies lehnt nur bei exakter Zaehlung ab und laesst auch
+dann PREFLIGHT_MARGIN Luft fuer die nachgebildeten Muster.
+
+    enc = tokens.for_model('gpt-4o')
+    enc.count('Hallo Welt')                   # -> int
+    tokens.count_messages('gpt-4o', messages) # inkl. Nachrichten-Overhead
+"""
+
+import base64
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import zlib
+from array import array
+
+from llmchat.config import TOKENIZER_DIR
+
+# Wie TOKENS_PER_CHAR in index.html (Rueckfall ohne Vokabular)
+ESTIMATE_TOKENS_PER_CHAR = 0.25
+
+# Zuschlag pro Nachricht (Rolle, Trenner) und fuer den Antwort-Beginn
+TOKENS_PER_MESSAGE = 3
+TOKENS_REPLY_PRIMING = 3
+
+# Vorpruefung der Proxies erst ab diesem Anteil der Schaetzung am Limit
+PREFLIGHT_RATIO = 0.8
+# Ablehnen (400) erst oberhalb limit * (1 + PREFLIGHT_MARGIN); darunter entscheidet der Anbieter
+PREFLIGHT_MARGIN = 0.02
+
+# Modell-Praefix -> Vokabular (erster Treffer gilt)
+MODEL_ENCODINGS = (
+    ('gpt-4o', 'o200k_base'),
+    ('gpt-4.1', 'o200k_base'),
+    ('gpt-4.5', 'o200k_base'),
+    ('gpt-5', 'o200k_base'),
+    ('chatgpt', 'o200k_base'),
+    ('o1', 'o200k_base'),
+    ('o3', 'o200k_base'),
+    ('o4', 'o200k_base'),
+    ('gpt-4', 'cl100k_base'),
+    ('gpt-3.5', 'cl100k_base'),
+    ('deepseek', 'deepseek'),
+    ('meta-llama/llama-3', 'llama3'),
+    ('meta-llama/llama-4', 'llama3'),
+    ('llama-3', 'llama3'),
+    ('llama3', 'llama3'),
+    ('llama-4', 'llama3'),
+    ('qwen/', 'qwen2'),
+    ('qwen', 'qwen2'),
+)
+FALLBACK_ENCODINGS = ('o200k_base', 'cl100k_base')
+
+# Vor-Zerlegung (Nachbildung von cl100k_base / o200k_base)
+_CONTRACTIONS = r"(?i:'s|'t|'re|'ve|'m|'ll|'d)"
+_CL100K_PATTERN = re.compile(
+    _CONTRACTIONS + r"|(?:_|[^\w\r\n])?[^\W\d_]+|\d{1,3}| ?(?:_|[^\s\w])+[\r\n]*"
+    r"|\s*[\r\n]+|\s+(?!\S)|\s+")
+_O200K_PATTERN = re.compile(
+    r"(?:_|[^\w\r\n])?[^\W\d_]+" + _CONTRACTIONS + r"?|\d{1,3}| ?(?:_|[^\s\w])+[\r\n/]*"
+    r"|\s*[\r\n]+|\s+(?!\S)|\s+")
+
+_MAGIC = b'LLMTOK01'
+_HEADER = struct.Struct('=8sIIII')   # magic, Token, Slots, Blob-Groesse, reserviert
+_NO_RANK = 1 << 62
+_PIECE_CACHE_SIZE = 65536
+
+_encodings = {}
+_lock = threading.Lock()
+
+
+# =============================================================================
+# VOKABULAR LADEN / UEBERSETZEN
+# =============================================================================
+def _bytes_to_unicode():
+    """Byte-Level-Zuordnung von GPT-2 / Hugging Face (Zeichen -> Byte)."""
+    printable = (list(range(ord('!'), ord('~') + 1)) + list(range(ord('¡'), ord('¬') + 1))
+                 + list(range(ord('®'), ord('ÿ') + 1)))
+    chars = printable[:]
+    n = 0
+    for b in range(256):
+        if b not in printable:
+            printable.append(b)
+            chars.append(256 + n)
+            n += 1
+    return {chr(c): b for b, c in zip(printable, chars)}
+
+
+def _read_tiktoken(path):
+    """<base64-Token> <Rang> pro Zeile (tiktoken, Llama 3 tokenizer.model)."""
+    ranks = {}
+    with open(path, 'rb') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2:
+                ranks[base64.b64decode(parts[0])] = int(parts[1])
+    return ranks
+
+
+def _read_hf_json(path):
+    """tokenizer.json (Byte-Level-BPE): Rang = Token-ID."""
+    with open(path, 'r', encoding='utf-8') as f:
+        model = json.load(f).get('model', {})
+    byte_of = _bytes_to_unicode()
+    ranks = {}
+    for token, rank in model.get('vocab', {}).items():
+        try:
+            ranks[bytes(byte_of[ch] for ch in token)] = rank
+        except KeyError:
+            continue  # Spezial-Token (<|...|>) sind keine Byte-Folgen
+    return ranks
+
+
+def _compile(ranks):
+    """Rangtabelle -> Binaerformat (Offsets, Raenge, Hash-Slots, Byte-Blob)."""
+    tokens = list(ranks.items())
+    n_slots = 1
+    while n_slots < len(tokens) * 2:
+        n_slots <<= 1
+    mask = n_slots - 1
+    offsets = array('I', [0])
+    rank_table = array('I')
+    slots = array('I', bytes(4 * n_slots))
+    blob = bytearray()
+    for index, (token, rank) in enumerate(tokens):
+        blob += token
+        offsets.append(len(blob))
+        rank_table.append(rank)
+        slot = zlib.crc32(token) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = index + 1
+    header = _HEADER.pack(_MAGIC, len(tokens), n_slots, len(blob), 0)
+    return b''.join((header, offsets.tobytes(), rank_table.tobytes(), slots.tobytes(), bytes(blob)))
+
+
+def _source_path(name):
+    for suffix in ('.tiktoken', '.json'):
+        path = os.path.join(TOKENIZER_DIR, name + suffix)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _load_table(name):
+    """Binaertabelle (mmap oder bytes) eines Vokabulars oder None."""
+    source = _source_path(name)
+    compiled = os.path.join(TOKENIZER_DIR, name + '.bin')
+    try:
+        fresh = source is None or os.path.getmtime(compiled) >= os.path.getmtime(source)
+    except OSError:
+        fresh = False
+    if not fresh:
+        if source is None:
+            return None
+        ranks = _read_hf_json(source) if source.endswith('.json') else _read_tiktoken(source)
+        data = _compile(ranks)
+        try:
+            fd, tmp = tempfile.mkstemp(dir=TOKENIZER_DIR, prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, compiled)
+        except OSError:
+            return data  # Verzeichnis nicht beschreibbar: im Speicher verwenden
+    try:
+        with open(compiled, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+
+# =============================================================================
+# ENCODING
+# =============================================================================
+class Encoding:
+    """Byte-Level-BPE auf einer per mmap eingeblendeten Rangtabelle."""
+
+    def __init__(self, name, table, approximate=False):
+        magic, n_tokens, n_slots, blob_size, _ = _HEADER.unpack_from(table, 0)
+        if magic != _MAGIC:
+            raise ValueError(f'{name}: unbekanntes Tabellenformat')
+        self.name = name
+        self.size = n_tokens
+        self.approximate = approximate
+        self._table = table
+        view = memoryview(table)
+        pos = _HEADER.size
+        self._offsets = view[pos:pos + 4 * (n_tokens + 1)].cast('I')
+        pos += 4 * (n_tokens + 1)
+        self._ranks = view[pos:pos + 4 * n_tokens].cast('I')
+        pos += 4 * n_tokens
+        self._slots = view[pos:pos + 4 * n_slots].cast('I')
+        self._blob = pos + 4 * n_slots
+        self._mask = n_slots - 1
+        self._pattern = _O200K_PATTERN if name.startswith('o200k') else _CL100K_PATTERN
+        self._split_case = name.startswith('o200k')
+        self._cache = {}
+
+    def rank(self, token):
+        """Rang einer Byte-Folge oder None."""
+        slots, offsets, table, blob = self._slots, self._offsets, self._table, self._blob
+        mask = self._mask
+        slot = zlib.crc32(token) & mask
+        while True:
+            index = slots[slot]
+            if not index:
+                return None
+            index -= 1
+            if table[blob + offsets[index]:blob + offsets[index + 1]] == token:
+                return self._ranks[index]
+            slot = (slot + 1) & mask
+
+    def _bpe_count(self, piece):
+        """Anzahl Token eines Stuecks (Zusammenfassung wie tiktoken)."""
+        rank = self.rank
+        if len(piece) == 1 or rank(piece) is not None:
+            return 1
+        # parts: (Startposition, Rang des Paares ab hier)
+        parts = []
+        for i in range(len(piece) - 1):
+            r = rank(piece[i:i + 2])
+            parts.append([i, _NO_RANK if r is None else r])
+        parts.append([len(piece) - 1, _NO_RANK])
+        parts.append([len(piece), _NO_RANK])
+
+        def pair_rank(i):
+            if i + 3 < len(parts):
+                r = rank(piece[parts[i][0]:parts[i + 3][0]])
+                if r is not None:
+                    return r
+            return _NO_RANK
+
+        while len(parts) > 1:
+            min_rank, min_i = _NO_RANK, -1
+            for i in range(len(parts) - 1):
+                if parts[i][1] < min_rank:
+                    min_rank, min_i = parts[i][1], i
+            if min_i < 0:
+                break
+            parts[min_i][1] = pair_rank(min_i)
+            if min_i > 0:
+                parts[min_i - 1][1] = pair_rank(min_i - 1)
+            del parts[min_i + 1]
+        return len(parts) - 1
+
+    def _pieces(self, text):
+        for match in self._pattern.finditer(text):
+            piece = match.group()
+            if self._split_case and not piece.islower() and not piece.isupper():
+                yield from _case_pieces(piece)
+            else:
+                yield piece
+
+    def count(self, text):
+        """Anzahl Token eines Textes."""
+        if not text:
+            return 0
+        cache = self._cache
+        total = 0
+        for piece in self._pieces(text):
+            n = cache.get(piece)
+            if n is None:
+                n = self._bpe_count(piece.encode('utf-8'))
+                if len(cache) >= _PIECE_CACHE_SIZE:
+                    cache.clear()
+                cache[piece] = n
+            total += n
+        return total
+
+
+def _case_pieces(piece):
+    """o200k: Grossbuchstabe nach Kleinbuchstabe beginnt ein neues Stueck (CamelCase)."""
+    start = 0
+    for i in range(1, len(piece)):
+        if piece[i].isupper() and piece[i - 1].islower():
+            yield piece[start:i]
+            start = i
+    yield piece[start:]
+
+
+def get_encoding(name):
+    """Encoding nach Vokabular-Name oder None (kein Vokabular vorhanden)."""
+    encoding = _encodings.get(name)
+    if encoding is not None or name in _encodings:
+        return encoding
+    with _lock:
+        if name not in _encodings:
+            table = _load_table(name)
+            # tokenizer.json (oder nur noch <name>.bin unbekannter Herkunft): Naeherung
+            source = _source_path(name)
+            approximate = source is None or source.endswith('.json')
+            _encodings[name] = Encoding(name, table, approximate) if table is not None else None
+        return _encodings[name]
+
+
+def encoding_name(model):
+    model = (model or '').lower()
+    for prefix, name in MODEL_ENCODINGS:
+        if model.startswith(prefix) or ('/' + prefix) in model:
+            return name
+    return None
+
+
+def for_model(model):
+    """(Encoding oder None, approximate) fuer einen Modellnamen."""
+    name = encoding_name(model)
+    if name is not None:
+        encoding = get_encoding(name)
+        if encoding is not None:
+            return encoding, encoding.approximate
+    for fallback in FALLBACK_ENCODINGS:
+        encoding = get_encoding(fallback)
+        if encoding is not None:
+            return encoding, True
+    return None, True
+
+
+# =============================================================================
+# ZAEHLEN
+# =============================================================================
+def content_text(content):
+    """Text einer Nachricht (String oder multimodales Array)."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return ' '.join(item.get('text', '') for item in content
+                        if isinstance(item, dict) and item.get('type') == 'text')
+    return '' if content is None else str(content)
+
+
+def count_texts(model, texts):
+    """Zaehlt mehrere Texte; liefert (counts, info)."""
+    encoding, approximate = for_model(model)
+    if encoding is None:
+        counts = [int(len(text) * ESTIMATE_TOKENS_PER_CHAR + 0.999) for text in texts]
+        return counts, {'method': 'estimate', 'encoding': None, 'approximate': True}
+    counts = [encoding.count(text) for text in texts]
+    return counts, {'method': 'bpe', 'encoding': encoding.name, 'approximate': approximate}
+
+
+def count_messages(model, messages):
+    """Token einer Nachrichtenliste inkl. Overhead; liefert (total, counts, info)."""
+    texts = [content_text(msg.get('content')) if isinstance(msg, dict) else '' for msg in messages]
+    counts, info = count_texts(model, texts)
+    total = sum(counts) + TOKENS_PER_MESSAGE * len(counts) + TOKENS_REPLY_PRIMING
+    return total, counts, info
+
+
+# =============================================================================
+# VORPRUEFUNG DER PROXIES
+# =============================================================================
+class ContextExceeded(Exception):
+    """Nachrichten passen nicht ins Kontextfenster; Proxy antwortet mit 400."""
+
+    def __init__(self, total, limit, encoding):
+        super().__init__(f'Kontextfenster ueberschritten: {total} von {limit} Token')
+        self.total = total
+        self.limit = limit
+        self.encoding = encoding
+
+    def data(self):
+        return {'error': str(self), 'error_type': 'context_exceeded',
+                'tokens': self.total, 'limit': self.limit, 'encoding': self.encoding}
+
+
+def preflight(model, messages, limit):
+    """Zaehlt vor dem Weiterleiten, wenn die Schaetzung nahe an limit liegt.
+
+    limit ist max_context_tokens aus der Anfrage (MODEL_CONFIG in index.html).
+    Wirft ContextExceeded nur bei exakter Zaehlung mit dem Vokabular des
+    Modells und mehr als PREFLIGHT_MARGIN ueber limit; Schaetzungen,
+    Ersatz-Vokabulare und tokenizer.json-Vokabulare blockieren nie.
+    """
+    if not isinstance(limit, int) or isinstance(limit, bool) or limit <= 0:
+        return None
+    chars = sum(len(content_text(msg.get('content'))) for msg in messages if isinstance(msg, dict))
+    if chars * ESTIMATE_TOKENS_PER_CHAR < limit * PREFLIGHT_RATIO:
+        return None
+    total, _, info = count_messages(model, messages)
+    if total > limit * (1 + PREFLIGHT_MARGIN) and not info['approximate']:
+        raise ContextExceeded(total, limit, info['encoding'])
+    return total
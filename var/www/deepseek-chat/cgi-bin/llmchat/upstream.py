@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+Gemeinsamer Upstream-HTTP-Client mit Keep-Alive-Verbindungspool.
+
+Ersetzt urllib.request.urlopen() in allen Proxies und im Kompressor.
+Pro Host (api.deepseek.com, api.openai.com, ...) werden offene
+TLS-Verbindungen in einem Pool gehalten und fuer die naechste Anfrage
+wiederverwendet; muss doch neu verbunden werden, wird die letzte
+TLS-Session des Hosts wiederaufgenommen (abgekuerzter Handshake).
+
+Schnittstelle kompatibel zu urllib:
+
+    response = upstream.urlopen(req, timeout=60)   # req: urllib.request.Request
+
+  - HTTP-Status >= 400  -> urllib.error.HTTPError (e.code, e.read())
+  - Verbindungsfehler   -> urllib.error.URLError  (e.reason)
+  - Rueckgabe iterierbar (Zeilen), read(), read1(), Context-Manager
+
+Zeitlimits (Sekunden, per Umgebungsvariable einstellbar):
+
+  LLMCHAT_UPSTREAM_CONNECT_TIMEOUT   TCP- + TLS-Verbindungsaufbau   (10)
+  timeout-Argument von urlopen()     bis zum ersten Antwort-Byte    (Aufrufer)
+  LLMCHAT_UPSTREAM_READ_TIMEOUT      max. Pause zwischen zwei Chunks (120)
+  LLMCHAT_UPSTREAM_IDLE_TIMEOUT      max. Ruhezeit im Pool          (60)
+  LLMCHAT_UPSTREAM_POOL_SIZE         max. freie Verbindungen je Host (8)
+
+Der Pool lebt pro Prozess. Im klassischen CGI-Betrieb (ein Prozess pro
+Anfrage) gibt es daher keine Wiederverwendung; der volle Nutzen ergibt
+sich im Applikationsserver (llmchat.server).
+"""
+
+import http.client
+import os
+import socket
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from llmchat.config import env_float, env_int
+
+CONNECT_TIMEOUT = env_float('LLMCHAT_UPSTREAM_CONNECT_TIMEOUT', 10.0)
+READ_TIMEOUT = env_float('LLMCHAT_UPSTREAM_READ_TIMEOUT', 120.0)
+IDLE_TIMEOUT = env_float('LLMCHAT_UPSTREAM_IDLE_TIMEOUT', 60.0)
+POOL_SIZE = env_int('LLMCHAT_UPSTREAM_POOL_SIZE', 8)
+
+
+class _PooledHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPS-Verbindung, die TLS-Sessions des Pools wiederaufnimmt."""
+
+    def __init__(self, host, port, pool, connect_timeout):
+        super().__init__(host, port, timeout=connect_timeout, context=pool.ssl_context)
+        self._pool = pool
+        self._key = ('https', host, port)
+
+    def connect(self):
+        sock = socket.create_connection((self.host, self.port), self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        session = self._pool.tls_session(self._key)
+        try:
+            self.sock = self._context.wrap_socket(sock, server_hostname=self.host, session=session)
+        except Exception:
+            sock.close()
+            raise
+        self._pool.remember_tls_session(self._key, self.sock)
+
+
+class _PooledHTTPConnection(http.client.HTTPConnection):
+    def connect(self):
+        super().connect()
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class UpstreamResponse:
+    """Antwort eines Upstream-Requests; gibt die Verbindung nach vollstaendigem
+    Lesen an den Pool zurueck, bei vorzeitigem close() wird sie verworfen."""
+
+    def __init__(self, pool, key, conn, sock, response, url):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._sock = sock
+        self._response = response
+        self.url = url
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+
+    # --- urllib-kompatible Lesefunktionen ----------------------------------
+    def read(self, amt=None):
+        data = self._response.read(amt)
+        self._release_if_done()
+        return data
+
+    def read1(self, amt=-1):
+        data = self._response.read1(amt)
+        self._release_if_done()
+        return data
+
+    def readline(self, limit=-1):
+        line = self._response.readline(limit)
+        self._release_if_done()
+        return line
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+    def getcode(self):
+        return self.status
+
+    def fileno(self):
+        return self._conn.sock.fileno() if self._conn and self._conn.sock else -1
+
+    def close(self):
+        if self._conn is None:
+            return
+        if self._body_complete():
+            self._release_if_done()
+        else:
+            # Body nicht vollstaendig gelesen: Verbindung ist nicht wiederverwendbar
+            self._response.close()
+            self._conn.close()
+            self._pool.count('discarded')
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _body_complete(self):
+        # readline() schliesst bei Content-Length-Antworten nicht selbst ab
+        response = self._response
+        return response.isclosed() or (not response.chunked and response.length == 0)
+
+    def _release_if_done(self):
+        if self._conn is not None and self._body_complete():
+            conn, self._conn = self._conn, None
+            if isinstance(self._sock, ssl.SSLSocket):
+                self._pool.update_tls_session(self._key, self._sock)
+            self._response.close()
+            if self._response.will_close:
+                conn.close()
+            else:
+                self._pool.release(self._key, conn)
+
+
+class UpstreamPool:
+    """Verbindungspool je (Schema, Host, Port) mit Zaehlern."""
+
+    def __init__(self, pool_size=POOL_SIZE, idle_timeout=IDLE_TIMEOUT,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.ssl_context = ssl.create_default_context()
+        self._idle = {}
+        self._tls_sessions = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'pool_hits': 0,
+            'pool_misses': 0,
+            'tls_resumed': 0,
+            'tls_full_handshakes': 0,
+            'retries': 0,
+            'expired': 0,
+            'discarded': 0,
+            'errors': 0,
+        }
+
+    # --- Zaehler -------------------------------------------------------------
+    def count(self, name, n=1):
+        with self._lock:
+            self._stats[name] = self._stats.get(name, 0) + n
+
+    def stats(self):
+        with self._lock:
+            result = dict(self._stats)
+            result['idle_connections'] = {
+                f'{k[0]}://{k[1]}:{k[2]}': len(v) for k, v in self._idle.items() if v
+            }
+        result['pid'] = os.getpid()
+        return result
+
+    # --- TLS-Sessions --------------------------------------------------------
+    def tls_session(self, key):
+        with self._lock:
+            return self._tls_sessions.get(key)
+
+    def remember_tls_session(self, key, sslsock):
+        self.count('tls_resumed' if sslsock.session_reused else 'tls_full_handshakes')
+        self.update_tls_session(key, sslsock)
+
+    def update_tls_session(self, key, sslsock):
+        # TLS 1.3: Session-Tickets kommen erst nach dem Handshake, daher
+        # auch nach jeder Antwort erneut uebernehmen
+        session = getattr(sslsock, 'session', None)
+        if session is not None:
+            with self._lock:
+                self._tls_sessions[key] = session
+
+    # --- Verbindungen --------------------------------------------------------
+    def _acquire(self, key):
+        """Liefert (conn, reused). Abgelaufene Verbindungen werden geschlossen."""
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, last_used = idle.pop()
+                if now - last_used <= self.idle_timeout and conn.sock is not None:
+                    self._stats['pool_hits'] += 1
+                    return conn, True
+                self._stats['expired'] += 1
+                conn.close()
+            self._stats['pool_misses'] += 1
+        scheme, host, port = key
+        if scheme == 'https':
+            conn = _PooledHTTPSConnection(host, port, self, self.connect_timeout)
+        else:
+            conn = _PooledHTTPConnection(host, port, timeout=self.connect_timeout)
+        return conn, False
+
+    def release(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.pool_size and conn.sock is not None:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn, _ in conns:
+                conn.close()
+
+    # --- Requests ------------------------------------------------------------
+    def request(self, method, url, body=None, headers=None, timeout=60, read_timeout=None):
+        """Fuehrt einen Request aus; timeout = Zeitlimit bis zum ersten Byte."""
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ('http', 'https'):
+            raise urllib.error.URLError(f'Nicht unterstuetztes Schema: {scheme}')
+        port = parts.port or (443 if scheme == 'https' else 80)
+        key = (scheme, parts.hostname, port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        read_timeout = self.read_timeout if read_timeout is None else read_timeout
+        self.count('requests')
+
+        for attempt in (1, 2):
+            conn, reused = self._acquire(key)
+            try:
+                if conn.sock is None:
+                    conn.connect()
+                sock = conn.sock
+                sock.settimeout(timeout)
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError,
+                    BrokenPipeError, http.client.BadStatusLine) as e:
+                conn.close()
+                if reused and attempt == 1:
+                    # Server hat die ruhende Verbindung inzwischen geschlossen
+                    self.count('retries')
+                    continue
+                self.count('errors')
+                raise urllib.error.URLError(e)
+            except socket.timeout:
+                conn.close()
+                self.count('errors')
+                raise urllib.error.URLError('timed out')
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                self.count('errors')
+                raise urllib.error.URLError(e)
+            break
+
+        # Ab dem ersten Byte gilt das Idle-Limit zwischen zwei Chunks
+        sock.settimeout(read_timeout)
+        if isinstance(sock, ssl.SSLSocket):
+            self.update_tls_session(key, sock)
+        result = UpstreamResponse(self, key, conn, sock, response, url)
+        if response.status >= 400:
+            try:
+                error_body = result.read()
+            except (OSError, http.client.HTTPException):
+                error_body = b''
+            result.close()
+            raise urllib.error.HTTPError(url, response.status, response.reason,
+                                         response.headers, _BytesFile(error_body))
+        return result
+
+
+class _BytesFile:
+    """Minimales fp fuer HTTPError (read() liefert den Fehler-Body)."""
+
+    def __init__(self, data):
+        self._data = data
+
+    def read(self, amt=None):
+        data, self._data = self._data, b''
+        return data
+
+    def readline(self, limit=-1):
+        return self.read()
+
+    def close(self):
+        pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Prozessweiter Pool (von allen fuenf Proxies und dem Kompressor geteilt)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = UpstreamPool()
+    return _pool
+
+
+def _uses_http_proxy(url):
+    return bool(urllib.request.getproxies()) and not urllib.request.proxy_bypass(
+        urllib.parse.urlsplit(url).hostname or '')
+
+
+def urlopen(req, timeout=60):
+    """Ersatz fuer urllib.request.urlopen() mit Verbindungspool."""
+    if isinstance(req, str):
+        req = urllib.request.Request(req)
+    url = req.full_url
+    if _uses_http_proxy(url):
+        # Ausgehender HTTP-Proxy konfiguriert: klassischer urllib-Weg
+        return urllib.request.urlopen(req, timeout=timeout)
+    headers = dict(req.header_items())
+    return get_pool().request(req.get_method(), url, body=req.data,
+                              headers=headers, timeout=timeout)
+
+
+def stats():
+    return get_pool().stats()
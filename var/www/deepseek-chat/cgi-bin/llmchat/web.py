@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+Request/Response-Abstraktion fuer die CGI-Scripts.
+
+Jedes Script implementiert einen Handler handle(req, resp). Der Handler
+liest die Anfrage ausschliesslich ueber das Request-Objekt und schreibt
+die Antwort ausschliesslich ueber das Response-Objekt. Dadurch laeuft
+derselbe Code
+
+  - als klassisches CGI-Script unter mod_cgi   (run_cgi)
+  - im langlebigen WSGI-Applikationsserver     (llmchat.server)
+
+ohne Aenderung. Streaming-Antworten (SSE) funktionieren in beiden
+Betriebsarten, da write()/flush() die Daten sofort weiterreichen.
+"""
+
+import email.utils
+import hashlib
+import json
+import os
+import sys
+import urllib.parse
+from http import HTTPStatus
+
+
+class Request:
+    """Eingehende HTTP-Anfrage (unabhaengig von CGI oder WSGI)."""
+
+    def __init__(self, method, path='', query_string='', headers=None,
+                 body=b'', remote_addr='unknown', uri=None):
+        self.method = (method or '').upper()
+        self.path = path
+        self.query_string = query_string or ''
+        self.headers = headers or {}
+        self.body = body or b''
+        self.remote_addr = remote_addr or 'unknown'
+        self.uri = uri or path
+        self._query = None
+
+    def header(self, name, default=None):
+        """Liefert einen Request-Header (Gross-/Kleinschreibung egal)."""
+        return self.headers.get(name.lower(), default)
+
+    @property
+    def query(self):
+        """Query-Parameter als dict (jeweils erster Wert)."""
+        if self._query is None:
+            parsed = urllib.parse.parse_qs(self.query_string, keep_blank_values=True)
+            self._query = {k: v[0] for k, v in parsed.items()}
+        return self._query
+
+    @property
+    def content_length(self):
+        return len(self.body)
+
+    def text(self):
+        return self.body.decode('utf-8')
+
+    def json(self):
+        """Dekodiert den Body als JSON (wirft json.JSONDecodeError)."""
+        return json.loads(self.text())
+
+
+class Response:
+    """Basisklasse der Antwort. Unterklassen implementieren _start/_write/_flush."""
+
+    def __init__(self):
+        self.started = False
+        self.status = None
+
+    def start(self, status_code, headers):
+        """Sendet Status und Header. headers: Liste von (Name, Wert)."""
+        if self.started:
+            raise RuntimeError('Response bereits gestartet')
+        self.started = True
+        self.status = status_code
+        self._start(status_code, list(headers))
+
+    def write(self, data):
+        """Schreibt Body-Daten (str wird als UTF-8 kodiert)."""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if data:
+            self._write(data)
+
+    def flush(self):
+        self._flush()
+
+    def _start(self, status_code, headers):
+        raise NotImplementedError
+
+    def _write(self, data):
+        raise NotImplementedError
+
+    def _flush(self):
+        pass
+
+
+def status_line(status_code):
+    """'200' -> '200 OK' (Reason-Phrase fuer WSGI und CGI)."""
+    try:
+        return f'{status_code} {HTTPStatus(int(status_code)).phrase}'
+    except ValueError:
+        return f'{status_code} Unknown'
+
+
+class CGIResponse(Response):
+    """Schreibt die Antwort im CGI-Format auf stdout."""
+
+    def __init__(self, stream=None):
+        super().__init__()
+        self.stream = stream or sys.stdout.buffer
+
+    def _start(self, status_code, headers):
+        head = f'Status: {status_line(status_code)}\r\n'
+        for name, value in headers:
+            head += f'{name}: {value}\r\n'
+        head += '\r\n'
+        self.stream.write(head.encode('utf-8'))
+
+    def _write(self, data):
+        self.stream.write(data)
+
+    def _flush(self):
+        self.stream.flush()
+
+
+class WSGIResponse(Response):
+    """Leitet die Antwort ueber start_response() und dessen write() weiter."""
+
+    def __init__(self, start_response):
+        super().__init__()
+        self._start_response = start_response
+        self._wsgi_write = None
+
+    def _start(self, status_code, headers):
+        self._wsgi_write = self._start_response(
+            status_line(status_code),
+            [(str(n), str(v)) for n, v in headers]
+        )
+
+    def _write(self, data):
+        self._wsgi_write(data)
+
+
+# =============================================================================
+# GEMEINSAME ANTWORT-HELFER
+# =============================================================================
+def cors_headers(methods='POST, OPTIONS'):
+    """CORS-Header wie bisher in jedem Script einzeln gesetzt."""
+    return [
+        ('Access-Control-Allow-Origin', '*'),
+        ('Access-Control-Allow-Methods', methods),
+        ('Access-Control-Allow-Headers', 'Content-Type'),
+    ]
+
+
+def send_json(resp, status_code, data, methods='POST, OPTIONS', extra_headers=None):
+    """Sendet eine vollstaendige JSON-Antwort."""
+    body = (json.dumps(data, ensure_ascii=False) + '\n').encode('utf-8')
+    headers = [('Content-Type', 'application/json')] + cors_headers(methods)
+    if extra_headers:
+        headers += list(extra_headers)
+    resp.start(status_code, headers)
+    resp.write(body)
+    resp.flush()
+
+
+def start_sse(resp, methods='POST, OPTIONS'):
+    """Sendet die Header einer Server-Sent-Events-Antwort."""
+    resp.start(200, [('Content-Type', 'text/event-stream')] + cors_headers(methods) + [
+        ('Cache-Control', 'no-cache'),
+        ('X-Accel-Buffering', 'no'),
+    ])
+    resp.flush()
+
+
+# =============================================================================
+# BEDINGTE ANFRAGEN (ETag / If-None-Match, Last-Modified / If-Modified-Since)
+# =============================================================================
+def etag(*parts):
+    """Schwaches ETag aus Versionsmerkmalen und Anfrage-Parametern.
+
+    Schwach (W/), weil die Antwort nur inhaltlich gleich ist: mod_deflate
+    komprimiert, JSON-Leerraum ist nicht zugesichert.
+    """
+    digest = hashlib.blake2b('\x1f'.join(map(str, parts)).encode('utf-8'), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _opaque(tag):
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def not_modified(req, tag, last_modified=None):
+    """True, wenn der Client diese Version schon hat.
+
+    If-None-Match (schwacher Vergleich) hat Vorrang; If-Modified-Since gilt
+    nur ohne If-None-Match und nur mit last_modified (Sekunden-Genauigkeit).
+    """
+    if_none_match = req.header('if-none-match')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*':
+            return True
+        return _opaque(tag) in {_opaque(candidate) for candidate in if_none_match.split(',')}
+    if_modified_since = req.header('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        parsed = email.utils.parsedate_tz(if_modified_since)
+        if parsed is not None:
+            return int(last_modified) <= email.utils.mktime_tz(parsed)
+    return False
+
+
+def cache_headers(tag, last_modified=None):
+    """ETag, Last-Modified und no-cache: der Browser speichert, fragt aber jedes Mal nach."""
+    headers = [('ETag', tag), ('Cache-Control', 'no-cache')]
+    if last_modified is not None:
+        headers.append(('Last-Modified', email.utils.formatdate(last_modified, usegmt=True)))
+    return headers
+
+
+def send_not_modified(resp, tag, last_modified=None, methods='GET, OPTIONS'):
+    """304 Not Modified, ohne Body."""
+    resp.start(304, cors_headers(methods) + cache_headers(tag, last_modified))
+    resp.flush()
+
+
+# =============================================================================
+# CGI-BETRIEB
+# =============================================================================
+def request_from_cgi(environ=None, stdin=None):
+    """Baut ein Request-Objekt aus der CGI-Umgebung."""
+    environ = os.environ if environ is None else environ
+    stdin = stdin or sys.stdin.buffer
+    try:
+        content_length = int(environ.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        content_length = 0
+    body = stdin.read(content_length) if content_length > 0 else b''
+    headers = {}
+    for key, value in environ.items():
+        if key.startswith('HTTP_'):
+            headers[key[5:].replace('_', '-').lower()] = value
+    if environ.get('CONTENT_TYPE'):
+        headers['content-type'] = environ['CONTENT_TYPE']
+    return Request(
+        method=environ.get('REQUEST_METHOD', ''),
+        path=environ.get('SCRIPT_NAME', ''),
+        query_string=environ.get('QUERY_STRING', ''),
+        headers=headers,
+        body=body,
+        remote_addr=environ.get('REMOTE_ADDR', 'unknown'),
+        uri=environ.get('REQUEST_URI', 'unknown'),
+    )
+
+
+def run_cgi(handler):
+    """Fuehrt einen Handler als klassisches CGI-Script aus."""
+    req = request_from_cgi()
+    resp = CGIResponse()
+    try:
+        handler(req, resp)
+    except BrokenPipeError:
+        # Client hat die Verbindung geschlossen
+        pass
+    except Exception as e:
+        if not resp.started:
+            send_json(resp, 500, {'error': 'Interner Serverfehler', 'details': str(e)})
+    try:
+        resp.flush()
+    except BrokenPipeError:
+        pass
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""
+mod_wsgi-Einstiegspunkt (WSGIScriptAlias zeigt auf diese Datei).
+
+Siehe etc/apache2/conf-available/llmchat-wsgi.conf.
+"""
+
+import os
+import sys
+
+CGI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if CGI_DIR not in sys.path:
+    sys.path.insert(0, CGI_DIR)
+
+from llmchat.server import application, preload  # noqa: E402
+
+# Alle Scripts beim Start des Daemon-Prozesses importieren
+preload()
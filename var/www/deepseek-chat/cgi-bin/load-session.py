@@ -2,103 +2,161 @@
 # -*- coding: utf-8 -*-
 
 import json
-import sys
-import os
-import datetime
 
-SESSIONS_DIR = '/var/www/deepseek-chat/sessions'
+from llmchat.sessions import list_sessions, list_version, session_page, session_version, validate_session_id
+from llmchat.sessionstore import CursorError
+from llmchat.web import cache_headers, cors_headers, etag, not_modified, run_cgi, send_json, send_not_modified
 
-def send_response(status_code, data):
+METHODS = 'GET, POST, OPTIONS'
+MAX_PAGE_SIZE = 500
+CHUNK_BYTES = 64 * 1024
+RESPONSE_VERSION = 1  # erhoehen, wenn sich das Antwortformat aendert (alte ETags verfallen)
+
+def send_response(resp, status_code, data, headers=None):
     """Sendet HTTP-Response zurück."""
-    print(f"Status: {status_code}")
-    print("Content-Type: application/json")
-    print("Access-Control-Allow-Origin: *")
-    print("Access-Control-Allow-Methods: GET, POST, OPTIONS")
-    print("Access-Control-Allow-Headers: Content-Type")
-    print()
-    print(json.dumps(data, ensure_ascii=False))
-    sys.stdout.flush()
-
-def get_session_preview(session_file):
-    """Liest Session-Datei und erstellt Vorschau."""
-    try:
-        with open(session_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        messages = data.get('messages', [])
-        first_user_msg = next((msg['content'][:50] for msg in messages if msg['role'] == 'user'), 'Keine Nachricht')
-        
-        return {
-            'sessionId': os.path.basename(session_file).replace('.json', ''),
-            'timestamp': data.get('timestamp', ''),
-            'messageCount': len(messages),
-            'preview': first_user_msg,
-            'settings': data.get('settings', {})
-        }
-    except:
-        return None
+    send_json(resp, status_code, data, methods=METHODS, extra_headers=headers)
 
-def main():
+def query_int(query, name):
+    """Ganzzahliger Query-Parameter; Unlesbares bleibt Text und scheitert an der Pruefung."""
+    value = query.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+def page_params(limit, before, meta):
+    """Prueft limit/before/meta einer Seitenanfrage; liefert (limit, before) oder wirft ValueError."""
+    # {limit: N} = neueste N Nachrichten, {limit: N, before: <before der vorigen
+    # Seite>} = die N davor, {meta: true} = nur Metadaten, ohne limit = alles
+    if meta:
+        limit = 0
+    elif limit is not None and (type(limit) is not int or not 1 <= limit <= MAX_PAGE_SIZE):
+        raise ValueError(f'limit muss zwischen 1 und {MAX_PAGE_SIZE} liegen')
+    if before is not None and (type(before) is not int or before < 0):
+        raise ValueError('before muss eine Position >= 0 sein')
+    return limit, before
+
+def load_page(req, resp, session_id, limit, before, conditional=False):
+    """Seite senden; conditional (GET): ETag aus dem Versionsmerkmal, 304 ohne die Sitzung zu lesen."""
+    version = session_version(session_id) if conditional else None
+    tag = etag(RESPONSE_VERSION, session_id, version[0], limit, before) if version else None
+    if tag and not_modified(req, tag, version[1]):
+        send_not_modified(resp, tag, version[1], methods=METHODS)
+        return
+    page = session_page(session_id, limit, before)
+    if page is None:
+        send_response(resp, 404, {'error': 'Session nicht gefunden'})
+        return
+    send_page(resp, page, cache_headers(tag, version[1]) if tag else [])
+
+def send_page(resp, page, headers=()):
+    """Antwort stueckweise schreiben: die Nachrichten liegen schon als JSON-Texte vor
+    und werden nicht noch einmal als Ganzes serialisiert."""
+    meta = json.dumps(page['meta'], ensure_ascii=False)
+    tail = {'offset': page['offset'], 'total': page['total'], 'start': page['start'],
+            'before': page['start'] or None}
+    if page['start'] > 0 and page['summary'] is not None:
+        tail['summary'] = page['summary']
+    resp.start(200, [('Content-Type', 'application/json')] + cors_headers(METHODS) + list(headers))
+    chunk = ['{"success": true, "chatData": ', meta[:-1], ', ' if page['meta'] else '', '"messages": [']
+    size = 0
+    for i, message in enumerate(page['messages']):
+        if i:
+            chunk.append(',')
+        chunk.append(message)
+        size += len(message)
+        if size >= CHUNK_BYTES:
+            resp.write(''.join(chunk))
+            chunk, size = [], 0
+    chunk.append(']}, ' + json.dumps(tail, ensure_ascii=False)[1:] + '\n')
+    resp.write(''.join(chunk))
+    resp.flush()
+
+def handle(req, resp):
     try:
-        request_method = os.environ.get('REQUEST_METHOD', '')
+        request_method = req.method
 
         # OPTIONS Request
         if request_method == 'OPTIONS':
-            send_response(200, {'status': 'ok'})
+            send_response(resp, 200, {'status': 'ok'})
             return
 
-        # GET = Liste aller Sessions, POST = Spezifische Session laden
-        if request_method == 'GET':
-            # Liste aller Sessions zurückgeben
-            if not os.path.exists(SESSIONS_DIR):
-                send_response(200, {'sessions': []})
+        # GET = Liste aller Sessions bzw. mit ?sessionId= eine Seite (beides mit ETag,
+        # 304 bei If-None-Match), POST = Spezifische Session laden
+        if request_method == 'GET' and req.query.get('sessionId'):
+            query = req.query
+            session_id = query['sessionId']
+            if not validate_session_id(session_id):
+                send_response(resp, 400, {'error': 'Ungültige Session-ID'})
+                return
+            try:
+                limit, before = page_params(query_int(query, 'limit'), query_int(query, 'before'),
+                                            query.get('meta'))
+            except ValueError as e:
+                send_response(resp, 400, {'error': str(e)})
+                return
+            load_page(req, resp, session_id, limit, before, conditional=True)
+
+        elif request_method == 'GET':
+            # Liste der Sessions (Index der Speicher-Engine, keine Sitzung wird gelesen)
+            # ?sort=activity|created  ?limit=N  ?cursor=<nextCursor der vorigen Seite>
+            query = req.query
+            try:
+                limit = int(query['limit']) if query.get('limit') else None
+            except ValueError:
+                limit = 0
+            if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+                send_response(resp, 400, {'error': f'limit muss zwischen 1 und {MAX_PAGE_SIZE} liegen'})
+                return
+            # Versionsmerkmal vor dem Lesen: aendert sich die Liste waehrenddessen,
+            # passt das ETag beim naechsten Abruf nicht und sie kommt neu
+            version = list_version()
+            tag = etag(RESPONSE_VERSION, version[0], req.query_string) if version else None
+            if tag and not_modified(req, tag, version[1]):
+                send_not_modified(resp, tag, version[1], methods=METHODS)
+                return
+            try:
+                sessions, next_cursor = list_sessions(
+                    query.get('sort') or 'activity', limit, query.get('cursor') or None)
+            except CursorError as e:
+                send_response(resp, 400, {'error': str(e)})
                 return
 
-            sessions = []
-            for filename in sorted(os.listdir(SESSIONS_DIR), reverse=True):
-                if filename.endswith('.json'):
-                    session_file = os.path.join(SESSIONS_DIR, filename)
-                    preview = get_session_preview(session_file)
-                    if preview:
-                        sessions.append(preview)
-
-            send_response(200, {'sessions': sessions})
+            result = {'sessions': sessions}
+            if next_cursor:
+                result['nextCursor'] = next_cursor
+            send_response(resp, 200, result, cache_headers(tag, version[1]) if tag else None)
 
         elif request_method == 'POST':
             # Spezifische Session laden
-            content_length = int(os.environ.get('CONTENT_LENGTH', 0))
-            if content_length == 0:
-                send_response(400, {'error': 'Leere Anfrage'})
+            if req.content_length == 0:
+                send_response(resp, 400, {'error': 'Leere Anfrage'})
                 return
 
-            post_data = sys.stdin.read(content_length)
-            request_data = json.loads(post_data)
+            request_data = req.json()
             session_id = request_data.get('sessionId')
 
-            if not session_id:
-                send_response(400, {'error': 'Keine Session-ID'})
+            if not validate_session_id(session_id):
+                send_response(resp, 400, {'error': 'Ungültige Session-ID'})
                 return
 
-            session_file = os.path.join(SESSIONS_DIR, f'{session_id}.json')
-            if not os.path.exists(session_file):
-                send_response(404, {'error': 'Session nicht gefunden'})
+            try:
+                limit, before = page_params(request_data.get('limit'), request_data.get('before'),
+                                            request_data.get('meta'))
+            except ValueError as e:
+                send_response(resp, 400, {'error': str(e)})
                 return
-
-            with open(session_file, 'r', encoding='utf-8') as f:
-                chat_data = json.load(f)
-
-            send_response(200, {
-                'success': True,
-                'chatData': chat_data
-            })
+            load_page(req, resp, session_id, limit, before)
 
         else:
-            send_response(405, {'error': f'Methode nicht erlaubt: {request_method}'})
+            send_response(resp, 405, {'error': f'Methode nicht erlaubt: {request_method}'})
 
     except json.JSONDecodeError as e:
-        send_response(400, {'error': 'Ungültiges JSON', 'details': str(e)})
+        send_response(resp, 400, {'error': 'Ungültiges JSON', 'details': str(e)})
     except Exception as e:
-        send_response(500, {'error': 'Interner Serverfehler', 'details': str(e)})
+        send_response(resp, 500, {'error': 'Interner Serverfehler', 'details': str(e)})
 
 if __name__ == '__main__':
-    main()
+    run_cgi(handle)
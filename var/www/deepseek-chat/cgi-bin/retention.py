@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Aufbewahrung: Trockenlauf-Bericht und Massen-Loeschen (llmchat/retention.py).
+
+  GET  /cgi-bin/retention.py
+  -> {"settings": {..}, "plan": <Bericht eines Trockenlaufs>, "lastRun": <letzter Lauf oder null>}
+
+  POST /cgi-bin/retention.py   {"sessionIds": ["<id>", ..]}
+  -> {"deleted": [..], "missing": [..]}
+
+  POST /cgi-bin/retention.py   {"olderThanDays": N, "dryRun": true|false}
+  -> {"candidates": N, "bytes": .., "deleted": N, "items": [..]}
+
+Geloescht wird wie ueber delete-session.py (Anhang-Referenzen, Suchindex).
+"""
+
+import json
+
+from llmchat import retention
+from llmchat.sessions import validate_session_id
+from llmchat.web import run_cgi, send_json
+
+METHODS = 'GET, POST, OPTIONS'
+MAX_IDS = 500
+
+
+def handle(req, resp):
+    if req.method == 'OPTIONS':
+        send_json(resp, 200, {}, methods=METHODS)
+        return
+
+    if req.method == 'GET':
+        try:
+            plan = retention.run(dry_run=True)
+        except retention.Busy as e:
+            send_json(resp, 409, {'error': str(e)}, methods=METHODS)
+            return
+        send_json(resp, 200, {'settings': retention.settings(), 'plan': plan,
+                              'lastRun': retention.last_report()}, methods=METHODS)
+        return
+
+    if req.method != 'POST':
+        send_json(resp, 405, {'error': 'Nur GET und POST erlaubt'}, methods=METHODS)
+        return
+    try:
+        request_data = req.json()
+    except json.JSONDecodeError as e:
+        send_json(resp, 400, {'error': 'Ungültiges JSON', 'details': str(e)}, methods=METHODS)
+        return
+    if not isinstance(request_data, dict):
+        send_json(resp, 400, {'error': 'JSON-Objekt erwartet'}, methods=METHODS)
+        return
+
+    if 'sessionIds' in request_data:
+        session_ids = request_data['sessionIds']
+        if not isinstance(session_ids, list) or not 1 <= len(session_ids) <= MAX_IDS:
+            send_json(resp, 400, {'error': f'sessionIds: Liste mit 1 bis {MAX_IDS} IDs'}, methods=METHODS)
+            return
+        if not all(validate_session_id(session_id) for session_id in session_ids):
+            send_json(resp, 400, {'error': 'Ungültige Session-ID'}, methods=METHODS)
+            return
+        deleted, missing = retention.delete_sessions(list(dict.fromkeys(session_ids)))
+        send_json(resp, 200, {'deleted': deleted, 'missing': missing}, methods=METHODS)
+        return
+
+    days = request_data.get('olderThanDays')
+    if type(days) is not int or days < 1:
+        send_json(resp, 400, {'error': 'sessionIds oder olderThanDays (>= 1) erforderlich'}, methods=METHODS)
+        return
+    items, deleted = retention.delete_inactive_sessions(days, dry_run=bool(request_data.get('dryRun')))
+    send_json(resp, 200, {
+        'candidates': len(items),
+        'bytes': sum(item['bytes'] for item in items),
+        'deleted': deleted,
+        'items': items[:retention.REPORT_ITEMS],
+    }, methods=METHODS)
+
+
+if __name__ == '__main__':
+    run_cgi(handle)
@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Volltextsuche ueber alle gespeicherten Sitzungen (llmchat/search.py).
+
+  GET /cgi-bin/search-sessions.py?q=<Suchbegriffe>[&limit=N]
+  -> {"query": .., "results": [{"sessionId", "score", "matches", "timestamp",
+      "preview", "snippets": [{"seq", "role", "segments": [[Text, Treffer?], ..]}]}],
+      "took_ms": ..}
+
+Suchsyntax: Woerter (UND), praef*, "genaue phrase", -wort. index.html
+setzt die Treffer-Segmente als <mark> in die Sitzungsliste.
+"""
+
+import time
+
+from llmchat import search
+from llmchat.web import run_cgi, send_json
+
+METHODS = 'GET, OPTIONS'
+DEFAULT_LIMIT = 20
+
+
+def handle(req, resp):
+    if req.method == 'OPTIONS':
+        send_json(resp, 200, {}, methods=METHODS)
+        return
+    if req.method != 'GET':
+        send_json(resp, 405, {'error': 'Nur GET erlaubt'}, methods=METHODS)
+        return
+
+    text = req.query.get('q', '').strip()
+    try:
+        limit = int(req.query['limit']) if req.query.get('limit') else DEFAULT_LIMIT
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= search.MAX_RESULTS:
+        send_json(resp, 400, {'error': f'limit muss zwischen 1 und {search.MAX_RESULTS} liegen'},
+                  methods=METHODS)
+        return
+
+    started = time.perf_counter()
+    try:
+        results = search.query(text, limit)
+    except search.QueryError as e:
+        send_json(resp, 400, {'error': str(e)}, methods=METHODS)
+        return
+    send_json(resp, 200, {
+        'query': text,
+        'results': results,
+        'took_ms': round((time.perf_counter() - started) * 1000, 1),
+    }, methods=METHODS)
+
+
+if __name__ == '__main__':
+    run_cgi(handle)
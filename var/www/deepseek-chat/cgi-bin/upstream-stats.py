@@ -0,0 +1,28 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Zaehler des Upstream-Verbindungspools (llmchat.upstream) als JSON.
+
+  GET /cgi-bin/upstream-stats.py
+  -> {"pid": .., "requests": .., "pool_hits": .., "pool_misses": .., ...}
+
+Die Werte gelten pro Prozess. Aussagekraeftig nur im Applikationsserver;
+unter mod_cgi beginnt jeder Aufruf bei 0.
+"""
+
+from llmchat import upstream
+from llmchat.web import run_cgi, send_json
+
+
+def handle(req, resp):
+    if req.method == 'OPTIONS':
+        send_json(resp, 200, {}, methods='GET, OPTIONS')
+        return
+    if req.method != 'GET':
+        send_json(resp, 405, {'error': 'Nur GET erlaubt'}, methods='GET, OPTIONS')
+        return
+    send_json(resp, 200, upstream.stats(), methods='GET, OPTIONS')
+
+
+if __name__ == '__main__':
+    run_cgi(handle)